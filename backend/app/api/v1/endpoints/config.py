@@ -4,6 +4,11 @@ from typing import List
 from pydantic import BaseModel
 from app.db.session import get_db
 from app.models.ai_config import AIConfig
+from app.services.ai_registry import ai_registry, bump_config_version
+from app.services.llm_cache import llm_cache
+from app.services.ai_scheduler import ai_scheduler
+from app.services.ai_router import ai_router
+from app.services.circuit_breaker import circuit_breakers
 
 router = APIRouter()
 
@@ -35,10 +40,44 @@ async def get_configs(db: Session = Depends(get_db)):
             "api_key": f"{c.api_key[:6]}...{c.api_key[-4:]}" if len(c.api_key) > 10 else "******",
             "api_base": c.api_base,
             "is_active": c.is_active,
+            "breaker_state": circuit_breakers.state(c.id),
             "created_at": c.created_at
         })
     return result
 
+@router.get("/llm-cache/stats")
+async def get_llm_cache_stats():
+    """获取 LLM 响应缓存的命中统计与占用"""
+    return await llm_cache.stats()
+
+@router.delete("/llm-cache/entries")
+async def clear_llm_cache():
+    """清空 LLM 响应缓存"""
+    deleted = await llm_cache.clear()
+    return {"message": f"已清除 {deleted} 条缓存"}
+
+@router.get("/scheduler/stats")
+async def get_scheduler_stats():
+    """获取各 AI 配置的排队深度与限流状态"""
+    return ai_scheduler.stats()
+
+@router.get("/router/stats")
+async def get_router_stats():
+    """获取各 AI 配置的延迟分位数、错误率与对冲统计"""
+    return ai_router.stats()
+
+@router.get("/breakers")
+async def get_breakers():
+    """获取各 AI 配置的熔断状态"""
+    return circuit_breakers.stats()
+
+@router.post("/breakers/{config_id}/reset")
+async def reset_breaker(config_id: str):
+    """手动恢复某个配置的熔断器"""
+    if not circuit_breakers.reset(config_id):
+        raise HTTPException(status_code=404, detail="该配置没有熔断记录")
+    return {"message": "熔断器已重置"}
+
 @router.post("/")
 async def create_config(config: AIConfigCreate, db: Session = Depends(get_db)):
     """创建新配置"""
@@ -50,8 +89,10 @@ async def create_config(config: AIConfigCreate, db: Session = Depends(get_db)):
     
     db_config = AIConfig(**config.model_dump())
     db.add(db_config)
+    bump_config_version(db)
     db.commit()
     db.refresh(db_config)
+    ai_registry.invalidate()
     return db_config
 
 @router.put("/{config_id}")
@@ -69,8 +110,12 @@ async def update_config(config_id: str, config: AIConfigUpdate, db: Session = De
     for key, value in update_data.items():
         setattr(db_config, key, value)
         
+    bump_config_version(db)
     db.commit()
     db.refresh(db_config)
+    ai_registry.invalidate()
+    # 配置已修改（如更换了 Key），旧的熔断记录不再有效
+    circuit_breakers.reset(config_id)
     return db_config
 
 @router.delete("/{config_id}")
@@ -81,7 +126,10 @@ async def delete_config(config_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="配置不存在")
     
     db.delete(db_config)
+    bump_config_version(db)
     db.commit()
+    ai_registry.invalidate()
+    circuit_breakers.reset(config_id)
     return {"message": "配置已删除"}
 
 @router.post("/{config_id}/activate")
@@ -95,5 +143,7 @@ async def activate_config(config_id: str, db: Session = Depends(get_db)):
     db.query(AIConfig).update({AIConfig.is_active: False})
     # 激活当前
     db_config.is_active = True
+    bump_config_version(db)
     db.commit()
+    ai_registry.invalidate()
     return {"message": f"已激活 {db_config.provider} - {db_config.model_name}"}
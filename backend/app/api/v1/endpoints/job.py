@@ -7,6 +7,11 @@ from app.models.job import Job
 from app.services.ai_service import ai_service
 from app.services.scraper_service import scraper_service
 from app.services.document_parser import document_parser
+from app.services.text_extraction import ExtractionTimeoutError
+from app.services.screenshot_service import InvalidImageError
+from app.services.upload_store import upload_store, read_upload, UploadTooLargeError, PURPOSE_JOB_DOCUMENT
+import base64
+import binascii
 
 router = APIRouter()
 
@@ -17,9 +22,23 @@ class JobCreate(BaseModel):
     url: Optional[str] = None
     content: Optional[str] = None # 用于截图解析后的内容填充
 
+async def _analyze_screenshot_bytes(data: bytes):
+    """预处理并分析截图字节，统一转换错误响应"""
+    try:
+        result = await ai_service.analyze_screenshot_image(data)
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not result:
+        raise HTTPException(status_code=500, detail="图片解析失败，请确保图片清晰且包含职位信息")
+    
+    if isinstance(result, dict) and "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    
+    return result
+
 @router.post("/analyze-screenshot")
 async def analyze_screenshot(payload: dict):
-    """分析职位截图并提取文本信息"""
+    """分析职位截图并提取文本信息（兼容旧版 base64 JSON 请求，推荐使用 /analyze-screenshot/upload）"""
     image_base64 = payload.get("image")
     if not image_base64:
         raise HTTPException(status_code=400, detail="未提供图片数据")
@@ -27,24 +46,39 @@ async def analyze_screenshot(payload: dict):
     # 去除 base64 前缀
     if "base64," in image_base64:
         image_base64 = image_base64.split("base64,")[1]
+    try:
+        data = base64.b64decode(image_base64)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="图片数据不是合法的 base64")
     
-    result = await ai_service.analyze_job_screenshot(image_base64)
-    if not result:
-        raise HTTPException(status_code=500, detail="图片解析失败，请确保图片清晰且包含职位信息")
-    
-    if isinstance(result, dict) and "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
+    return await _analyze_screenshot_bytes(data)
+
+@router.post("/analyze-screenshot/upload")
+async def analyze_screenshot_upload(file: UploadFile = File(...)):
+    """
+    分析职位截图（multipart 二进制上传）
+
+    图片在服务端缩放并重新编码后再发给视觉模型；像素完全相同的截图直接返回缓存结果。
+    """
+    try:
+        received = await read_upload(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if not received.size:
+        raise HTTPException(status_code=400, detail="未提供图片数据")
     
-    return result
+    return await _analyze_screenshot_bytes(received.data)
 
 @router.post("/analyze-document")
-async def analyze_document(file: UploadFile = File(...)):
+async def analyze_document(file: UploadFile = File(...), db: Session = Depends(get_db)):
     """
     解析上传的职位文档（PDF 或 Word）并提取文本信息
     
     支持的文件格式：
     - PDF (.pdf)
     - Word (.doc, .docx)
+
+    相同内容的文档再次上传时复用上次的提取文本与解析结果。
     """
     # 验证文件类型
     allowed_extensions = ['.pdf', '.doc', '.docx']
@@ -57,16 +91,22 @@ async def analyze_document(file: UploadFile = File(...)):
         )
     
     try:
-        # 读取文件内容
-        file_content = await file.read()
-        
-        # 验证文件大小（限制 10MB）
-        max_size = 10 * 1024 * 1024  # 10MB
-        if len(file_content) > max_size:
-            raise HTTPException(status_code=400, detail="文件大小超过限制（最大 10MB）")
+        # 分块读取文件内容，超过大小限制立即中止
+        try:
+            received = await read_upload(file)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
-        # 解析文档提取文本
-        extracted_text = await document_parser.parse_document(file_content, file.filename)
+        blob = upload_store.lookup(db, PURPOSE_JOB_DOCUMENT, received.sha256)
+        if blob is not None:
+            upload_store.touch(db, blob)
+        extracted_text = blob.extracted_text if blob is not None else None
+        if not extracted_text:
+            # 解析文档提取文本（进程池中执行，超时返回 504）
+            try:
+                extracted_text = await document_parser.parse_document(received.data, file.filename)
+            except ExtractionTimeoutError as e:
+                raise HTTPException(status_code=504, detail=str(e))
         
         if not extracted_text:
             raise HTTPException(
@@ -75,7 +115,10 @@ async def analyze_document(file: UploadFile = File(...)):
             )
         
         # 使用 AI 从提取的文本中识别职位信息
-        result = await ai_service.parse_job_description(extracted_text)
+        result = blob.parsed_data if blob is not None and blob.parsed_data else None
+        if not result:
+            result = await ai_service.parse_job_description(extracted_text)
+            upload_store.remember(db, PURPOSE_JOB_DOCUMENT, received.sha256, received.size, extracted_text, result)
         
         if not result:
             # 如果 AI 解析失败，至少返回提取的原始文本
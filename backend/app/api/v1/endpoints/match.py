@@ -1,53 +1,74 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 from pydantic import BaseModel
-from app.db.session import get_db
+import json
+import logging
+from app.db.session import get_db, SessionLocal
 from app.models.resume import Resume
 from app.models.job import Job
 from app.models.match import MatchResult
-from app.services.ai_service import ai_service
+from app.services.ai_service import ai_service, STREAM_RESULT, BLUEPRINTS_PENDING
 
 router = APIRouter()
 
 class MatchRequest(BaseModel):
     resume_id: str
     job_id: str
+    use_cache: bool = True  # 为 False 时忽略缓存，强制重新分析
 
-@router.post("/analyze")
-async def analyze_match(request: MatchRequest, db: Session = Depends(get_db)):
-    """分析简历与职位的匹配度，并自动保存优化版简历到简历库"""
-    
-    # 获取简历
-    resume = db.query(Resume).filter(Resume.id == request.resume_id).first()
+def _load_match_inputs(db: Session, resume_id: str, job_id: str):
+    """获取并校验匹配所需的简历与职位"""
+    resume = db.query(Resume).filter(Resume.id == resume_id).first()
     if not resume or not resume.parsed_data:
         raise HTTPException(status_code=400, detail="简历不存在或尚未解析完成")
     
-    # 获取职位
-    job = db.query(Job).filter(Job.id == request.job_id).first()
+    job = db.query(Job).filter(Job.id == job_id).first()
     if not job or not job.parsed_data:
         raise HTTPException(status_code=400, detail="职位不存在或尚未解析完成")
-    
-    # 调用 AI 进行匹配分析
-    match_result = await ai_service.analyze_resume_job_match(
-        resume.parsed_data,
-        job.parsed_data,
-        job.description
-    )
-    
-    if not match_result:
-        raise HTTPException(status_code=500, detail="匹配分析失败")
-    
-    # 保存匹配结果
+    return resume, job
+
+def _blueprints_fields(blueprints) -> dict:
+    """学习蓝图的接口字段：尚未生成时 skill_mastery_blueprints 为 None，blueprints_status 为 pending"""
+    if blueprints == BLUEPRINTS_PENDING:
+        return {"skill_mastery_blueprints": None, "blueprints_status": "pending"}
+    return {"skill_mastery_blueprints": blueprints, "blueprints_status": "ready"}
+
+async def _resolve_blueprints(db: Session, match: MatchResult):
+    """学习蓝图尚未生成时按需生成并保存；生成失败时保留待生成标记，下次请求重试"""
+    if match.skill_mastery_blueprints != BLUEPRINTS_PENDING:
+        return match.skill_mastery_blueprints
+    resume = db.query(Resume).filter(Resume.id == match.resume_id).first()
+    job = db.query(Job).filter(Job.id == match.job_id).first()
+    if not resume or not resume.parsed_data or not job or not job.parsed_data:
+        return match.skill_mastery_blueprints
+
+    blueprints = await ai_service.generate_skill_blueprints(resume.parsed_data, job.parsed_data, job.description)
+    if blueprints is None:
+        logging.warning(f"学习蓝图生成失败: match_id={match.id}")
+        return match.skill_mastery_blueprints
+    match.skill_mastery_blueprints = blueprints
+    db.commit()
+    return blueprints
+
+def _save_match_result(db: Session, resume: Resume, job: Job, match_result: dict):
+    """保存匹配结果，并自动保存优化版简历到简历库
+
+    Returns:
+        (匹配记录, 优化版简历 ID, 优化版简历名称)
+    """
+    blueprints = match_result.get("skill_mastery_blueprints")
     db_match = MatchResult(
-        resume_id=request.resume_id,
-        job_id=request.job_id,
+        resume_id=resume.id,
+        job_id=job.id,
         match_score=match_result.get("match_score", 0),
         analysis=match_result.get("analysis", {}),
         suggestions=match_result.get("suggestions", []),
         optimized_resume=match_result.get("optimized_resume"),
         optimized_summary=match_result.get("optimized_summary"),
-        skill_mastery_blueprints=match_result.get("skill_mastery_blueprints"),
+        # 分析结果不含学习蓝图（延迟生成）时先保存待生成标记
+        skill_mastery_blueprints=blueprints if blueprints is not None else BLUEPRINTS_PENDING,
         learning_path=match_result.get("learning_path")
     )
     db.add(db_match)
@@ -98,8 +119,8 @@ async def analyze_match(request: MatchRequest, db: Session = Depends(get_db)):
             parsed_data=optimized_content,
             status="optimized",
             is_optimized=True,
-            parent_resume_id=request.resume_id,
-            target_job_id=request.job_id,
+            parent_resume_id=resume.id,
+            target_job_id=job.id,
             target_job_title=job.title,
             target_job_company=job.company,
             optimization_notes=f"针对【{job.company} - {job.title}】岗位深度优化，匹配度 {match_result.get('match_score', 0)}%"
@@ -112,6 +133,26 @@ async def analyze_match(request: MatchRequest, db: Session = Depends(get_db)):
         # 即使保存失败，也返回分析结果
         print(f"自动保存优化简历失败: {e}")
 
+    return db_match, saved_resume_id, new_filename
+
+@router.post("/analyze")
+async def analyze_match(request: MatchRequest, db: Session = Depends(get_db)):
+    """分析简历与职位的匹配度，并自动保存优化版简历到简历库"""
+    
+    resume, job = _load_match_inputs(db, request.resume_id, request.job_id)
+    
+    # 调用 AI 进行匹配分析
+    match_result = await ai_service.analyze_resume_job_match(
+        resume.parsed_data,
+        job.parsed_data,
+        job.description,
+        use_cache=request.use_cache
+    )
+    
+    if not match_result:
+        raise HTTPException(status_code=500, detail="匹配分析失败")
+    
+    db_match, saved_resume_id, new_filename = _save_match_result(db, resume, job, match_result)
     
     return {
         "id": db_match.id,
@@ -120,7 +161,7 @@ async def analyze_match(request: MatchRequest, db: Session = Depends(get_db)):
         "suggestions": match_result.get("suggestions"),
         "optimized_resume": match_result.get("optimized_resume"),
         "optimized_summary": match_result.get("optimized_summary"),
-        "skill_mastery_blueprints": match_result.get("skill_mastery_blueprints"),
+        **_blueprints_fields(db_match.skill_mastery_blueprints),
         "learning_path": match_result.get("learning_path"),
         "resume_name": resume.filename,
         "job_title": job.title,
@@ -130,6 +171,68 @@ async def analyze_match(request: MatchRequest, db: Session = Depends(get_db)):
         "saved_resume_name": new_filename if saved_resume_id else None
     }
 
+def _sse_event(event: str, data) -> str:
+    """格式化一条 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.get("/analyze/stream")
+async def analyze_match_stream(resume_id: str, job_id: str, use_cache: bool = True, db: Session = Depends(get_db)):
+    """
+    流式匹配分析（Server-Sent Events）
+
+    match_score、analysis、suggestions、optimized_resume 等字段生成完毕即推送同名事件，
+    数组字段中的每一项生成完毕即推送 <字段名>.item 事件，
+    结束时保存匹配结果并推送 done 事件（blueprints_status 为 pending 时学习蓝图需另行请求）；失败时推送 error 事件。
+    """
+    resume, job = _load_match_inputs(db, resume_id, job_id)
+    resume_data, job_data, job_description = resume.parsed_data, job.parsed_data, job.description
+
+    async def event_stream():
+        match_result = None
+        try:
+            async for event in ai_service.stream_resume_job_match(
+                resume_data, job_data, job_description, use_cache=use_cache
+            ):
+                if event.kind == STREAM_RESULT:
+                    match_result = event.value
+                elif event.kind == "item":
+                    # 数组字段逐项推送，例如 suggestions.item
+                    yield _sse_event(f"{event.path[0]}.item", {"index": event.path[1], "value": event.value})
+                else:
+                    yield _sse_event(event.path[0], event.value)
+        except Exception as e:
+            logging.error(f"流式匹配分析失败: {e}")
+
+        if not match_result:
+            yield _sse_event("error", {"detail": "匹配分析失败"})
+            return
+
+        # 响应流期间请求级会话可能已关闭，使用独立会话保存结果
+        session = SessionLocal()
+        try:
+            resume_row, job_row = _load_match_inputs(session, resume_id, job_id)
+            db_match, saved_resume_id, new_filename = _save_match_result(session, resume_row, job_row, match_result)
+            yield _sse_event("done", {
+                "id": db_match.id,
+                "resume_name": resume_row.filename,
+                "job_title": job_row.title,
+                "job_company": job_row.company,
+                "blueprints_status": _blueprints_fields(db_match.skill_mastery_blueprints)["blueprints_status"],
+                "saved_resume_id": saved_resume_id,
+                "saved_resume_name": new_filename if saved_resume_id else None
+            })
+        except Exception as e:
+            logging.error(f"保存流式匹配结果失败: {e}")
+            yield _sse_event("error", {"detail": "匹配结果保存失败"})
+        finally:
+            session.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/history", response_model=List[dict])
 async def get_match_history(db: Session = Depends(get_db)):
     """获取匹配历史记录"""
@@ -149,13 +252,26 @@ async def get_match_history(db: Session = Depends(get_db)):
     
     return history
 
+@router.get("/{match_id}/blueprints")
+async def get_match_blueprints(match_id: str, db: Session = Depends(get_db)):
+    """获取技能学习蓝图，首次请求时生成并保存"""
+    result = db.query(MatchResult).filter(MatchResult.id == match_id).first()
+    if not result:
+        raise HTTPException(status_code=404, detail="匹配记录不存在")
+
+    blueprints = await _resolve_blueprints(db, result)
+    if blueprints == BLUEPRINTS_PENDING:
+        raise HTTPException(status_code=500, detail="学习蓝图生成失败")
+    return {"id": result.id, **_blueprints_fields(blueprints)}
+
 @router.get("/{match_id}")
-async def get_match_detail(match_id: str, db: Session = Depends(get_db)):
-    """获取匹配详情"""
+async def get_match_detail(match_id: str, blueprints: bool = True, db: Session = Depends(get_db)):
+    """获取匹配详情（blueprints 为 True 时一并生成尚未生成的学习蓝图）"""
     result = db.query(MatchResult).filter(MatchResult.id == match_id).first()
     if not result:
         raise HTTPException(status_code=404, detail="匹配记录不存在")
     
+    skill_mastery_blueprints = await _resolve_blueprints(db, result) if blueprints else result.skill_mastery_blueprints
     resume = db.query(Resume).filter(Resume.id == result.resume_id).first()
     job = db.query(Job).filter(Job.id == result.job_id).first()
     
@@ -164,7 +280,7 @@ async def get_match_detail(match_id: str, db: Session = Depends(get_db)):
         "match_score": result.match_score,
         "analysis": result.analysis,
         "suggestions": result.suggestions,
-        "skill_mastery_blueprints": result.skill_mastery_blueprints,
+        **_blueprints_fields(skill_mastery_blueprints),
         "learning_path": result.learning_path,
         "resume": {
             "id": resume.id if resume else None,
@@ -1,17 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, status, Depends, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, HTTPException, status, Depends
 from sqlalchemy.orm import Session
 from typing import List
+import asyncio
 import os
-import uuid
-import shutil
-import zipfile
-import xml.etree.ElementTree as ET
-import pdfplumber
+import copy
 import logging
 from app.core.config import settings
 from app.db.session import get_db
 from app.models.resume import Resume
-from app.services.ai_service import ai_service
+from app.models.ingestion import ResumeIngestionJob
+from app.services.resume_ingestion import resume_ingestion_queue, JOB_QUEUED
+from app.services.upload_store import (
+    upload_store, receive_to_disk, discard, UploadTooLargeError, PURPOSE_RESUME
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -19,122 +20,8 @@ logger = logging.getLogger(__name__)
 if not os.path.exists(settings.UPLOAD_DIR):
     os.makedirs(settings.UPLOAD_DIR)
 
-def extract_text_from_pdf(file_path: str) -> str:
-    text = ""
-    try:
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text(layout=True)
-                if page_text:
-                    text += page_text + "\n"
-    except Exception as e:
-        logger.error(f"PDF 提取失败: {e}")
-    return text
-
-def extract_text_from_docx_xml(file_path: str) -> str:
-    """
-    使用底层 XML 解析方式提取 Word 全部文本内容，包括文本框和形状中的文字。
-    """
-    text_parts = []
-    
-    # Word 2007+ 的命名空间
-    namespaces = {
-        'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
-        'wp': 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing',
-        'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
-        'wps': 'http://schemas.microsoft.com/office/word/2010/wordprocessingShape',
-        'mc': 'http://schemas.openxmlformats.org/markup-compatibility/2006',
-    }
-    
-    try:
-        with zipfile.ZipFile(file_path) as zf:
-            # 读取 document.xml（主体内容）
-            if 'word/document.xml' in zf.namelist():
-                with zf.open('word/document.xml') as f:
-                    tree = ET.parse(f)
-                    root = tree.getroot()
-                    
-                    # 使用递归方式收集所有 w:t 节点的文本（涵盖文本框）
-                    for elem in root.iter():
-                        # 标准文本节点
-                        if elem.tag.endswith('}t'):
-                            if elem.text:
-                                text_parts.append(elem.text)
-                        # 处理换行/分段
-                        if elem.tag.endswith('}p'):
-                            text_parts.append('\n')
-            
-            # 读取页眉 header*.xml
-            for name in zf.namelist():
-                if name.startswith('word/header') and name.endswith('.xml'):
-                    with zf.open(name) as f:
-                        tree = ET.parse(f)
-                        for elem in tree.getroot().iter():
-                            if elem.tag.endswith('}t') and elem.text:
-                                text_parts.append(elem.text)
-                        text_parts.append('\n')
-            
-            # 读取页脚 footer*.xml
-            for name in zf.namelist():
-                if name.startswith('word/footer') and name.endswith('.xml'):
-                    with zf.open(name) as f:
-                        tree = ET.parse(f)
-                        for elem in tree.getroot().iter():
-                            if elem.tag.endswith('}t') and elem.text:
-                                text_parts.append(elem.text)
-                        text_parts.append('\n')
-                        
-    except Exception as e:
-        logger.error(f"Word XML 提取失败: {e}")
-    
-    result = ''.join(text_parts)
-    # 打印前800字符到日志，便于调试
-    print(f"[DEBUG] 提取文本预览(前800字):\n{result[:800]}")
-    return result
-
-async def process_resume_parsing(resume_id: str, db: Session):
-    resume = db.query(Resume).filter(Resume.id == resume_id).first()
-    if not resume:
-        return
-
-    try:
-        resume.status = "parsing"
-        db.commit()
-
-        content = ""
-        file_ext = os.path.splitext(resume.file_path)[1].lower()
-
-        if file_ext == ".pdf":
-            content = extract_text_from_pdf(resume.file_path)
-        elif file_ext in [".docx", ".doc"]:
-            content = extract_text_from_docx_xml(resume.file_path)
-        else:
-            with open(resume.file_path, "r", encoding="utf-8", errors="ignore") as f:
-                content = f.read(15000)
-        
-        if not content.strip():
-            logger.warning(f"文件内容提取为空: {resume.filename}")
-            resume.status = "failed"
-            db.commit()
-            return
-
-        parsed_result = await ai_service.parse_resume_text(content)
-        
-        if parsed_result:
-            resume.parsed_data = parsed_result
-            resume.status = "parsed"
-        else:
-            resume.status = "failed"
-            
-        db.commit()
-    except Exception as e:
-        logger.error(f"解析过程报错: {str(e)}")
-        resume.status = "failed"
-        db.commit()
-
 @router.post("/upload")
 async def upload_resume(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...), 
     db: Session = Depends(get_db)
 ):
@@ -144,25 +31,38 @@ async def upload_resume(
     if file_ext not in allowed_extensions:
         raise HTTPException(status_code=400, detail="不支持的格式")
     
-    new_filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = os.path.join(settings.UPLOAD_DIR, new_filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
+    # 分块写入临时文件并计算哈希，超过大小限制立即中止
+    try:
+        received = await receive_to_disk(file, settings.UPLOAD_DIR)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if not received.size:
+        await asyncio.to_thread(discard, received.path)
+        raise HTTPException(status_code=400, detail="文件内容为空")
+
+    # 按内容哈希归档，相同文件只保留一份
+    blob = await upload_store.store_file(db, PURPOSE_RESUME, received, settings.UPLOAD_DIR, file_ext)
+    
+    # 同一文件之前已解析过：直接复用解析结果，不再排队
+    reused = bool(blob.parsed_data)
     db_resume = Resume(
         filename=file.filename,
-        file_path=file_path,
+        file_path=blob.file_path,
         file_type=file_ext,
-        status="parsing"
+        parsed_data=copy.deepcopy(blob.parsed_data) if reused else None,
+        status="parsed" if reused else "parsing"
     )
     db.add(db_resume)
+    db.flush()
+    if not reused:
+        # 简历记录与解析任务在同一事务中写入，由队列 worker 使用独立会话处理
+        resume_ingestion_queue.submit(db, db_resume.id)
     db.commit()
     db.refresh(db_resume)
+    if not reused:
+        resume_ingestion_queue.notify()
     
-    background_tasks.add_task(process_resume_parsing, db_resume.id, db)
-    
-    return {"id": db_resume.id, "filename": file.filename, "status": "parsing"}
+    return {"id": db_resume.id, "filename": file.filename, "status": db_resume.status, "deduplicated": reused}
 
 @router.get("/", response_model=List[dict])
 async def list_resumes(db: Session = Depends(get_db)):
@@ -183,6 +83,11 @@ async def list_resumes(db: Session = Depends(get_db)):
         for r in resumes
     ]
 
+@router.get("/queue")
+async def get_ingestion_queue(limit: int = 20, db: Session = Depends(get_db)):
+    """简历解析队列状态（需注册在 /{resume_id} 之前）"""
+    return resume_ingestion_queue.status(db, limit=max(1, min(limit, 100)))
+
 @router.post("/{resume_id}/avatar")
 async def upload_avatar(
     resume_id: str,
@@ -208,8 +113,11 @@ async def upload_avatar(
     new_filename = f"avatar_{resume_id}{file_ext}"
     file_path = os.path.join(avatar_dir, new_filename)
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    try:
+        received = await receive_to_disk(file, avatar_dir)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    await asyncio.to_thread(os.replace, received.path, file_path)
     
     # 构建可访问的 URL
     avatar_url = f"/uploads/avatars/{new_filename}"
@@ -273,14 +181,23 @@ async def delete_resume(resume_id: str, db: Session = Depends(get_db)):
     if not resume:
         raise HTTPException(status_code=404, detail="简历不存在")
     
-    # 删除物理文件
+    # 删除物理文件（相同内容的上传共用一个文件，仍被其他简历引用时保留）
     try:
-        if os.path.exists(resume.file_path):
+        shared = resume.file_path and db.query(Resume).filter(
+            Resume.file_path == resume.file_path,
+            Resume.id != resume.id
+        ).first()
+        if resume.file_path and not shared and os.path.exists(resume.file_path):
             os.remove(resume.file_path)
     except Exception as e:
         logger.error(f"删除物理文件失败: {str(e)}")
         # 即使文件删除失败，也继续删除数据库记录，避免孤儿数据
 
+    # 尚未开始处理的解析任务一并移除
+    db.query(ResumeIngestionJob).filter(
+        ResumeIngestionJob.resume_id == resume_id,
+        ResumeIngestionJob.status == JOB_QUEUED
+    ).delete(synchronize_session=False)
     db.delete(resume)
     db.commit()
     return {"message": "简历已成功删除"}
@@ -27,6 +27,89 @@ class Settings(BaseSettings):
     # DeepSeek 配置
     DEEPSEEK_API_KEY: Optional[str] = None
     DEEPSEEK_API_BASE: str = "https://api.deepseek.com"
+
+    # AI 请求连接池配置（所有模型客户端共享）
+    AI_REQUEST_TIMEOUT: float = 120.0
+    AI_HTTP_MAX_CONNECTIONS: int = 50
+    AI_HTTP_MAX_KEEPALIVE: int = 20
+    # 配置版本戳检查间隔（秒），其他进程修改配置后最多延迟这么久生效
+    AI_CONFIG_VERSION_CHECK_INTERVAL: float = 5.0
+
+    # AI 请求调度（按配置限流，排队按优先级出队）
+    AI_RPM_LIMIT: int = 60
+    AI_TPM_LIMIT: int = 200000
+    AI_MAX_CONCURRENCY: int = 8
+    AI_QUEUE_TIMEOUT: float = 300.0
+
+    # AI 多配置路由：active 只用激活配置，latency 按滑动窗口延迟选择最快的健康配置
+    AI_ROUTING_MODE: str = "active"
+    AI_LATENCY_WINDOW: int = 50
+    AI_ROUTING_MAX_ERROR_RATE: float = 0.5
+    # 对冲请求：主请求超过其 p95（不低于下限）仍未返回时向次选配置再发一次
+    AI_HEDGE_ENABLED: bool = False
+    AI_HEDGE_MIN_DELAY: float = 2.0
+
+    # 熔断：窗口内失败率达到阈值后跳过该配置，冷却后放行探测请求
+    AI_BREAKER_WINDOW: int = 20
+    AI_BREAKER_MIN_CALLS: int = 5
+    AI_BREAKER_FAILURE_RATE: float = 0.5
+    AI_BREAKER_OPEN_SECONDS: float = 30.0
+    AI_BREAKER_HALF_OPEN_PROBES: int = 1
+
+    # AI 调用监控日志（JSON 行，后台线程写入并按大小轮转）
+    AI_MONITOR_LOG_PATH: str = "app_ai_monitor.log"
+    AI_MONITOR_LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    AI_MONITOR_LOG_BACKUP_COUNT: int = 5
+
+    # 简历解析模式：single 整篇解析；sectioned 本地分段后并行解析；auto 仅对长简历分段
+    RESUME_PARSE_MODE: str = "auto"
+    RESUME_SECTION_MIN_CHARS: int = 2500
+
+    # 匹配分析模式：single 单次生成全部字段；decomposed 拆成评分/建议/学习蓝图/优化简历四个子请求并发生成。
+    # decomposed 总耗时接近最慢的子任务，但每个子请求都要重新发送简历与 JD，输入 token 约为 single 的 3~4 倍，
+    # 只有在提示词前缀缓存生效、且更看重首字段延迟时才建议开启
+    MATCH_ANALYSIS_MODE: str = "single"
+    # 优化版简历的输出方式：patch 只让模型输出针对原简历的编辑操作，由服务端应用；full 整篇重新生成
+    RESUME_OUTPUT_MODE: str = "patch"
+    # 技能学习蓝图延迟生成：匹配分析只返回核心结果，首次查看蓝图时再生成并保存
+    MATCH_BLUEPRINTS_LAZY: bool = True
+
+    # 采集职位的批量 JD 解析：每包输入 token 预算、每包最多条数、失败重排的最多轮数
+    JD_BATCH_TOKEN_BUDGET: int = 6000
+    JD_BATCH_MAX_ITEMS: int = 8
+    JD_BATCH_MAX_ROUNDS: int = 3
+
+    # 职位截图预处理（最长边像素、JPEG 质量）与解析结果缓存（按像素精确匹配；条数、有效期秒数）
+    SCREENSHOT_MAX_SIDE: int = 1568
+    SCREENSHOT_JPEG_QUALITY: int = 80
+    SCREENSHOT_CACHE_MAX_ENTRIES: int = 256
+    SCREENSHOT_CACHE_TTL: int = 24 * 3600
+
+    # 文档文本提取进程池：worker 数、单文件超时（秒）、PDF 最多提取页数、累计处理多少个文件后替换进程池（0 不替换）、单个 worker 内存上限（MB，0 不限制）
+    TEXT_EXTRACTION_WORKERS: int = 2
+    TEXT_EXTRACTION_TIMEOUT: float = 60.0
+    TEXT_EXTRACTION_MAX_PAGES: int = 30
+    TEXT_EXTRACTION_RECYCLE_TASKS: int = 100
+    TEXT_EXTRACTION_WORKER_MEMORY_MB: int = 1024
+    # PDF 提取引擎：auto 先用 pypdf，质量分低于阈值的页面回退到 pdfplumber；pypdf / pdfplumber 只用对应引擎
+    PDF_EXTRACTION_ENGINE: str = "auto"
+    PDF_MIN_TEXT_QUALITY: float = 0.6
+
+    # 简历解析队列：worker 数、空闲轮询间隔（秒）、租约时长（秒，超时未续约的任务重新可见）、最多尝试次数、
+    # 重试退避的初始与最大间隔（秒）、已结束任务保留天数
+    RESUME_QUEUE_CONCURRENCY: int = 3
+    RESUME_QUEUE_POLL_INTERVAL: float = 2.0
+    RESUME_QUEUE_VISIBILITY_TIMEOUT: int = 300
+    RESUME_QUEUE_MAX_ATTEMPTS: int = 3
+    RESUME_QUEUE_RETRY_BASE_DELAY: float = 5.0
+    RESUME_QUEUE_RETRY_MAX_DELAY: float = 300.0
+    RESUME_QUEUE_RETENTION_DAYS: int = 7
+
+    # LLM 响应缓存配置
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "llm_cache.db"
+    LLM_CACHE_MAX_ENTRIES: int = 5000
+    LLM_CACHE_MAX_BYTES: int = 200 * 1024 * 1024
     
     # CORS 配置
     ALLOWED_ORIGINS: str = "*"
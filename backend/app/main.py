@@ -1,5 +1,5 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.db.session import engine, Base
@@ -16,7 +16,7 @@ app = FastAPI(
 
 # 自动创建数据库表 (如果不存在)
 try:
-    from app.models import resume, job, match, ai_config, job_search
+    from app.models import resume, job, match, ai_config, job_search, ingestion, upload
     Base.metadata.create_all(bind=engine)
     logging.info("Database tables verified/created successfully.")
 except Exception as e:
@@ -62,11 +62,46 @@ async def global_exception_handler(request: Request, exc: Exception):
     response.headers["Access-Control-Allow-Origin"] = "*"
     return response
 
+# 声明的请求体已超过上传大小限制时，在读取请求体之前直接拒绝（各上传接口仍会逐块校验实际大小）
+MULTIPART_OVERHEAD = 64 * 1024
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    content_length = request.headers.get("content-length")
+    if (request.headers.get("content-type", "").startswith("multipart/form-data")
+            and content_length and content_length.isdigit()
+            and int(content_length) > settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD):
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"文件大小超过限制（最大 {settings.MAX_UPLOAD_SIZE // (1024 * 1024)}MB）"},
+        )
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        return response
+    return await call_next(request)
+
 # 挂载静态文件
 from fastapi.staticfiles import StaticFiles
 app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
 app.mount("/exports", StaticFiles(directory="exports"), name="exports")
 
+# 应用启动时开始消费简历解析队列
+@app.on_event("startup")
+async def start_ingestion_workers():
+    from app.services.resume_ingestion import resume_ingestion_queue
+    resume_ingestion_queue.start()
+
+# 应用退出时停止解析队列，释放 AI 共享连接池与文本提取进程池
+@app.on_event("shutdown")
+async def close_ai_clients():
+    from app.services.ai_service import ai_service
+    from app.services.telemetry import ai_telemetry
+    from app.services.text_extraction import text_extractor
+    from app.services.resume_ingestion import resume_ingestion_queue
+    await resume_ingestion_queue.stop()
+    await ai_service.aclose()
+    ai_telemetry.stop()
+    text_extractor.shutdown()
+
 # 注册健康检查（最简单路径）
 @app.get("/health")
 async def health(): 
@@ -74,6 +109,50 @@ async def health():
     db_type = "sqlite" if "sqlite" in SQLALCHEMY_DATABASE_URL else "postgresql"
     return {"status": "ok", "db_type": db_type}
 
+# AI 调用指标：默认 Prometheus 文本格式，format=json 时返回 JSON 汇总
+@app.get("/metrics")
+async def metrics(format: str = "prometheus"):
+    from app.services.telemetry import ai_telemetry
+    from app.services.ai_service import ai_service
+    from app.services.ai_scheduler import ai_scheduler
+    from app.services.ai_router import ai_router
+    from app.services.circuit_breaker import circuit_breakers, STATE_OPEN, STATE_HALF_OPEN
+    from app.services.llm_cache import llm_cache
+    from app.services.screenshot_service import screenshot_cache
+    from app.services.text_extraction import text_extractor
+
+    scheduler_stats = ai_scheduler.stats()
+    breaker_stats = circuit_breakers.stats()
+    cache_stats = await llm_cache.stats()
+    if format == "json":
+        return {
+            "ai": ai_telemetry.snapshot(),
+            "llm_cache": cache_stats,
+            "scheduler": scheduler_stats,
+            "router": ai_router.stats(),
+            "breakers": breaker_stats,
+            "singleflight": ai_service._singleflight.stats(),
+            "screenshot_cache": screenshot_cache.stats(),
+            "text_extraction": text_extractor.stats()
+        }
+
+    gauges = []
+    for config_id, s in scheduler_stats.items():
+        gauges.append(("ai_scheduler_queue_depth", {"config_id": config_id}, s["queue_depth"]))
+    for config_id, s in scheduler_stats.items():
+        gauges.append(("ai_scheduler_active", {"config_id": config_id}, s["active"]))
+    breaker_levels = {STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+    for config_id, b in breaker_stats.items():
+        gauges.append(("ai_breaker_state", {"config_id": config_id}, breaker_levels.get(b["state"], 0)))
+    gauges.append(("llm_cache_hit_rate", {}, cache_stats["hit_rate"]))
+    if cache_stats.get("entries") is not None:
+        gauges.append(("llm_cache_entries", {}, cache_stats["entries"]))
+        gauges.append(("llm_cache_bytes", {}, cache_stats["bytes"]))
+    gauges.append(("ai_singleflight_inflight", {}, ai_service._singleflight.stats()["inflight"]))
+    gauges.append(("screenshot_cache_hit_rate", {}, screenshot_cache.stats()["hit_rate"]))
+    gauges.append(("text_extraction_timeouts", {}, text_extractor.stats()["timeouts"]))
+    return PlainTextResponse(ai_telemetry.render_prometheus(gauges))
+
 @app.get("/")
 async def root(): return {"message": "API is Live"}
 
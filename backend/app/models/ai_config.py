@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime
+from sqlalchemy import Column, String, Boolean, DateTime, Integer
 import uuid
 from datetime import datetime
 from app.db.session import Base
@@ -16,3 +16,12 @@ class AIConfig(Base):
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class AIConfigVersion(Base):
+    """AI 配置版本戳（单行表，配置变更时递增，供各进程失效本地缓存）"""
+    __tablename__ = "ai_config_versions"
+
+    id = Column(Integer, primary_key=True, default=1)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, String, DateTime, Integer, Index
+import uuid
+from datetime import datetime
+from app.db.session import Base
+
+class ResumeIngestionJob(Base):
+    """简历解析任务队列（持久化在数据库中，服务重启后继续处理）"""
+    __tablename__ = "resume_ingestion_jobs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    resume_id = Column(String, index=True)  # 待解析的简历 ID
+
+    status = Column(String, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, default=0)  # 已领取次数（每次领取加一，同时作为乐观锁版本号）
+    max_attempts = Column(Integer, default=3)
+    available_at = Column(DateTime, default=datetime.utcnow)  # 排队中的任务在此时间之后才可被领取（重试退避）
+
+    # 租约：领取后在 locked_until 之前其他 worker 不可领取，超时未续约视为 worker 已失联，任务重新可见
+    locked_until = Column(DateTime, nullable=True)
+    lease_token = Column(String, nullable=True)
+    worker_id = Column(String, nullable=True)
+
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_resume_ingestion_jobs_status_available", "status", "available_at"),
+    )
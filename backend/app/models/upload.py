@@ -0,0 +1,25 @@
+from sqlalchemy import Column, String, JSON, DateTime, Integer, Text, UniqueConstraint
+import uuid
+from datetime import datetime
+from app.db.session import Base
+
+class UploadBlob(Base):
+    """按内容哈希去重的上传文件，缓存其提取文本与解析结果，重复上传同一文件时直接复用"""
+    __tablename__ = "upload_blobs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    purpose = Column(String, index=True)  # resume, job_document（同一文件按不同用途提取的文本不同）
+    sha256 = Column(String, index=True)
+    size = Column(Integer)
+    file_path = Column(String, nullable=True, index=True)  # 按哈希命名的存储路径（职位文档不落盘）
+
+    extracted_text = Column(Text, nullable=True)
+    parsed_data = Column(JSON, nullable=True)
+
+    hits = Column(Integer, default=0)  # 被重复上传复用的次数
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("purpose", "sha256", name="uq_upload_blobs_purpose_sha256"),
+    )
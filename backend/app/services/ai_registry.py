@@ -0,0 +1,242 @@
+"""
+AI 配置与客户端注册表
+缓存 ai_configs 快照，并为每条配置保留一个长期复用的 SDK 客户端。
+配置变更时由 config 接口递增版本戳，各工作进程据此失效本地缓存。
+"""
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.ai_config import AIConfig, AIConfigVersion
+
+try:
+    from anthropic import AsyncAnthropic
+    ANTHROPIC_AVAILABLE = True
+except ImportError:
+    ANTHROPIC_AVAILABLE = False
+    logging.warning("Anthropic SDK 未安装，Claude 模型将不可用")
+
+# 环境变量回退配置的固定 ID
+ENV_CONFIG_ID = "__env__"
+
+
+def bump_config_version(db: Session):
+    """
+    递增配置版本戳（在 config 接口修改 ai_configs 的同一事务中调用）
+
+    版本行不存在时插入首行；多个进程同时插入时，失败的一方回滚到保存点后改为递增。
+
+    Args:
+        db: 当前请求的数据库会话，由调用方负责 commit
+    """
+    if _increment_version(db):
+        return
+    try:
+        with db.begin_nested():
+            db.add(AIConfigVersion(id=1, version=1))
+    except IntegrityError:
+        _increment_version(db)
+
+
+def _increment_version(db: Session) -> int:
+    return db.query(AIConfigVersion).filter(AIConfigVersion.id == 1).update(
+        {AIConfigVersion.version: AIConfigVersion.version + 1, AIConfigVersion.updated_at: datetime.utcnow()},
+        synchronize_session=False
+    )
+
+
+class AIClientRegistry:
+    """AI 配置/客户端注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        # 上次检查版本戳的时间（无论成功与否），None 表示需要立即检查
+        self._checked_at: Optional[float] = None
+        self._configs: Dict[str, Dict] = {}
+        self._active_id: Optional[str] = None
+        # config_id -> (指纹, 客户端类型, 客户端)
+        self._clients: Dict[str, Tuple[tuple, str, object]] = {}
+        # 所有 SDK 客户端共享的连接池（绑定到创建时的事件循环）
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._http_loop = None
+
+    def env_config(self) -> Dict:
+        """环境变量中的默认配置"""
+        return {
+            "id": ENV_CONFIG_ID,
+            "api_key": settings.OPENAI_API_KEY,
+            "api_base": settings.OPENAI_API_BASE,
+            "model": settings.OPENAI_MODEL,
+            "provider": "OpenAI"
+        }
+
+    def _read_version(self) -> Optional[int]:
+        """读取数据库中的版本戳，失败时返回 None"""
+        db = SessionLocal()
+        try:
+            row = db.query(AIConfigVersion).filter(AIConfigVersion.id == 1).first()
+            return row.version if row else 0
+        except Exception as e:
+            logging.error(f"读取 AI 配置版本失败: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _load_configs(self):
+        """重新加载全部配置快照"""
+        configs: Dict[str, Dict] = {}
+        active_id = None
+        db = SessionLocal()
+        try:
+            for row in db.query(AIConfig).order_by(AIConfig.created_at.desc()).all():
+                configs[row.id] = {
+                    "id": row.id,
+                    "api_key": row.api_key,
+                    "api_base": row.api_base or "https://api.openai.com/v1",
+                    "model": row.model_name,
+                    "provider": row.provider
+                }
+                if row.is_active and active_id is None:
+                    active_id = row.id
+        except Exception as e:
+            logging.error(f"从数据库获取 AI 配置失败: {e}")
+        finally:
+            db.close()
+
+        self._configs = configs
+        self._active_id = active_id
+        # 丢弃已删除配置的客户端，已修改的配置会在下次取用时按指纹重建
+        for config_id in list(self._clients):
+            if config_id != ENV_CONFIG_ID and config_id not in configs:
+                self._clients.pop(config_id, None)
+        logging.info(f"AI 配置已加载: 共 {len(configs)} 条，版本 {self._version}")
+
+    def _checked_recently(self, now: float) -> bool:
+        return self._checked_at is not None and now - self._checked_at < settings.AI_CONFIG_VERSION_CHECK_INTERVAL
+
+    def _ensure_fresh(self):
+        """按间隔检查版本戳，有变化时重新加载；读取失败也计入间隔，数据库不可用时不会每次调用都访问数据库"""
+        now = time.monotonic()
+        if self._checked_recently(now):
+            return
+        with self._lock:
+            if self._checked_recently(now):
+                return
+            version = self._read_version()
+            self._checked_at = now
+            if version is None:
+                # 数据库不可用时沿用旧快照，首次加载则退回环境变量
+                if self._version is None:
+                    self._configs, self._active_id = {}, None
+                return
+            if version != self._version:
+                self._version = version
+                self._load_configs()
+
+    def invalidate(self):
+        """使本进程缓存立即失效（其他进程通过版本戳感知）"""
+        with self._lock:
+            self._version = None
+            self._checked_at = None
+
+    def get_active_config(self) -> Dict:
+        """获取当前激活的配置，没有则回退到环境变量"""
+        self._ensure_fresh()
+        config = self._configs.get(self._active_id) if self._active_id else None
+        return dict(config) if config else self.env_config()
+
+    def get_configs(self) -> List[Dict]:
+        """获取全部配置快照"""
+        self._ensure_fresh()
+        return [dict(c) for c in self._configs.values()]
+
+    def get_http_client(self) -> httpx.AsyncClient:
+        """获取共享的异步 HTTP 连接池，事件循环变化或已关闭时重建"""
+        loop = asyncio.get_running_loop()
+        if self._http_client is None or self._http_client.is_closed or self._http_loop is not loop:
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.AI_HTTP_MAX_KEEPALIVE
+                ),
+                timeout=httpx.Timeout(settings.AI_REQUEST_TIMEOUT, connect=10.0)
+            )
+            self._http_loop = loop
+            # 旧连接池上的客户端不可再用
+            self._clients.clear()
+        return self._http_client
+
+    def get_client(self, config: Dict) -> Tuple[str, object]:
+        """
+        获取配置对应的长期客户端
+
+        Returns:
+            (客户端类型 openai/anthropic, SDK 客户端)
+        """
+        http_client = self.get_http_client()
+        fingerprint = (config.get("provider"), config.get("model"), config.get("api_key"), config.get("api_base"))
+        cached = self._clients.get(config["id"])
+        if cached and cached[0] == fingerprint:
+            return cached[1], cached[2]
+
+        client_type, client = self._build_client(config, http_client)
+        self._clients[config["id"]] = (fingerprint, client_type, client)
+        return client_type, client
+
+    def _build_client(self, config: Dict, http_client: httpx.AsyncClient) -> Tuple[str, object]:
+        """根据配置创建 SDK 客户端"""
+        # 判断是否为 AnyRouter (通常使用 OpenAI 协议)
+        is_anyrouter = "anyrouter" in (config.get("api_base") or "").lower() or "anyrouter" in (config.get("provider") or "").lower()
+
+        # 判断是否使用独立的 Anthropic SDK
+        is_claude_sdk = not is_anyrouter and (
+            "anthropic" in (config.get("provider") or "").lower() or
+            "claude" in (config.get("model") or "").lower()
+        )
+
+        if is_claude_sdk and ANTHROPIC_AVAILABLE:
+            client = AsyncAnthropic(
+                api_key=config["api_key"],
+                base_url=config["api_base"],
+                timeout=settings.AI_REQUEST_TIMEOUT,
+                http_client=http_client
+            )
+            logging.info(f"创建 Anthropic SDK 客户端，模型: {config['model']}")
+            return "anthropic", client
+
+        # 修正 AnyRouter 的 base_url，确保包含 /v1
+        base_url = config["api_base"]
+        if is_anyrouter and base_url and not base_url.endswith("/v1"):
+            base_url = f"{base_url.rstrip('/')}/v1"
+
+        client = AsyncOpenAI(
+            api_key=config["api_key"],
+            base_url=base_url,
+            timeout=settings.AI_REQUEST_TIMEOUT,
+            http_client=http_client
+        )
+        logging.info(f"创建 OpenAI 兼容 SDK 客户端，提供商: {config['provider']}，模型: {config['model']}，地址: {base_url}")
+        return "openai", client
+
+    async def aclose(self):
+        """关闭共享连接池（应用退出时调用）"""
+        self._clients.clear()
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+        self._http_client = None
+        self._http_loop = None
+
+
+# 创建全局实例
+ai_registry = AIClientRegistry()
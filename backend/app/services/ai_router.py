@@ -0,0 +1,136 @@
+"""
+AI 多配置路由
+按配置统计滑动窗口内的延迟分位数与错误率，
+latency 模式下把请求发往当前最快的健康配置，并给出对冲请求的触发时机。
+"""
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.ai_registry import ai_registry
+
+ROUTING_MODE_ACTIVE = "active"
+ROUTING_MODE_LATENCY = "latency"
+
+# 样本数不足时视为未探测，优先分配少量请求以获得延迟数据
+MIN_SAMPLES = 3
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """线性插值分位数（输入需已排序）"""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+class LatencyWindow:
+    """
+    单个配置的滑动窗口统计
+
+    样本为 (耗时, 是否成功, 是否截尾)。截尾样本来自中途被取消的请求（如对冲中落败的一方），
+    耗时只是真实延迟的下限；分位数按下限计入，不计入错误率。若直接丢弃这些样本，
+    慢配置只会留下碰巧较快的几次，统计出的延迟偏低，路由与对冲会继续选它。
+    """
+
+    def __init__(self, size: int):
+        self.samples: Deque[Tuple[float, bool, bool]] = deque(maxlen=size)
+        self.last_at = 0.0
+
+    def add(self, latency: float, ok: bool, censored: bool = False):
+        self.samples.append((latency, ok, censored))
+        self.last_at = time.time()
+
+    def snapshot(self) -> Dict:
+        latencies = sorted(latency for latency, ok, _ in self.samples if ok)
+        total = len(self.samples)
+        errors = sum(1 for _, ok, _ in self.samples if not ok)
+        return {
+            "samples": total,
+            "censored": sum(1 for _, _, censored in self.samples if censored),
+            "p50": round(_percentile(latencies, 0.5), 3) if latencies else None,
+            "p95": round(_percentile(latencies, 0.95), 3) if latencies else None,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+        }
+
+
+class AIRouter:
+    """按延迟与错误率选择 AI 配置"""
+
+    def __init__(self, window_size: int):
+        self.window_size = window_size
+        self._lock = threading.Lock()
+        self._windows: Dict[str, LatencyWindow] = {}
+        self.hedges_launched = 0
+        self.hedges_won = 0
+
+    def record(self, config_id: str, latency: float, ok: bool, censored: bool = False):
+        """记录一次上游调用的耗时与成败；censored 为 True 表示请求被取消，latency 只是下限"""
+        with self._lock:
+            window = self._windows.get(config_id)
+            if window is None:
+                window = LatencyWindow(self.window_size)
+                self._windows[config_id] = window
+            window.add(latency, ok, censored)
+
+    def record_cancelled(self, config_id: str, elapsed: float):
+        """记录一次中途被取消的请求（截尾样本）"""
+        self.record(config_id, elapsed, True, censored=True)
+
+    def _snapshot(self, config_id: str) -> Optional[Dict]:
+        with self._lock:
+            window = self._windows.get(config_id)
+            return window.snapshot() if window else None
+
+    def candidates(self) -> List[Dict]:
+        """
+        按优先顺序返回候选配置
+
+        active 模式只返回激活配置；latency 模式返回全部配置，
+        健康配置按 p50 升序排在前面，错误率超限的配置排在最后。
+        """
+        if settings.AI_ROUTING_MODE != ROUTING_MODE_LATENCY:
+            return [ai_registry.get_active_config()]
+
+        configs = ai_registry.get_configs()
+        if not configs:
+            return [ai_registry.env_config()]
+
+        def sort_key(config: Dict):
+            snap = self._snapshot(config["id"])
+            if not snap or snap["samples"] < MIN_SAMPLES:
+                return (0, 0.0)
+            if snap["error_rate"] > settings.AI_ROUTING_MAX_ERROR_RATE or snap["p50"] is None:
+                return (2, snap["error_rate"])
+            return (1, snap["p50"])
+
+        return sorted(configs, key=sort_key)
+
+    def hedge_delay(self, config_id: str) -> Optional[float]:
+        """主请求超过该配置 p95 仍未返回时发起对冲，样本不足时不对冲"""
+        if not settings.AI_HEDGE_ENABLED:
+            return None
+        snap = self._snapshot(config_id)
+        if not snap or snap["samples"] < MIN_SAMPLES or snap["p95"] is None:
+            return None
+        return max(snap["p95"], settings.AI_HEDGE_MIN_DELAY)
+
+    def stats(self) -> Dict:
+        """各配置的延迟与错误率统计"""
+        with self._lock:
+            windows = {config_id: w.snapshot() for config_id, w in self._windows.items()}
+        return {
+            "mode": settings.AI_ROUTING_MODE,
+            "hedge_enabled": settings.AI_HEDGE_ENABLED,
+            "hedges_launched": self.hedges_launched,
+            "hedges_won": self.hedges_won,
+            "configs": windows
+        }
+
+
+# 创建全局实例
+ai_router = AIRouter(window_size=settings.AI_LATENCY_WINDOW)
@@ -0,0 +1,211 @@
+"""
+AI 请求调度器
+按 AI 配置分别做令牌桶限流（每分钟请求数 / 每分钟 token 数）与并发上限控制，
+排队请求按优先级出队：交互 > 生成 > 批量采集解析。
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+# 优先级（数值越小越先出队）
+PRIORITY_INTERACTIVE = 0
+PRIORITY_GENERATION = 1
+PRIORITY_BULK = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_GENERATION: "generation",
+    PRIORITY_BULK: "bulk",
+}
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中文约 1 字 1 token，其余约 4 字符 1 token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class TokenBucket:
+    """按分钟补充的令牌桶"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """距离可取出 amount 个令牌还需等待的秒数"""
+        self._refill()
+        # 单次请求超过桶容量时按满桶放行，避免永远等待
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def available(self) -> int:
+        self._refill()
+        return int(self.tokens)
+
+
+class _Waiter:
+    __slots__ = ("priority", "tokens", "future", "enqueued_at")
+
+    def __init__(self, priority: int, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class _ProviderState:
+    """单个 AI 配置的限流状态"""
+
+    def __init__(self, rpm: int, tpm: int, max_concurrency: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.queue: List = []  # (priority, seq, waiter)
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.dispatched: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        self.wait_seconds: Dict[int, float] = {p: 0.0 for p in PRIORITY_NAMES}
+
+
+class AIScheduler:
+    """按配置限流、按优先级排队的 AI 请求调度器"""
+
+    def __init__(self, rpm: int, tpm: int, max_concurrency: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self._states: Dict[str, _ProviderState] = {}
+        self._seq = itertools.count()
+
+    def _state(self, config_id: str) -> _ProviderState:
+        state = self._states.get(config_id)
+        if state is None:
+            state = _ProviderState(self.rpm, self.tpm, self.max_concurrency)
+            self._states[config_id] = state
+        return state
+
+    @asynccontextmanager
+    async def slot(self, config_id: str, priority: int = PRIORITY_INTERACTIVE, est_tokens: int = 0):
+        """
+        获取一次请求配额，退出时释放并发名额
+
+        Args:
+            config_id: AI 配置 ID（限流维度）
+            priority: 优先级，见 PRIORITY_*
+            est_tokens: 预估的输入 + 输出 token 数
+        """
+        state = self._state(config_id)
+        await self._acquire(state, priority, est_tokens)
+        try:
+            yield
+        finally:
+            state.active -= 1
+            self._pump(state)
+
+    async def _acquire(self, state: _ProviderState, priority: int, est_tokens: int):
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, est_tokens, loop.create_future())
+        heapq.heappush(state.queue, (priority, next(self._seq), waiter))
+        self._pump(state)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=settings.AI_QUEUE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 已被分配名额但调用方放弃，归还并发名额
+                state.active -= 1
+                self._pump(state)
+            else:
+                waiter.future.cancel()
+            raise
+
+    def _pump(self, state: _ProviderState):
+        """在并发与限流允许的范围内按优先级放行排队请求"""
+        while state.queue and state.active < state.max_concurrency:
+            _, _, waiter = state.queue[0]
+            if waiter.future.done():
+                heapq.heappop(state.queue)
+                continue
+            wait = max(state.requests.wait_time(1), state.tokens.wait_time(waiter.tokens))
+            if wait > 0:
+                # 队首受限流约束时整体等待，保证高优先级不被低优先级插队
+                if state.timer is None:
+                    loop = asyncio.get_running_loop()
+                    state.timer = loop.call_later(wait, self._on_timer, state)
+                return
+            heapq.heappop(state.queue)
+            state.requests.consume(1)
+            state.tokens.consume(min(waiter.tokens, state.tokens.capacity))
+            state.active += 1
+            waited = time.monotonic() - waiter.enqueued_at
+            state.dispatched[waiter.priority] += 1
+            state.wait_seconds[waiter.priority] += waited
+            if waited > 5:
+                logging.info(f"AI 请求排队 {waited:.1f}s 后放行，优先级: {PRIORITY_NAMES[waiter.priority]}")
+            waiter.future.set_result(True)
+
+    def _on_timer(self, state: _ProviderState):
+        state.timer = None
+        self._pump(state)
+
+    def record_usage(self, config_id: str, est_tokens: int, actual_tokens: Optional[int]):
+        """请求完成后按实际 token 用量校正 TPM 令牌桶"""
+        if actual_tokens is None:
+            return
+        state = self._state(config_id)
+        state.tokens.consume(actual_tokens - min(est_tokens, state.tokens.capacity))
+
+    def stats(self) -> Dict:
+        """各配置的排队深度与限流状态"""
+        result = {}
+        for config_id, state in self._states.items():
+            queued = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _, waiter in state.queue:
+                if not waiter.future.done():
+                    queued[PRIORITY_NAMES[priority]] += 1
+            result[config_id] = {
+                "active": state.active,
+                "max_concurrency": state.max_concurrency,
+                "queued": queued,
+                "queue_depth": sum(queued.values()),
+                "rpm_available": state.requests.available(),
+                "tpm_available": state.tokens.available(),
+                "dispatched": {PRIORITY_NAMES[p]: n for p, n in state.dispatched.items()},
+                "avg_wait_seconds": {
+                    PRIORITY_NAMES[p]: round(state.wait_seconds[p] / n, 3) if n else 0.0
+                    for p, n in state.dispatched.items()
+                }
+            }
+        return result
+
+
+# 创建全局实例
+ai_scheduler = AIScheduler(
+    rpm=settings.AI_RPM_LIMIT,
+    tpm=settings.AI_TPM_LIMIT,
+    max_concurrency=settings.AI_MAX_CONCURRENCY
+)
@@ -1,99 +1,142 @@
-import json
+import asyncio
+import base64
 import logging
-import re
 import time
-from openai import OpenAI
 from app.core.config import settings
-from app.db.session import SessionLocal
-from app.models.ai_config import AIConfig
+from app.services.ai_registry import ai_registry, ENV_CONFIG_ID
+from app.services.ai_router import ai_router
+from app.services.circuit_breaker import circuit_breakers, CircuitOpenError
+from app.services.telemetry import ai_telemetry, CallTrace, CALL_OK, CALL_ERROR, CALL_CIRCUIT_OPEN
+from app.services.ai_scheduler import (
+    ai_scheduler, estimate_tokens, PRIORITY_INTERACTIVE, PRIORITY_GENERATION, PRIORITY_BULK
+)
+from app.services.llm_cache import llm_cache
+from app.services.singleflight import SingleFlight
+from app.services.prompt_builder import PromptBuilder, compact_text, to_compact_json
+from app.services.resume_sections import (
+    split_resume_sections, recognized_sections, split_looks_valid,
+    SECTION_HEADER, SECTION_SUMMARY, SECTION_EDUCATION, SECTION_WORK,
+    SECTION_PROJECTS, SECTION_SKILLS, SECTION_CERTIFICATES
+)
+from app.services.prompt_registry import prompt_registry, Prompt
+from app.services.screenshot_service import prepare_screenshot, screenshot_cache
+from app.services.resume_extractor import extract_resume_hints, apply_resume_hints
+from app.services.resume_patch import apply_resume_patch, render_marked_resume
+from app.services.json_stream import IncrementalJSONParser, JSONEvent, parse_json_output, PARSE_OK, PARSE_REPAIRED, PARSE_FAILED
 
-# 尝试导入 Anthropic，如果没有安装则跳过
-try:
-    from anthropic import Anthropic
-    ANTHROPIC_AVAILABLE = True
-except ImportError:
-    ANTHROPIC_AVAILABLE = False
-    logging.warning("Anthropic SDK 未安装，Claude 模型将不可用")
+# 各任务的默认调度优先级（未列出的按生成类处理）
+TASK_PRIORITIES = {
+    "resume_parse": PRIORITY_INTERACTIVE,
+    "jd_parse": PRIORITY_INTERACTIVE,
+    "match_analysis": PRIORITY_INTERACTIVE,
+}
+
+# 限流预估时计入的输出 token 数
+EXPECTED_OUTPUT_TOKENS = 2000
+
+# 简历分段解析：输出字段 -> 参与解析的段落（各字段的模板见 prompt_registry 中的 resume_parse.<字段>）
+RESUME_SECTION_FIELDS = {
+    "personal_info": (SECTION_HEADER, SECTION_SUMMARY),
+    "education": (SECTION_EDUCATION,),
+    "work_experience": (SECTION_WORK,),
+    "project_experience": (SECTION_PROJECTS,),
+    "skills_sections": (SECTION_SKILLS,),
+    "others": (SECTION_CERTIFICATES,),
+}
+
+# 分段解析时联系方式段落过短，则取全文开头这么多字符代替
+RESUME_HEADER_FALLBACK_CHARS = 800
+
+# 流式匹配分析结束时产出完整结果的事件类型
+STREAM_RESULT = "result"
+
+# 匹配分析分解模式：子模板 -> 负责输出的字段（各子模板见 prompt_registry 中的 match_analysis.<部分>）
+MATCH_SUBTASK_FIELDS = {
+    "match_analysis.score": ("match_score", "analysis"),
+    "match_analysis.suggestions": ("suggestions", "optimized_summary"),
+    "match_analysis.blueprints": ("skill_mastery_blueprints",),
+    "match_analysis.optimized": ("optimized_resume",),
+}
+# 评分子任务失败时退回单次生成，其余子任务失败时对应字段取空值（学习蓝图留空，之后按需生成）
+MATCH_FIELD_DEFAULTS = {
+    "analysis": {},
+    "suggestions": [],
+    "optimized_summary": "",
+    "optimized_resume": "",
+}
+MATCH_BLUEPRINTS_SUBTASK = "match_analysis.blueprints"
+MATCH_OPTIMIZED_SUBTASK = "match_analysis.optimized"
+# 补丁模式下单次生成改用不含优化版简历的模板，优化版简历由补丁子任务并发生成
+MATCH_SINGLE_PATCH_TEMPLATES = {
+    "match_analysis": "match_analysis.analysis",
+    "match_analysis.core": "match_analysis.analysis_core",
+}
+
+# 学习蓝图尚未生成时保存在 skill_mastery_blueprints 中的标记
+BLUEPRINTS_PENDING = {"status": "pending"}
 
 class AIService:
     def __init__(self):
         self.default_api_key = settings.OPENAI_API_KEY
         self.default_api_base = settings.OPENAI_API_BASE
         self.default_model = settings.OPENAI_MODEL
-        self._client = None
-        self._current_model = None
-        self._client_type = "openai"  # openai 或 anthropic
+        # 合并并发的相同请求（双击、多标签页、重复解析同一 JD）
+        self._singleflight = SingleFlight()
+
+    async def aclose(self):
+        """关闭共享连接池（应用退出时调用）"""
+        await ai_registry.aclose()
 
     def _get_active_config(self):
-        """从数据库获取当前激活的配置"""
-        db = SessionLocal()
-        try:
-            active_config = db.query(AIConfig).filter(AIConfig.is_active == True).first()
-            if active_config:
-                return {
-                    "api_key": active_config.api_key,
-                    "api_base": active_config.api_base or "https://api.openai.com/v1",
-                    "model": active_config.model_name,
-                    "provider": active_config.provider
-                }
-        except Exception as e:
-            logging.error(f"从数据库获取 AI 配置失败: {e}")
-        finally:
-            db.close()
-        
-        # 回退到环境变量
-        return {
-            "api_key": self.default_api_key,
-            "api_base": self.default_api_base,
-            "model": self.default_model,
-            "provider": "OpenAI"
-        }
+        """获取当前激活的配置（由注册表缓存，配置变更时按版本戳失效）"""
+        return ai_registry.get_active_config()
 
     def _refresh_client(self):
-        """刷新 AI 客户端"""
+        """
+        获取当前激活配置对应的长期客户端
+
+        Returns:
+            (配置, 客户端类型 openai/anthropic, SDK 客户端)
+        """
         config = self._get_active_config()
-        
-        # 判断是否为 AnyRouter (通常使用 OpenAI 协议)
-        is_anyrouter = "anyrouter" in config.get("api_base", "").lower() or "anyrouter" in config.get("provider", "").lower()
-        
-        # 判断是否使用独立的 Anthropic SDK
-        is_claude_sdk = not is_anyrouter and (
-            "anthropic" in config.get("provider", "").lower() or
-            "claude" in config.get("model", "").lower()
+        client_type, client = ai_registry.get_client(config)
+        return config, client_type, client
+
+    async def analyze_screenshot_image(self, data: bytes):
+        """
+        分析职位截图的原始字节
+
+        先在线程中缩放并重新编码图片，再按解码后像素的指纹查询缓存；
+        像素完全相同的截图直接返回上次的解析结果。
+
+        Raises:
+            InvalidImageError: 内容不是可识别的图片
+        """
+        image = await asyncio.to_thread(prepare_screenshot, data)
+        cached = screenshot_cache.get(image)
+        if cached is not None:
+            logging.info(f"截图缓存命中: {image.fingerprint[:16]}")
+            trace = ai_telemetry.trace("job_screenshot", self._get_active_config()["model"], 0)
+            ai_telemetry.finish(trace, CALL_OK, cache_hit=True)
+            return dict(cached)
+        logging.info(
+            f"截图预处理: {image.original_bytes} -> {len(image.data)} 字节，{image.width}x{image.height}"
         )
-        
-        if is_claude_sdk and ANTHROPIC_AVAILABLE:
-            self._client_type = "anthropic"
-            self._client = Anthropic(
-                api_key=config["api_key"],
-                base_url=config["api_base"]
-            )
-            logging.info(f"使用 Anthropic SDK，模型: {config['model']}")
-        else:
-            self._client_type = "openai"
-            # 修正 AnyRouter 的 base_url，确保包含 /v1
-            base_url = config["api_base"]
-            if is_anyrouter and base_url and not base_url.endswith("/v1"):
-                base_url = f"{base_url.rstrip('/')}/v1"
-                
-            self._client = OpenAI(
-                api_key=config["api_key"],
-                base_url=base_url
-            )
-            logging.info(f"使用 OpenAI 兼容 SDK，提供商: {config['provider']}，模型: {config['model']}，地址: {base_url}")
-        
-        self._current_model = config["model"]
-        return self._client, self._current_model
+        result = await self.analyze_job_screenshot(base64.b64encode(image.data).decode("ascii"), image.media_type)
+        if isinstance(result, dict) and "error" not in result:
+            screenshot_cache.set(image, result)
+        return result
 
-    async def analyze_job_screenshot(self, image_base64: str):
+    async def analyze_job_screenshot(self, image_base64: str, media_type: str = "image/jpeg"):
         """通过截图分析职位 JD 内容"""
-        client, model = self._refresh_client()
+        config, client_type, client = self._refresh_client()
+        model = config["model"]
         try:
-            logging.info(f"开始分析截图，模型: {model}，客户端类型: {self._client_type}")
+            logging.info(f"开始分析截图，模型: {model}，客户端类型: {client_type}")
             
-            if self._client_type == "anthropic":
+            if client_type == "anthropic":
                 # Claude Vision API
-                response = client.messages.create(
+                response = await client.messages.create(
                     model=model,
                     max_tokens=8192,
                     system="你是一个专业的招聘专家和 OCR 助手。请从用户提供的图片（职位详情截图）中提取出完整的职位名称、公司名称、职位描述（包括职责、要求、薪资、地点等）。请务必以 JSON 格式输出，包含 job_title, company, description 三个核心字段。",
@@ -106,7 +149,7 @@ class AIService:
                                     "type": "image",
                                     "source": {
                                         "type": "base64",
-                                        "media_type": "image/jpeg",
+                                        "media_type": media_type,
                                         "data": image_base64
                                     }
                                 }
@@ -118,7 +161,7 @@ class AIService:
                 content = response.content[0].text
             else:
                 # OpenAI Vision API
-                response = client.chat.completions.create(
+                response = await client.chat.completions.create(
                     model=model,
                     messages=[
                         {
@@ -132,7 +175,7 @@ class AIService:
                                 {
                                     "type": "image_url",
                                     "image_url": {
-                                        "url": f"data:image/jpeg;base64,{image_base64}"
+                                        "url": f"data:{media_type};base64,{image_base64}"
                                     }
                                 }
                             ]
@@ -145,11 +188,10 @@ class AIService:
             
             logging.info(f"AI 原始回复: {content}")
             
-            # 处理可能存在的 markdown 代码块
-            if "```" in content:
-                content = content.split("```")[1].replace("json", "").strip()
-            
-            result = json.loads(content)
+            # 跳过可能存在的 markdown 代码块与说明文字
+            result, _ = parse_json_output(content)
+            if result is None:
+                raise ValueError("截图分析结果不是合法的 JSON")
             
             # 字段映射增强，确保兼容不同 AI 的命名习惯
             title = result.get("job_title") or result.get("title") or result.get("职位名称") or "从截图解析的职位"
@@ -171,294 +213,727 @@ class AIService:
             logging.error(traceback.format_exc())
             return None
 
-    async def parse_resume_text(self, text: str):
-        """解析简历文本"""
-        prompt = f"""
-        【任务指令】
-        1. 请全面审视简历文本，特别是开头部分，寻找姓名、电话、邮箱和居住地。
-        2. 电话通常是 11 位数字，邮箱包含 @ 符号，姓名通常在最前面。
-        3. 请将提取的信息严格按照以下 JSON 格式输出。
-        4. 如果某个字段确实无法在文中找到，请留空，但不能轻易放弃寻找。
-
-        【简历文本内容】
-        {text}
-
-        【输出要求的 JSON 格式】
-        {{
-            "personal_info": {{
-                "name": "",
-                "phone": "",
-                "email": "",
-                "location": "",
-                "summary": "个人总结/评价"
-            }},
-            "education": [
-                {{
-                    "school": "",
-                    "major": "",
-                    "degree": "",
-                    "start_date": "",
-                    "end_date": ""
-                }}
-            ],
-            "work_experience": [
-                {{
-                    "company": "",
-                    "position": "",
-                    "duration": "起止时间",
-                    "description": "职责概况（一段话）",
-                    "achievements": ["关键成就点1", "关键成就点2", "必须完整保留原简历中的所有细节工作内容"]
-                }}
-            ],
-            "project_experience": [
-                {{
-                    "name": "项目名称",
-                    "role": "项目岗位",
-                    "duration": "起止时间",
-                    "description": "项目面临的挑战与技术难度（背景）",
-                    "actions": ["我采取的关键技术方案/行动1", "行动2", "必须全量提取，不能丢失任何技术动作"],
-                    "results": "最终实现的业务价值 or 技术指标（必须包含原有的所有成果描述）"
-                }}
-            ],
-            "skills_sections": [
-                {{
-                    "category": "技术领域",
-                    "skills": ["实打实的技能1", "技能2"]
-                }}
-            ],
-            "others": {{
-                "certifications": ["证书1", "证书2", "如：PMP、CISSP、英语等级等"],
-                "awards": ["奖项1", "奖项2"],
-                "publications": ["论文/出版物1"]
-            }}
-        }}
-        """
-        return await self._call_ai(prompt)
-
-    async def parse_job_description(self, text: str):
-        """解析职位 JD"""
-        prompt = f"""
-        【任务指令】
-        请从以下职位描述中提取关键信息，并按 JSON 格式输出。
-
-        【职位描述】
-        {text}
-
-        【输出要求的 JSON 格式】
-        {{
-            "job_title": "",
-            "company": "",
-            "location": "",
-            "salary_range": "",
-            "requirements": {{
-                "education": "",
-                "experience_years": "",
-                "skills": [],
-                "certifications": [],
-                "other": []
-            }},
-            "responsibilities": [],
-            "benefits": [],
-            "keywords": []
-        }}
-        """
-        return await self._call_ai(prompt)
-
-    async def analyze_resume_job_match(self, resume_data: dict, job_data: dict, job_description: str):
-        """分析简历与职位的匹配度"""
-        prompt = f"""
-        【任务指令】
-        请作为一名资深 HR 和简历优化专家，深度分析以下简历与职位的匹配程度。
-        
-        你的目标是：
-        1. 给出精准的匹配评分和多维度分析。
-        2. 提供**具体、可落地、带有专业话术**的改进建议。
-        3. 输出一份“优化版简历预览内容”。**核心禁令：禁止概括！禁止浓缩！禁止删除！** 
-        
-        【批注式优化要求】
-        - 你必须**完整复制**原简历中的每一段工作经历（包括所有 achievements）和项目描述（包括所有 actions 和 results）。
-        - 你的优化必须是“增量式”或“抛光式”的：在保留原句的基础上，直接在合适的位置插入关键词、扩充量化成果、或润色表达。
-        - 严禁对原始简历中的技术细节进行任何模糊化处理。
-        - 必须使用 [[ADD]]新内容[[/ADD]] 标识**新增**的内容。
-        - 必须使用 [[MOD]]优化后内容[[/MOD]] 标识对**原句**的润色（必须保留原意，严禁改变事实）。
-        - 如果某段内容原本就很好，请原封不动地保留。
-        - 最终输出的预览内容量级应与原简历对齐，且带有优化增量。
-
-        【输出要求 - 非常重要】
-        - 预览内容必须按照以下顺序逐一呈现，不得跳过其中任何一项：
-          1. 【个人简介】
-          2. 【工作经历】：请逐个列出原简历中的每一家公司及职位。如果在某一段经历中没有建议，请原样完整保留所有描述。
-          3. 【项目经验】：请逐个列出原简历中的每一个项目，禁止合并！
-          4. 【技能清单】：保留原有的所有技能点，并加入 [[ADD]] 补充项。
-          5. 【教育背景】：确保学校、专业、学位信息完整，并根据职位需求 [[ADD]] 相关主修课程或奖学金。
-          6. 【荣誉认证】：列出所有资质证书与奖项，针对职位需求 [[ADD]] 缺失但建议考取的证书。
-        - 严禁使用诸如“...（其余内容同原简历）...”之类的缩略语。
-
-        【简历信息】
-        {json.dumps(resume_data, ensure_ascii=False, indent=2)}
-
-        【职位要求】
-        {json.dumps(job_data, ensure_ascii=False, indent=2)}
-
-        【原始职位描述】
-        {job_description[:2000]}
-
-        【输出要求的 JSON 格式】
-        {{
-            "match_score": 85,
-            "analysis": {{
-                "strengths": ["优势1", "优势2"],
-                "weaknesses": ["不足1", "不足2"],
-                "skill_match": {{
-                    "matched": ["技能1", "技能2"],
-                    "missing": ["缺失技能1"]
-                }},
-                "experience_match": "针对职位的经验契合度深度点评",
-                "education_match": "学历与背景匹配分析"
-            }},
-            "skill_mastery_blueprints": [
-                {{
-                    "skill": "核心缺失技能名称",
-                    "priority": "优先级(高/中/低)",
-                    "gap_description": "明确指出 JD 中的具体要求 vs 你当前的差距",
-                    "learning_path": {{
-                        "stage1_theory": {{
-                            "title": "原理研习：攻克知识盲区",
-                            "points": ["核心考点1", "核心考点2"],
-                            "resources": ["具体书名/文档章节/高质量课程名"]
-                        }},
-                        "stage2_practice": {{
-                            "title": "实战动手：构建 Demo 验证",
-                            "task": "描述一个具有技术含量的实验任务",
-                            "tech_stack": ["推荐使用的技术栈"]
-                        }},
-                        "stage3_project": {{
-                            "title": "项目升华：打造简历亮点",
-                            "project_name": "建议的项目名称",
-                            "implementation": "详细的项目实现思路，如何解决 JD 中的痛点",
-                            "resume_bullet": "直接可用的简历描述话术（含量化指标）"
-                        }}
-                    }},
-                    "interview_prep": {{
-                        "critical_question": "针对该技能，面试官最可能问的深度问题",
-                        "answer_strategy": "针对性回答思路和重点"
-                    }}
-                }}
-            ],
-            "suggestions": [
-                {{
-                    "category": "分类（如：项目润色、技能补全）",
-                    "content": "具体改进建议",
-                    "template": "推荐使用的专业话术描述"
-                }}
-            ],
-            "optimized_resume": "包含 [[ADD]] 和 [[MOD]] 标记的完整/核心段落优化版简历文本",
-            "optimized_summary": "针对该职位优化后的个人简介（含标记）"
-        }}
-        """
-        return await self._call_ai(prompt)
-
-    async def _call_ai(self, prompt: str):
-        """统一的 AI 调用方法，带有深度监控与自动回退"""
-        client, model = self._refresh_client()
-        config = self._get_active_config()
-        
-        # 监控记录
+    async def parse_resume_text(self, text: str, use_cache: bool = True):
+        """
+        解析简历文本
+
+        先用本地规则提取手机号、邮箱、姓名、学校等确定性字段，作为提示传给模型，解析完成后回填。
+        RESUME_PARSE_MODE 为 sectioned 或 auto（且文本较长）时，先在本地按小标题分段，
+        各段用小提示词并行解析后合并；识别不到足够的段落、切分结果可疑（同类小标题重复、
+        小标题下没有正文）或任一段失败时退回整篇解析。
+        """
+        hints = extract_resume_hints(text)
+        result = None
+        mode = settings.RESUME_PARSE_MODE
+        if mode != "single":
+            sections = split_resume_sections(text)
+            found = recognized_sections(sections)
+            long_enough = mode == "sectioned" or len(text) >= settings.RESUME_SECTION_MIN_CHARS
+            if long_enough and len(found) >= 2 and not split_looks_valid(text):
+                logging.warning(f"简历小标题切分可疑（{', '.join(found)}），退回整篇解析")
+            elif long_enough and len(found) >= 2:
+                result = await self._parse_resume_sections(text, sections, hints, use_cache)
+                if result is None:
+                    logging.warning("简历分段解析失败，退回整篇解析")
+        if result is None:
+            result = await self._parse_resume_whole(text, hints, use_cache)
+        return apply_resume_hints(result, hints) if result else result
+
+    @staticmethod
+    def _resume_hints_json(hints: dict, fields: tuple = ("personal_info", "education")) -> str:
+        """本地已提取字段的紧凑 JSON，没有可用字段时返回空串"""
+        known = {field: hints[field] for field in fields if hints.get(field)}
+        return to_compact_json(known) if known else ""
+
+    async def _parse_resume_sections(self, text: str, sections: dict, hints: dict, use_cache: bool):
+        """并行解析各段落并合并为完整的 parsed_data 结构"""
         start_time = time.time()
-        task_id = f"AI_{int(start_time)}"
-        log_file = "app_ai_monitor.log"
-        
-        def monitor_log(msg):
-            with open(log_file, "a", encoding="utf-8") as f:
-                date_str = time.strftime("%Y-%m-%d %H:%M:%S")
-                f.write(f"[{date_str}] [{task_id}] [{model}] {msg}\n")
-        
-        monitor_log(f"开始 AI 请求 - 提示词长度: {len(prompt)}")
-        
-        try:
-            if self._client_type == "anthropic":
-                monitor_log("执行方式: Anthropic Native SDK")
-                response = client.messages.create(
-                    model=model,
-                    max_tokens=8192,
-                    system="你是一个专业的 HR 和职业规划专家。请严格按照要求的 JSON 格式输出。确保输出的是合法的 JSON 字符串，不要包含任何额外的解释文字。",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.1
+        jobs = {}
+        for field, section_names in RESUME_SECTION_FIELDS.items():
+            body = "\n".join(sections[name] for name in section_names if name in sections)
+            if field == "personal_info" and len(sections.get(SECTION_HEADER, "")) < 20:
+                # 没有明显的开头段落时，姓名与联系方式通常仍在全文开头
+                body = text[:RESUME_HEADER_FALLBACK_CHARS] + ("\n" + sections[SECTION_SUMMARY] if SECTION_SUMMARY in sections else "")
+            if body.strip():
+                prompt = prompt_registry.render(
+                    f"resume_parse.{field}", body=body,
+                    hints=self._resume_hints_json(hints, (field,)) if field in ("personal_info", "education") else ""
                 )
-                content = response.content[0].text
-            else:
-                monitor_log(f"执行方式: OpenAI Compatible SDK (Base: {client.base_url})")
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": "你是一个专业的 HR 和职业规划专家。请严格按照要求的 JSON 格式输出。不要在 JSON 之外包含任何解释性文字。"},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.1,
-                    max_tokens=8192,
-                    response_format={"type": "json_object"} if "vision" not in model.lower() else None
-                )
-                content = response.choices[0].message.content
-            
-            duration = time.time() - start_time
-            monitor_log(f"请求成功 - 耗时: {duration:.2f}s，响应长度: {len(content)}")
-            
-            # 使用正则表达式更鲁棒地提取 JSON 内容
-            json_match = re.search(r'(\{.*\})', content, re.DOTALL)
-            extracted_content = json_match.group(1) if json_match else content.strip()
-            
-            # 基础清理
-            if extracted_content.startswith("```"):
-                lines = extracted_content.split('\n')
-                if lines[0].startswith("```"): lines = lines[1:]
-                if lines[-1].strip() == "```": lines = lines[:-1]
-                extracted_content = '\n'.join(lines).strip()
-            
+                jobs[field] = self._call_ai(prompt, use_cache=use_cache)
+
+        fields = list(jobs)
+        results = await asyncio.gather(*jobs.values())
+
+        merged = {
+            "personal_info": {"name": "", "phone": "", "email": "", "location": "", "summary": ""},
+            "education": [],
+            "work_experience": [],
+            "project_experience": [],
+            "skills_sections": [],
+            "others": {"certifications": [], "awards": [], "publications": []}
+        }
+        for field, result in zip(fields, results):
+            if not result or field not in result:
+                logging.warning(f"简历分段解析失败: {field}")
+                return None
+            value = result[field]
+            if isinstance(merged[field], dict) and isinstance(value, dict):
+                merged[field].update(value)
+            elif isinstance(merged[field], list) and isinstance(value, list):
+                merged[field] = value
+        logging.info(f"简历分段并行解析完成: {len(fields)} 段，耗时 {time.time() - start_time:.2f}s")
+        return merged
+
+    async def _parse_resume_whole(self, text: str, hints: dict, use_cache: bool = True):
+        """整篇解析简历文本"""
+        prompt = prompt_registry.render("resume_parse", text=text, hints=self._resume_hints_json(hints))
+        return await self._call_ai(prompt, use_cache=use_cache)
+
+    async def parse_job_description(self, text: str, use_cache: bool = True, priority: int = None):
+        """
+        解析职位 JD
+
+        Args:
+            priority: 调度优先级，批量采集解析时传入 PRIORITY_BULK
+        """
+        return await self._call_ai(prompt_registry.render("jd_parse", text=text), use_cache=use_cache, priority=priority)
+
+    async def parse_job_descriptions_batch(self, descriptions: dict, use_cache: bool = True, priority: int = PRIORITY_BULK) -> dict:
+        """
+        批量解析多个 JD
+
+        先逐条查询单条解析的缓存；未命中的按 token 预算打包，每包一次请求，各包并发。
+        只有解析失败或在输出中缺失的条目会被重新排队，且下一轮每包条数减半。
+
+        Args:
+            descriptions: 职位 ID -> JD 文本
+
+        Returns:
+            职位 ID -> 解析结果（最终仍失败的为 None）
+        """
+        # 批量结果即使来自对冲或回退的模型，也记在首选模型的单条缓存键下：批量请求一次覆盖多条，
+        # 无法逐条区分作答模型；各配置按同一输出结构解析 JD，混用只影响措辞，不影响字段
+        model = self._routed_model()
+        results = {job_id: None for job_id in descriptions}
+        cache_keys = {
+            job_id: self._cache_key(prompt_registry.render("jd_parse", text=text), model, 0.1)
+            for job_id, text in descriptions.items()
+        }
+
+        pending = []
+        for job_id, text in descriptions.items():
+            if not (text or "").strip():
+                continue
+            if use_cache and llm_cache.enabled_for("jd_parse"):
+                cached = await llm_cache.get(cache_keys[job_id], "jd_parse")
+                if cached is not None:
+                    results[job_id] = cached
+                    continue
+            pending.append(job_id)
+
+        max_items = settings.JD_BATCH_MAX_ITEMS
+        calls = 0
+        for round_no in range(settings.JD_BATCH_MAX_ROUNDS):
+            if not pending:
+                break
+            batches = self._pack_jd_batches(pending, descriptions, max_items)
+            calls += len(batches)
+            outcomes = await asyncio.gather(*(self._parse_jd_batch(batch, descriptions, priority) for batch in batches))
+
+            pending = []
+            for batch, outcome in zip(batches, outcomes):
+                for job_id in batch:
+                    parsed = outcome.get(job_id)
+                    if parsed is None:
+                        pending.append(job_id)
+                        continue
+                    results[job_id] = parsed
+                    if llm_cache.enabled_for("jd_parse"):
+                        await llm_cache.set(cache_keys[job_id], "jd_parse", parsed)
+            if pending:
+                logging.warning(f"批量 JD 解析第 {round_no + 1} 轮有 {len(pending)} 条失败，重新排队")
+            max_items = max(1, max_items // 2)
+
+        logging.info(f"批量 JD 解析完成: 共 {len(descriptions)} 条，请求 {calls} 次，失败 {sum(1 for v in results.values() if v is None)} 条")
+        return results
+
+    def _pack_jd_batches(self, job_ids: list, descriptions: dict, max_items: int) -> list:
+        """按输入 token 预算与条数上限贪心打包，超长的 JD 单独成包"""
+        batches, current, current_tokens = [], [], 0
+        for job_id in job_ids:
+            tokens = estimate_tokens(descriptions[job_id])
+            if current and (current_tokens + tokens > settings.JD_BATCH_TOKEN_BUDGET or len(current) >= max_items):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(job_id)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _parse_jd_batch(self, batch: list, descriptions: dict, priority: int) -> dict:
+        """
+        一次请求解析一包 JD
+
+        Returns:
+            职位 ID -> 解析结果，缺失或格式不对的条目不出现在结果中
+        """
+        if len(batch) == 1:
+            job_id = batch[0]
+            parsed = await self.parse_job_description(descriptions[job_id], use_cache=False, priority=priority)
+            return {job_id: parsed} if isinstance(parsed, dict) else {}
+
+        # 提示词中用短序号代替职位 ID，节省 token
+        items = [{"id": str(i + 1), "text": compact_text(descriptions[job_id])} for i, job_id in enumerate(batch)]
+        prompt = prompt_registry.render("jd_parse_batch", items=to_compact_json(items))
+        output = await self._call_ai(prompt, use_cache=False, priority=priority)
+        parsed = {}
+        for entry in (output or {}).get("results") or []:
+            if not isinstance(entry, dict) or not isinstance(entry.get("data"), dict):
+                continue
             try:
-                result = json.loads(extracted_content)
-                monitor_log("JSON 解析成功")
+                index = int(entry.get("id")) - 1
+            except (TypeError, ValueError):
+                continue
+            if 0 <= index < len(batch):
+                parsed[batch[index]] = entry["data"]
+        return parsed
+
+    async def analyze_resume_job_match(self, resume_data: dict, job_data: dict, job_description: str,
+                                       use_cache: bool = True, include_blueprints: bool = None):
+        """
+        分析简历与职位的匹配度
+
+        MATCH_ANALYSIS_MODE 为 decomposed 时，评分、改进建议、学习蓝图与优化版简历各用更小的输出结构
+        并发请求后合并，总耗时接近最慢的子任务而不是各部分之和；评分子任务失败时退回单次生成。
+        单次生成在 RESUME_OUTPUT_MODE 为 patch 时，优化版简历同样走补丁子任务（见 _match_single）。
+        include_blueprints 默认取 not MATCH_BLUEPRINTS_LAZY，为 False 时结果中不含 skill_mastery_blueprints，
+        由 generate_skill_blueprints 按需生成。
+        """
+        sections = self._build_match_sections(resume_data, job_data, job_description)
+        single, names = self._match_templates(include_blueprints)
+        if settings.MATCH_ANALYSIS_MODE == "decomposed":
+            start_time = time.time()
+            parts = await asyncio.gather(*(
+                self._run_match_subtask(name, sections, resume_data, use_cache) for name in names
+            ))
+            result = {}
+            for name, part in zip(names, parts):
+                result.update(self._match_part_fields(name, part))
+            if "match_score" in result:
+                logging.info(f"匹配分析分解模式完成: {len(names)} 个子任务，耗时 {time.time() - start_time:.2f}s")
                 return result
-            except json.JSONDecodeError as je:
-                monitor_log(f"JSON 解析失败: {str(je)}")
-                # 尝试修复尾部
-                last_brace = extracted_content.rfind('}')
-                if last_brace != -1:
-                    try:
-                        result = json.loads(extracted_content[:last_brace+1])
-                        monitor_log("JSON 尾部修复解析成功")
-                        return result
-                    except: pass
-                
-                # 保存错误样本
-                with open(f"debug_error_{task_id}.txt", "w", encoding="utf-8") as f:
-                    f.write(content)
-                return None
-                
+            logging.warning("匹配分析评分子任务失败，退回单次生成")
+        return await self._match_single(single, sections, resume_data, use_cache)
+
+    async def _match_single(self, single: str, sections: dict, resume_data: dict, use_cache: bool):
+        """
+        单次生成匹配分析
+
+        RESUME_OUTPUT_MODE 为 patch 时拆成两个并发请求：一次生成评分、建议等全部分析字段，
+        一次只输出对原简历的编辑操作，避免模型在单次生成里重写整份带批注的简历。
+        """
+        if settings.RESUME_OUTPUT_MODE != "patch":
+            return await self._call_ai(prompt_registry.render(single, **sections), use_cache=use_cache)
+        analysis, optimized = await asyncio.gather(
+            self._call_ai(prompt_registry.render(MATCH_SINGLE_PATCH_TEMPLATES[single], **sections), use_cache=use_cache),
+            self._run_match_subtask(MATCH_OPTIMIZED_SUBTASK, sections, resume_data, use_cache),
+        )
+        if not isinstance(analysis, dict):
+            return analysis
+        return {**analysis, **self._match_part_fields(MATCH_OPTIMIZED_SUBTASK, optimized)}
+
+    async def _run_match_subtask(self, name: str, sections: dict, resume_data: dict, use_cache: bool):
+        """
+        执行一个匹配分析子任务
+
+        RESUME_OUTPUT_MODE 为 patch 时，优化版简历只让模型输出针对原简历的编辑操作，
+        本地应用后渲染为带批注的预览文本；补丁输出无效时退回整篇生成。
+        """
+        if name == MATCH_OPTIMIZED_SUBTASK and settings.RESUME_OUTPUT_MODE == "patch":
+            part = await self._call_ai(prompt_registry.render("match_analysis.optimized_patch", **sections), use_cache=use_cache)
+            ops = part.get("ops") if isinstance(part, dict) else None
+            if isinstance(ops, list):
+                patched = apply_resume_patch(resume_data, ops)
+                return {"optimized_resume": render_marked_resume(patched.marked)}
+            logging.warning("优化版简历补丁输出无效，退回整篇生成")
+        return await self._call_ai(prompt_registry.render(name, **sections), use_cache=use_cache)
+
+    async def generate_skill_blueprints(self, resume_data: dict, job_data: dict, job_description: str, use_cache: bool = True):
+        """
+        单独生成技能学习蓝图（与分解模式的蓝图子任务共用模板与响应缓存）
+
+        Returns:
+            蓝图列表；失败时返回 None
+        """
+        sections = self._build_match_sections(resume_data, job_data, job_description)
+        part = await self._call_ai(prompt_registry.render(MATCH_BLUEPRINTS_SUBTASK, **sections), use_cache=use_cache)
+        blueprints = part.get("skill_mastery_blueprints") if isinstance(part, dict) else None
+        return blueprints if isinstance(blueprints, list) else None
+
+    @staticmethod
+    def _match_templates(include_blueprints: bool = None):
+        """返回 (单次生成的模板名, 分解模式的子模板名列表)"""
+        if include_blueprints is None:
+            include_blueprints = not settings.MATCH_BLUEPRINTS_LAZY
+        if include_blueprints:
+            return "match_analysis", list(MATCH_SUBTASK_FIELDS)
+        return "match_analysis.core", [name for name in MATCH_SUBTASK_FIELDS if name != MATCH_BLUEPRINTS_SUBTASK]
+
+    @staticmethod
+    def _match_part_fields(name: str, part) -> dict:
+        """取出子任务负责的字段；评分子任务失败时返回空字典，其余子任务失败时填充空值"""
+        fields = MATCH_SUBTASK_FIELDS[name]
+        if not isinstance(part, dict) or fields[0] not in part:
+            logging.warning(f"匹配分析子任务失败: {name}")
+            if "match_score" in fields:
+                return {}
+            return {field: MATCH_FIELD_DEFAULTS[field] for field in fields if field in MATCH_FIELD_DEFAULTS}
+        return {field: part.get(field, MATCH_FIELD_DEFAULTS.get(field)) for field in fields}
+
+    async def stream_resume_job_match(self, resume_data: dict, job_data: dict, job_description: str,
+                                      use_cache: bool = True, include_blueprints: bool = None):
+        """
+        流式分析简历与职位的匹配度
+
+        逐个产出 JSONEvent：顶层字段闭合时为 field，数组字段中的元素闭合时为 item，
+        最后产出 kind 为 STREAM_RESULT 的完整结果；完全失败时其 value 为 None。
+        分解模式下每个子任务完成时产出其负责的字段；单次生成在补丁模式下先流式产出分析字段，
+        优化版简历由并发的补丁子任务生成，在分析字段之后产出。
+        """
+        sections = self._build_match_sections(resume_data, job_data, job_description)
+        single, names = self._match_templates(include_blueprints)
+        if settings.MATCH_ANALYSIS_MODE == "decomposed":
+            async for event in self._stream_match_decomposed(sections, resume_data, single, names, use_cache):
+                yield event
+            return
+
+        if settings.RESUME_OUTPUT_MODE != "patch":
+            async for event in self._stream_match_prompt(prompt_registry.render(single, **sections), use_cache):
+                yield event
+            return
+
+        # 补丁模式：流式生成分析字段，同时并发请求优化版简历的补丁，分析字段结束后再产出优化版简历
+        optimized = asyncio.ensure_future(
+            self._run_match_subtask(MATCH_OPTIMIZED_SUBTASK, sections, resume_data, use_cache)
+        )
+        try:
+            result = None
+            prompt = prompt_registry.render(MATCH_SINGLE_PATCH_TEMPLATES[single], **sections)
+            async for event in self._stream_match_prompt(prompt, use_cache):
+                if event.kind == STREAM_RESULT:
+                    result = event.value
+                else:
+                    yield event
+            if result is None:
+                yield JSONEvent(STREAM_RESULT, (), None)
+                return
+            result = dict(result)
+            for key, value in self._match_part_fields(MATCH_OPTIMIZED_SUBTASK, await optimized).items():
+                result[key] = value
+                yield JSONEvent("field", (key,), value)
+            yield JSONEvent(STREAM_RESULT, (), result)
+        finally:
+            if not optimized.done():
+                optimized.cancel()
+
+    async def _stream_match_prompt(self, prompt: Prompt, use_cache: bool):
+        """流式请求一个匹配分析提示词，产出字段事件与完整结果（带响应缓存，流式失败时退回普通请求）"""
+        task = prompt.task
+        model = self._routed_model()
+        request_key = self._cache_key(prompt, model, 0.1)
+
+        if use_cache and llm_cache.enabled_for(task):
+            cached = await llm_cache.get(request_key, task)
+            if cached is not None:
+                logging.info(f"LLM 缓存命中: 任务={task}")
+                ai_telemetry.finish(ai_telemetry.trace(task, model, len(prompt)), CALL_OK, cache_hit=True)
+                for key, value in cached.items():
+                    yield JSONEvent("field", (key,), value)
+                yield JSONEvent(STREAM_RESULT, (), cached)
+                return
+
+        parser = IncrementalJSONParser()
+        start_time = time.time()
+        trace = ai_telemetry.trace(task, model, len(prompt))
+        trace.attempts = 1
+        try:
+            async for delta in self._stream_ai(prompt, trace=trace):
+                for event in parser.feed(delta):
+                    if event.kind == "field" and len(parser.fields) == 1:
+                        logging.info(f"流式匹配分析首个字段 {event.path[0]} 耗时: {time.time() - start_time:.2f}s")
+                    yield event
         except Exception as e:
-            error_msg = str(e)
-            monitor_log(f"请求阶段异常: {error_msg}")
-            
-            # 如果是 AnyRouter 或 Claude 出错，且当前不是 DeepSeek，尝试回退到环境变量默认模型
-            if config.get("provider") != "OpenAI" and model != settings.OPENAI_MODEL:
-                monitor_log(f"触发自动回退 -> 使用默认模型: {settings.OPENAI_MODEL}")
-                try:
-                    # 使用默认配置回退
-                    fallback_client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_API_BASE)
-                    res = fallback_client.chat.completions.create(
-                        model=settings.OPENAI_MODEL,
-                        messages=[
-                            {"role": "system", "content": "你是一个专业的 HR 和职业规划专家。请严格按照要求的 JSON 格式输出。"},
-                            {"role": "user", "content": prompt}
-                        ],
-                        max_tokens=4096,
-                        response_format={"type": "json_object"}
+            logging.error(f"流式匹配分析异常: {e}")
+            trace.log(f"流式请求异常: {str(e)}")
+        if parser.finished:
+            ai_telemetry.finish(trace, CALL_OK, parse_status=PARSE_OK)
+        else:
+            ai_telemetry.finish(trace, CALL_ERROR, parse_status=PARSE_FAILED)
+
+        result = dict(parser.fields)
+        if not parser.finished:
+            # 流式请求失败或输出不完整，退回普通请求补齐剩余字段
+            logging.warning("流式输出不完整，回退到非流式请求")
+            fallback = await self._call_ai(prompt, use_cache=False)
+            if not fallback:
+                yield JSONEvent(STREAM_RESULT, (), result or None)
+                return
+            for key, value in fallback.items():
+                if key not in result:
+                    result[key] = value
+                    yield JSONEvent("field", (key,), value)
+        elif llm_cache.enabled_for(task):
+            if trace.model != model:
+                # 首选配置熔断时流式请求会发往下一个配置，结果记在实际作答模型的键下
+                request_key = self._cache_key(prompt, trace.model, 0.1)
+            await llm_cache.set(request_key, task, result)
+
+        yield JSONEvent(STREAM_RESULT, (), result)
+
+    async def _stream_match_decomposed(self, sections: dict, resume_data: dict, single: str, names: list, use_cache: bool):
+        """并发请求各子任务，按完成先后产出字段事件，最后产出完整结果"""
+        start_time = time.time()
+
+        async def run(name: str):
+            return name, await self._run_match_subtask(name, sections, resume_data, use_cache)
+
+        tasks = [asyncio.ensure_future(run(name)) for name in names]
+        result = {}
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                name, part = await next_done
+                for key, value in self._match_part_fields(name, part).items():
+                    if isinstance(value, list):
+                        for index, item in enumerate(value):
+                            yield JSONEvent("item", (key, index), item)
+                    result[key] = value
+                    yield JSONEvent("field", (key,), value)
+                    if len(result) == 1:
+                        logging.info(f"流式匹配分析首个字段 {key} 耗时: {time.time() - start_time:.2f}s")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        if "match_score" not in result:
+            logging.warning("匹配分析评分子任务失败，退回单次生成")
+            fallback = await self._match_single(single, sections, resume_data, use_cache=False)
+            if not fallback:
+                yield JSONEvent(STREAM_RESULT, (), None)
+                return
+            for key, value in fallback.items():
+                # 保留已成功的子任务结果，只补齐缺失或为空的字段
+                if not result.get(key):
+                    result[key] = value
+                    yield JSONEvent("field", (key,), value)
+        yield JSONEvent(STREAM_RESULT, (), result)
+
+    def _build_match_sections(self, resume_data: dict, job_data: dict, job_description: str) -> dict:
+        """构建匹配分析的数据分段（紧凑序列化并受 token 预算约束，原始 JD 最先被裁剪）"""
+        return PromptBuilder("match_analysis") \
+            .add("resume", resume_data, priority=3, min_tokens=1500) \
+            .add("job", job_data, priority=2, min_tokens=300) \
+            .add("job_description", job_description, priority=1, max_tokens=1500,
+                 baseline=(job_description or "")[:2000]) \
+            .build()
+
+    async def _call_ai(self, prompt, task: str = "general", use_cache: bool = True, temperature: float = 0.1, priority: int = None):
+        """
+        统一的 AI 调用入口，带有并发合并与响应缓存
+
+        Args:
+            prompt: prompt_registry 渲染出的 Prompt；也可传入整段字符串（没有可缓存的固定前缀）
+            task: 仅对字符串提示词生效的任务类型，Prompt 自带任务类型与模板版本
+            use_cache: 为 False 时跳过缓存读取，强制重新请求
+            temperature: 采样温度
+            priority: 调度优先级，默认按任务类型取 TASK_PRIORITIES
+        """
+        if isinstance(prompt, str):
+            prompt = prompt_registry.raw(task, prompt)
+        if priority is None:
+            priority = TASK_PRIORITIES.get(prompt.task, PRIORITY_GENERATION)
+        model = self._routed_model()
+        request_key = self._cache_key(prompt, model, temperature)
+        return await self._singleflight.do(
+            f"{request_key}:{int(use_cache)}",
+            lambda: self._call_ai_cached(prompt, model, request_key, use_cache, temperature, priority)
+        )
+
+    @staticmethod
+    def _cache_key(prompt: Prompt, model: str, temperature: float) -> str:
+        return llm_cache.make_key(prompt.task, prompt.version, prompt.text, model, temperature)
+
+    @staticmethod
+    def _routed_model() -> str:
+        """
+        请求将要发往的模型（路由首选且未熔断的配置），用作缓存与并发合并键的一部分
+
+        latency 路由模式下首选配置随延迟变化，不一定是激活配置，因此不能按激活配置的模型取键。
+        """
+        routed = ai_router.candidates()
+        return next((c for c in routed if circuit_breakers.available(c["id"])), routed[0])["model"]
+
+    async def _call_ai_cached(self, prompt: Prompt, model: str, request_key: str, use_cache: bool, temperature: float, priority: int):
+        """
+        读取/回填响应缓存，未命中时请求模型
+
+        对冲或回退使结果来自其他模型时，结果记在实际作答模型的键下，不占用首选模型的键。
+        """
+        task = prompt.task
+        cache_enabled = llm_cache.enabled_for(task)
+        if cache_enabled and use_cache:
+            cached = await llm_cache.get(request_key, task)
+            if cached is not None:
+                logging.info(f"LLM 缓存命中: 任务={task}")
+                trace = ai_telemetry.trace(task, model, len(prompt))
+                ai_telemetry.finish(trace, CALL_OK, cache_hit=True)
+                return cached
+
+        result, parse_status, answered_by = await self._request_ai(prompt, temperature, priority)
+        if parse_status == PARSE_REPAIRED:
+            # 截断后修复出的结果可能缺字段或列表不完整，本次照常返回，但不写入缓存，下次重新请求
+            logging.warning(f"模型输出被截断并已修复，不写入缓存: 任务={task}")
+        elif cache_enabled and result is not None:
+            if answered_by != model:
+                request_key = self._cache_key(prompt, answered_by, temperature)
+            await llm_cache.set(request_key, task, result)
+        return result
+
+    async def _stream_ai(self, prompt: Prompt, temperature: float = 0.1, trace: CallTrace = None):
+        """以流式方式请求模型，逐段产出文本增量（交互优先级，整个流期间占用并发名额）"""
+        routed = ai_router.candidates()
+        config = next((c for c in routed if circuit_breakers.available(c["id"])), None)
+        if config is None:
+            raise CircuitOpenError(routed[0]["id"])
+        client_type, client = ai_registry.get_client(config)
+        model = config["model"]
+        est_tokens = estimate_tokens(prompt.text) + min(EXPECTED_OUTPUT_TOKENS, prompt.max_tokens)
+        usage_source = None
+
+        async with ai_scheduler.slot(config["id"], PRIORITY_INTERACTIVE, est_tokens):
+            circuit_breakers.acquire(config["id"])
+            started = time.monotonic()
+            try:
+                if client_type == "anthropic":
+                    async with client.messages.stream(
+                        model=model,
+                        max_tokens=prompt.max_tokens,
+                        temperature=temperature,
+                        **prompt.anthropic_request()
+                    ) as stream:
+                        async for text in stream.text_stream:
+                            yield text
+                        usage_source = await stream.get_final_message()
+                else:
+                    stream = await client.chat.completions.create(
+                        model=model,
+                        messages=prompt.openai_messages(),
+                        temperature=temperature,
+                        max_tokens=prompt.max_tokens,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                        response_format={"type": "json_object"} if "vision" not in model.lower() else None
                     )
-                    content = res.choices[0].message.content
-                    monitor_log("回退调用成功")
-                    return json.loads(content)
-                except Exception as err:
-                    monitor_log(f"回退调用也失败了: {str(err)}")
-            
-            return None
+                    async for chunk in stream:
+                        if getattr(chunk, "usage", None):
+                            usage_source = chunk
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+            except (asyncio.CancelledError, GeneratorExit):
+                ai_router.record_cancelled(config["id"], time.monotonic() - started)
+                circuit_breakers.record_cancel(config["id"])
+                raise
+            except Exception as e:
+                ai_router.record(config["id"], time.monotonic() - started, False)
+                circuit_breakers.record_failure(config["id"], e)
+                raise
+            ai_router.record(config["id"], time.monotonic() - started, True)
+            circuit_breakers.record_success(config["id"])
+        if usage_source is not None:
+            # 与非流式请求一致，按最后一个数据块（Anthropic 为最终消息）中的实际用量校正 TPM 令牌桶
+            usage = self._usage(usage_source)
+            ai_scheduler.record_usage(config["id"], est_tokens, usage["total_tokens"])
+            if trace is not None:
+                trace.set_usage(config["id"], model, usage)
+
+    async def _complete(self, config: dict, prompt: Prompt, temperature: float, priority: int, est_tokens: int, trace: CallTrace) -> str:
+        """经调度器向指定配置发起一次非流式请求，返回原始文本并记录延迟与熔断统计"""
+        client_type, client = ai_registry.get_client(config)
+        model = config["model"]
+        async with ai_scheduler.slot(config["id"], priority, est_tokens):
+            circuit_breakers.acquire(config["id"])
+            trace.attempts += 1
+            started = time.monotonic()
+            try:
+                if client_type == "anthropic":
+                    response = await client.messages.create(
+                        model=model,
+                        max_tokens=prompt.max_tokens,
+                        temperature=temperature,
+                        **prompt.anthropic_request()
+                    )
+                    content = response.content[0].text
+                else:
+                    response = await client.chat.completions.create(
+                        model=model,
+                        messages=prompt.openai_messages(),
+                        temperature=temperature,
+                        max_tokens=prompt.max_tokens,
+                        response_format={"type": "json_object"} if "vision" not in model.lower() else None
+                    )
+                    content = response.choices[0].message.content
+            except asyncio.CancelledError:
+                # 对冲落败或调用方取消：已等待的时长是这次请求延迟的下限
+                ai_router.record_cancelled(config["id"], time.monotonic() - started)
+                circuit_breakers.record_cancel(config["id"])
+                raise
+            except Exception as e:
+                ai_router.record(config["id"], time.monotonic() - started, False)
+                circuit_breakers.record_failure(config["id"], e)
+                raise
+            ai_router.record(config["id"], time.monotonic() - started, True)
+            circuit_breakers.record_success(config["id"])
+        usage = self._usage(response)
+        trace.set_usage(config["id"], model, usage)
+        ai_scheduler.record_usage(config["id"], est_tokens, usage["total_tokens"])
+        return content
+
+    async def _complete_hedged(self, candidates: list, prompt: Prompt, temperature: float, priority: int, est_tokens: int, trace: CallTrace, tried: set) -> str:
+        """
+        向首选配置发起请求；开启对冲时，若超过其 p95 仍未返回，
+        再向次选配置发起同样的请求，取先成功的结果并取消另一个
+        """
+        primary = candidates[0]
+        tried.add(primary["id"])
+        delay = ai_router.hedge_delay(primary["id"]) if len(candidates) > 1 else None
+        if delay is None:
+            return await self._complete(primary, prompt, temperature, priority, est_tokens, trace)
+
+        first = asyncio.ensure_future(self._complete(primary, prompt, temperature, priority, est_tokens, trace))
+        second = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done:
+                return first.result()
+
+            backup = candidates[1]
+            tried.add(backup["id"])
+            trace.log(f"主请求超过 {delay:.1f}s 未返回，对冲请求 -> {backup['model']}")
+            trace.hedged = True
+            ai_router.hedges_launched += 1
+            second = asyncio.ensure_future(self._complete(backup, prompt, temperature, priority, est_tokens, trace))
+            pending = {first, second}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            ai_router.hedges_won += 1
+                            trace.log("对冲请求先返回")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _complete_failover(self, chain: list, prompt: Prompt, temperature: float, priority: int, est_tokens: int, trace: CallTrace) -> str:
+        """按顺序尝试候选配置，前一个失败（或已熔断）时立即切换到下一个"""
+        tried = set()
+        error = None
+        for i, config in enumerate(chain):
+            if config["id"] in tried:
+                continue
+            if i > 0:
+                trace.log(f"切换到下一个配置: {config.get('provider')} / {config['model']}")
+            try:
+                return await self._complete_hedged(chain[i:], prompt, temperature, priority, est_tokens, trace, tried)
+            except Exception as e:
+                error = e
+                trace.log(f"请求阶段异常: {str(e)}")
+        raise error
+
+    async def _request_ai(self, prompt: Prompt, temperature: float = 0.1, priority: int = PRIORITY_GENERATION):
+        """
+        向模型发起请求（经路由选择配置、调度器限流排队、跳过已熔断配置），带有遥测记录与自动回退
+
+        Returns:
+            (解析结果, 解析状态, 实际作答的模型)；请求失败时解析状态为 None，解析失败时为 PARSE_FAILED
+        """
+        routed = ai_router.candidates()
+        chain = [c for c in routed if circuit_breakers.available(c["id"])]
+        config = routed[0]
+        model = config["model"]
+        est_tokens = estimate_tokens(prompt.text) + min(EXPECTED_OUTPUT_TOKENS, prompt.max_tokens)
+
+        # 如果是 AnyRouter 或 Claude，且当前不是 DeepSeek，最后回退到环境变量默认模型
+        if config.get("provider") != "OpenAI" and model != settings.OPENAI_MODEL:
+            if circuit_breakers.available(ENV_CONFIG_ID) and all(c["id"] != ENV_CONFIG_ID for c in chain):
+                chain.append(ai_registry.env_config())
+
+        # 监控记录（结构化写入监控日志，由后台线程落盘）
+        trace = ai_telemetry.trace(prompt.task, model, len(prompt))
+        trace.log(f"开始 AI 请求 - 提示词长度: {len(prompt)}")
+
+        if not chain:
+            # 所有候选均已熔断，快速失败而不是等待超时
+            trace.log("所有 AI 配置均处于熔断状态，快速失败")
+            ai_telemetry.finish(trace, CALL_CIRCUIT_OPEN)
+            return None, None, model
+        if chain[0]["id"] != config["id"]:
+            trace.log(f"首选配置已熔断，直接使用: {chain[0].get('provider')} / {chain[0]['model']}")
+        
+        try:
+            content = await self._complete_failover(chain, prompt, temperature, priority, est_tokens, trace)
+        except Exception as e:
+            trace.log(f"所有配置均调用失败: {str(e)}")
+            ai_telemetry.finish(trace, CALL_ERROR)
+            return None, None, model
+
+        # 单次扫描解析：跳过代码块标记与说明文字，截断时修复最后一个字段
+        result, parse_status = parse_json_output(content)
+        ai_telemetry.finish(trace, CALL_OK, parse_status=parse_status)
+        if parse_status in (PARSE_OK, PARSE_REPAIRED):
+            return result, parse_status, trace.model
+
+        # 保存错误样本
+        await asyncio.to_thread(self._dump_error_sample, trace.task_id, content)
+        return None, parse_status, trace.model
+
+    @staticmethod
+    def _dump_error_sample(task_id: str, content: str):
+        with open(f"debug_error_{task_id}.txt", "w", encoding="utf-8") as f:
+            f.write(content)
+
+    @staticmethod
+    def _usage(response) -> dict:
+        """
+        从 SDK 响应中读取实际 token 用量，读不到的项为 None
+
+        命中提示词缓存的输入 token 数：OpenAI 为 prompt_tokens_details.cached_tokens，
+        DeepSeek 为 prompt_cache_hit_tokens，Anthropic 为 cache_read_input_tokens
+        （Anthropic 的 input_tokens 不含缓存读写部分，这里加回以便各家口径一致）。
+        """
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        cached_tokens = getattr(usage, "prompt_cache_hit_tokens", None)
+        if cached_tokens is None:
+            cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+        if prompt_tokens is None:
+            prompt_tokens = getattr(usage, "input_tokens", None)
+            cached_tokens = getattr(usage, "cache_read_input_tokens", None)
+            if prompt_tokens is not None:
+                prompt_tokens += (cached_tokens or 0) + (getattr(usage, "cache_creation_input_tokens", None) or 0)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        if completion_tokens is None:
+            completion_tokens = getattr(usage, "output_tokens", None)
+        total = None
+        if prompt_tokens is not None and completion_tokens is not None:
+            total = prompt_tokens + completion_tokens
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "cached_tokens": cached_tokens, "total_tokens": total}
 
 ai_service = AIService()
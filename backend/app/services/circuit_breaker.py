@@ -0,0 +1,197 @@
+"""
+AI 配置熔断器
+每个 AI 配置一个熔断器：closed（正常）/ open（熔断，直接跳过）/ half_open（放行少量探测请求）。
+滑动窗口内失败率超过阈值即熔断，冷却期后进入半开，探测成功恢复、失败重新熔断。
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from app.core.config import settings
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """配置处于熔断状态，请求未发出"""
+
+    def __init__(self, config_id: str):
+        super().__init__(f"AI 配置 {config_id} 已熔断")
+        self.config_id = config_id
+
+
+def is_provider_failure(exc: BaseException) -> bool:
+    """
+    判断异常是否计入熔断失败率
+
+    网络错误、超时、鉴权失败、限流与 5xx 视为服务不可用；
+    400/404/422 等请求本身的问题不计入。
+    """
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        return True
+    return status in (401, 403, 408, 429) or status >= 500
+
+
+class CircuitBreaker:
+    """单个 AI 配置的熔断器"""
+
+    def __init__(self, window: int, min_calls: int, failure_rate: float, open_seconds: float, half_open_probes: int):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = STATE_CLOSED
+        self.outcomes: Deque[bool] = deque(maxlen=window)  # True 表示失败
+        self.opened_at = 0.0
+        self.probes_inflight = 0
+        self.open_count = 0
+        self.last_error: Optional[str] = None
+
+    def _current_failure_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def available(self, now: float) -> bool:
+        """是否可能放行请求（不改变状态）"""
+        if self.state == STATE_CLOSED:
+            return True
+        if self.state == STATE_OPEN:
+            return now - self.opened_at >= self.open_seconds
+        return self.probes_inflight < self.half_open_probes
+
+    def acquire(self, now: float) -> bool:
+        """尝试放行一次请求，半开状态下占用一个探测名额"""
+        if self.state == STATE_OPEN and now - self.opened_at >= self.open_seconds:
+            self.state = STATE_HALF_OPEN
+            self.probes_inflight = 0
+        if self.state == STATE_CLOSED:
+            return True
+        if self.state == STATE_HALF_OPEN and self.probes_inflight < self.half_open_probes:
+            self.probes_inflight += 1
+            return True
+        return False
+
+    def _trip(self, now: float):
+        self.state = STATE_OPEN
+        self.opened_at = now
+        self.probes_inflight = 0
+        self.open_count += 1
+
+    def on_success(self):
+        if self.state == STATE_HALF_OPEN:
+            # 探测成功，恢复并重新统计
+            self.state = STATE_CLOSED
+            self.probes_inflight = 0
+            self.outcomes.clear()
+        self.outcomes.append(False)
+
+    def on_failure(self, now: float, error: str):
+        self.last_error = error
+        if self.state == STATE_HALF_OPEN:
+            self._trip(now)
+            return
+        self.outcomes.append(True)
+        if (self.state == STATE_CLOSED and len(self.outcomes) >= self.min_calls
+                and self._current_failure_rate() >= self.failure_rate):
+            self._trip(now)
+
+    def on_cancel(self):
+        """请求被取消（如对冲落败），归还探测名额，不计入统计"""
+        if self.state == STATE_HALF_OPEN and self.probes_inflight > 0:
+            self.probes_inflight -= 1
+
+    def snapshot(self, now: float) -> Dict:
+        retry_in = None
+        if self.state == STATE_OPEN:
+            retry_in = round(max(0.0, self.open_seconds - (now - self.opened_at)), 1)
+        return {
+            "state": self.state,
+            "failure_rate": round(self._current_failure_rate(), 4),
+            "calls": len(self.outcomes),
+            "open_count": self.open_count,
+            "retry_in_seconds": retry_in,
+            "last_error": self.last_error
+        }
+
+
+class CircuitBreakerRegistry:
+    """按 AI 配置 ID 管理熔断器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def _get(self, config_id: str) -> CircuitBreaker:
+        breaker = self._breakers.get(config_id)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                window=settings.AI_BREAKER_WINDOW,
+                min_calls=settings.AI_BREAKER_MIN_CALLS,
+                failure_rate=settings.AI_BREAKER_FAILURE_RATE,
+                open_seconds=settings.AI_BREAKER_OPEN_SECONDS,
+                half_open_probes=settings.AI_BREAKER_HALF_OPEN_PROBES
+            )
+            self._breakers[config_id] = breaker
+        return breaker
+
+    def available(self, config_id: str) -> bool:
+        """配置当前是否可能放行请求，用于在路由前过滤候选"""
+        with self._lock:
+            return self._get(config_id).available(time.monotonic())
+
+    def acquire(self, config_id: str):
+        """
+        发起请求前调用，熔断中则抛出 CircuitOpenError
+
+        放行后必须以 record_success / record_failure / record_cancel 之一结束。
+        """
+        with self._lock:
+            if not self._get(config_id).acquire(time.monotonic()):
+                raise CircuitOpenError(config_id)
+
+    def record_success(self, config_id: str):
+        with self._lock:
+            self._get(config_id).on_success()
+
+    def record_failure(self, config_id: str, exc: BaseException):
+        """记录失败；不属于服务不可用的异常按成功处理（服务本身是通的）"""
+        with self._lock:
+            breaker = self._get(config_id)
+            if is_provider_failure(exc):
+                before = breaker.state
+                breaker.on_failure(time.monotonic(), str(exc)[:200])
+                tripped = before != STATE_OPEN and breaker.state == STATE_OPEN
+            else:
+                breaker.on_success()
+                tripped = False
+        if tripped:
+            logging.warning(f"AI 配置 {config_id} 已熔断 {settings.AI_BREAKER_OPEN_SECONDS:g}s: {exc}")
+
+    def record_cancel(self, config_id: str):
+        with self._lock:
+            self._get(config_id).on_cancel()
+
+    def reset(self, config_id: str) -> bool:
+        """手动恢复某个配置的熔断器"""
+        with self._lock:
+            return self._breakers.pop(config_id, None) is not None
+
+    def state(self, config_id: str) -> str:
+        with self._lock:
+            breaker = self._breakers.get(config_id)
+            return breaker.state if breaker else STATE_CLOSED
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            return {config_id: b.snapshot(now) for config_id, b in self._breakers.items()}
+
+
+# 创建全局实例
+circuit_breakers = CircuitBreakerRegistry()
@@ -1,12 +1,11 @@
 """
 文档解析服务
-支持解析 PDF 和 Word 文档，提取职位描述文本
+支持解析 PDF 和 Word 文档，提取职位描述文本（提取在 text_extraction 的进程池中执行）
 """
-import io
 import logging
 from typing import Optional
-import pdfplumber
-from docx import Document
+
+from app.services.text_extraction import text_extractor, ExtractionTimeoutError, KIND_PDF, KIND_DOCX
 
 logger = logging.getLogger(__name__)
 
@@ -26,15 +25,7 @@ class DocumentParserService:
             提取的文本内容，失败返回 None
         """
         try:
-            text_content = []
-            
-            with pdfplumber.open(io.BytesIO(file_content)) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_content.append(page_text)
-            
-            full_text = "\n".join(text_content).strip()
+            full_text = (await text_extractor.extract(file_content, KIND_PDF)).strip()
             
             if not full_text:
                 logger.warning("PDF 文件中未提取到任何文本内容")
@@ -43,6 +34,8 @@ class DocumentParserService:
             logger.info(f"成功从 PDF 中提取 {len(full_text)} 个字符")
             return full_text
             
+        except ExtractionTimeoutError:
+            raise
         except Exception as e:
             logger.error(f"解析 PDF 文件失败: {str(e)}")
             import traceback
@@ -61,23 +54,8 @@ class DocumentParserService:
             提取的文本内容，失败返回 None
         """
         try:
-            text_content = []
-            
-            doc = Document(io.BytesIO(file_content))
-            
-            # 提取所有段落
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    text_content.append(paragraph.text.strip())
-            
-            # 提取表格中的文本
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        if cell.text.strip():
-                            text_content.append(cell.text.strip())
-            
-            full_text = "\n".join(text_content).strip()
+            # 提取正文、表格、文本框与页眉页脚中的文本
+            full_text = (await text_extractor.extract(file_content, KIND_DOCX)).strip()
             
             if not full_text:
                 logger.warning("Word 文档中未提取到任何文本内容")
@@ -86,6 +64,8 @@ class DocumentParserService:
             logger.info(f"成功从 Word 文档中提取 {len(full_text)} 个字符")
             return full_text
             
+        except ExtractionTimeoutError:
+            raise
         except Exception as e:
             logger.error(f"解析 Word 文档失败: {str(e)}")
             import traceback
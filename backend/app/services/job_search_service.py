@@ -17,6 +17,7 @@ from app.models.job_search import JobSearchTask, CrawledJob
 from app.models.job import Job
 from app.models.resume import Resume
 from app.services.ai_service import ai_service
+from app.services.ai_scheduler import PRIORITY_BULK
 from app.services.jsearch_client import get_jsearch_client
 from app.services.baidu_job_client import baidu_job_client
 from app.services.liepin_client import liepin_client
@@ -359,6 +360,7 @@ class JobSearchService:
             
             task.total_found = len(jobs)
             saved_count = 0
+            saved_jobs = []
             
             # 保存职位
             for job_data in jobs:
@@ -395,14 +397,16 @@ class JobSearchService:
                     db.add(crawled_job)
                     db.flush()
                     saved_count += 1
-                    
-                    # 自动解析职位
-                    await self._parse_crawled_job(crawled_job, db)
+                    saved_jobs.append(crawled_job)
                     
                 except Exception as e:
                     logging.error(f"保存职位失败: {e}")
                     continue
             
+            db.commit()
+            # 全部保存后批量解析，几次请求即可完成
+            await self._parse_crawled_jobs(saved_jobs, db)
+            
             task.total_saved = saved_count
             task.status = "completed"
             task.completed_at = datetime.utcnow()
@@ -419,25 +423,30 @@ class JobSearchService:
         finally:
             db.close()
     
-    async def _parse_crawled_job(self, job: CrawledJob, db):
-        """解析采集的职位"""
+    async def _parse_crawled_jobs(self, jobs: List[CrawledJob], db):
+        """批量解析采集的职位"""
+        if not jobs:
+            return
         try:
-            parsed_data = await ai_service.parse_job_description(job.description)
-            
+            # 批量采集解析排在交互请求之后，避免占满配额
+            results = await ai_service.parse_job_descriptions_batch(
+                {job.id: job.description for job in jobs},
+                priority=PRIORITY_BULK
+            )
+        except Exception as e:
+            logging.error(f"批量解析职位时出错: {e}")
+            results = {}
+
+        for job in jobs:
+            parsed_data = results.get(job.id)
             if parsed_data:
                 job.parsed_data = parsed_data
                 job.parse_status = "parsed"
-                logging.info(f"职位解析成功: {job.title}")
             else:
                 job.parse_status = "failed"
                 logging.warning(f"职位解析失败: {job.title}")
-            
-            db.commit()
-            
-        except Exception as e:
-            logging.error(f"解析职位时出错: {e}")
-            job.parse_status = "failed"
-            db.commit()
+        db.commit()
+        logging.info(f"职位批量解析完成: 成功 {sum(1 for job in jobs if job.parse_status == 'parsed')}/{len(jobs)}")
     
     async def batch_import_jobs(self, job_ids: List[str]) -> Dict:
         """批量导入职位到正式库"""
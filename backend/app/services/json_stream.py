@@ -0,0 +1,274 @@
+"""
+流式 JSON 解析
+逐段消费模型输出的增量文本（单次扫描，不回溯整个缓冲区）：
+- 顶层字段闭合时立即产出 field 事件
+- 顶层字段中的数组元素闭合时产出 item 事件
+- 自动跳过 markdown 代码块标记与 JSON 前后的说明文字
+- 根节点必须是对象：第一个括号是 [ 时（顶层数组）直接判定失败，不会误取数组中的第一个对象
+- 输出被截断时尽量修复最后一个不完整字段
+"""
+import json
+import logging
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# 字符串内部只需关心引号与转义符，用正则一次跳过普通字符
+_STRING_SPECIAL = re.compile(r'["\\]')
+# 字符串外需要处理的结构字符
+_STRUCTURAL = re.compile(r'[{}\[\],:"]')
+# 根节点之前的内容中第一个开括号
+_ROOT_OPEN = re.compile(r'[{\[]')
+
+# 解析结果状态
+PARSE_OK = "ok"
+PARSE_REPAIRED = "repaired"
+PARSE_FAILED = "failed"
+
+
+class JSONEvent(NamedTuple):
+    """增量解析事件"""
+    kind: str  # field: 顶层字段闭合；item: 数组元素闭合
+    path: Tuple  # 例如 ("suggestions",) 或 ("suggestions", 0)
+    value: Any
+
+
+class _Frame:
+    """容器栈帧"""
+    __slots__ = ("kind", "start", "state", "key", "key_start", "child_start", "child_emitted", "index", "path")
+
+    def __init__(self, kind: str, start: int, path: Tuple):
+        self.kind = kind  # object / array
+        self.start = start
+        # object: key（等待字段名）/ colon（等待冒号）/ value（读取值）；array 恒为 value
+        self.state = "key" if kind == "object" else "value"
+        self.key: Optional[str] = None
+        self.key_start: Optional[int] = None
+        # 当前子值的起始位置（冒号或分隔符之后）
+        self.child_start: Optional[int] = start + 1 if kind == "array" else None
+        self.child_emitted = False
+        self.index = 0
+        self.path = path
+
+
+class IncrementalJSONParser:
+    """顶层 JSON 对象的增量解析器"""
+
+    def __init__(self, item_depth: int = 1):
+        """
+        Args:
+            item_depth: 产出数组元素事件的最大路径深度，
+                        1 表示只关注顶层字段值本身是数组的情况（如 suggestions），0 表示不产出
+        """
+        self.item_depth = item_depth
+        self._buf = ""
+        self._pos = 0
+        self._started = False
+        self._finished = False
+        self._rejected = False
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._string_start = 0
+        self._fields: Dict[str, Any] = {}
+
+    @property
+    def finished(self) -> bool:
+        """根对象是否已完整闭合"""
+        return self._finished
+
+    @property
+    def fields(self) -> Dict[str, Any]:
+        """已闭合的顶层字段"""
+        return self._fields
+
+    def feed(self, delta: str) -> List[JSONEvent]:
+        """输入一段增量文本，返回本段内产生的事件"""
+        if self._finished or self._rejected or not delta:
+            return []
+        if not self._started:
+            m = _ROOT_OPEN.search(delta)
+            if m is None:
+                return []
+            if m.group() == "[":
+                # 顶层是数组而不是约定的对象
+                self._rejected = True
+                return []
+            # 丢弃根对象之前的内容（代码块标记、说明文字）
+            delta = delta[m.start():]
+            self._started = True
+        self._buf += delta
+
+        events: List[JSONEvent] = []
+        buf = self._buf
+        pos = self._pos
+        end = len(buf)
+        while pos < end and not self._finished:
+            if self._in_string:
+                m = _STRING_SPECIAL.search(buf, pos)
+                if m is None:
+                    pos = end
+                    break
+                pos = m.start()
+                if buf[pos] == "\\":
+                    # 转义符连同下一个字符一起跳过（下一个字符可能还没到达）
+                    if pos + 1 >= end:
+                        break
+                    pos += 2
+                    continue
+                self._in_string = False
+                self._on_string_end(pos)
+                pos += 1
+                continue
+
+            m = _STRUCTURAL.search(buf, pos)
+            if m is None:
+                pos = end
+                break
+            pos = m.start()
+            self._on_structural(buf[pos], pos, events)
+            pos += 1
+        self._pos = pos
+        return events
+
+    def _on_string_end(self, pos: int):
+        frame = self._stack[-1]
+        if frame.kind == "object" and frame.state == "key":
+            frame.key = json.loads(self._buf[self._string_start:pos + 1])
+            frame.state = "colon"
+
+    def _on_structural(self, ch: str, pos: int, events: List[JSONEvent]):
+        frame = self._stack[-1] if self._stack else None
+        if frame is None:
+            # 根对象
+            if ch == "{":
+                self._stack.append(_Frame("object", pos, ()))
+            return
+
+        if ch == '"':
+            self._in_string = True
+            self._string_start = pos
+            if frame.kind == "object" and frame.state == "key":
+                frame.key_start = pos
+        elif ch in "{[":
+            name = frame.key if frame.kind == "object" else frame.index
+            self._stack.append(_Frame("object" if ch == "{" else "array", pos, frame.path + (name,)))
+        elif ch == ":":
+            if frame.kind == "object" and frame.state == "colon":
+                frame.state = "value"
+                frame.child_start = pos + 1
+                frame.child_emitted = False
+        elif ch == ",":
+            self._complete_child(frame, pos, events)
+        else:
+            # } 或 ]：先结束最后一个子值，再关闭当前容器
+            self._complete_child(frame, pos, events)
+            self._stack.pop()
+            if not self._stack:
+                self._finished = True
+                return
+            parent = self._stack[-1]
+            # 容器子值在闭合时立即产出，不必等到下一个分隔符
+            self._emit(parent, self._buf[frame.start:pos + 1], events)
+            parent.child_emitted = True
+
+    def _complete_child(self, frame: _Frame, pos: int, events: List[JSONEvent]):
+        """在逗号或闭合符处结束当前子值"""
+        if frame.state == "value" and frame.child_start is not None and not frame.child_emitted:
+            raw = self._buf[frame.child_start:pos].strip()
+            if raw:
+                self._emit(frame, raw, events)
+        if frame.kind == "object":
+            frame.state = "key"
+            frame.key = None
+            frame.key_start = None
+            frame.child_start = None
+        else:
+            frame.index += 1
+            frame.child_start = pos + 1
+        frame.child_emitted = False
+
+    def _emit(self, frame: _Frame, raw: str, events: List[JSONEvent]):
+        is_field = frame.kind == "object" and not frame.path
+        is_item = frame.kind == "array" and len(frame.path) <= self.item_depth
+        if not (is_field or is_item):
+            return
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            logging.warning(f"流式 JSON 片段解析失败 {frame.path}: {e}")
+            return
+        if is_field:
+            self._fields[frame.key] = value
+            events.append(JSONEvent("field", (frame.key,), value))
+        else:
+            events.append(JSONEvent("item", frame.path + (frame.index,), value))
+
+    def close(self) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        结束解析
+
+        Returns:
+            (结果对象, 状态 ok/repaired/failed)；输出被截断时尽量补全最后一个顶层字段
+        """
+        if self._finished:
+            return dict(self._fields), PARSE_OK
+        if self._rejected:
+            logging.warning("JSON 输出的顶层是数组而不是对象，判定为解析失败")
+            return None, PARSE_FAILED
+        if not self._stack:
+            return None, PARSE_FAILED
+
+        fields = dict(self._fields)
+        root = self._stack[0]
+        if root.state == "value" and root.key is not None and not root.child_emitted and root.child_start is not None:
+            value = self._repair_tail(root.child_start)
+            if value is not None:
+                fields[root.key] = value
+        if not fields:
+            return None, PARSE_FAILED
+        logging.warning(f"JSON 输出不完整，已修复保留 {len(fields)} 个字段")
+        return fields, PARSE_REPAIRED
+
+    def _repair_tail(self, start: int):
+        """补齐引号与括号，尝试解析被截断的最后一个顶层字段"""
+        frames = self._stack[1:]
+        closers = "".join("}" if f.kind == "object" else "]" for f in reversed(frames))
+
+        # 顶层标量（数字等）无法判断是否已完整输出，直接放弃
+        tail = self._buf[start:]
+        if not frames and not self._in_string and not tail.lstrip().startswith('"'):
+            return None
+
+        # 方案一：原样补齐未闭合的字符串与容器
+        if self._in_string:
+            if tail.endswith("\\"):
+                tail = tail[:-1]
+            tail += '"'
+        candidates = [tail + closers]
+
+        # 方案二：丢弃最内层容器中不完整的最后一个子值（含悬空的字段名）
+        if frames:
+            deepest = frames[-1]
+            cut = deepest.key_start if deepest.key_start is not None else deepest.child_start
+            if cut is None:
+                cut = len(self._buf)
+            if cut > start:
+                candidates.append(self._buf[start:cut].rstrip().rstrip(",") + closers)
+
+        for text in candidates:
+            try:
+                return json.loads(text)
+            except json.JSONDecodeError:
+                continue
+        return None
+
+
+def parse_json_output(content: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    解析完整的模型输出（容忍代码块标记、前后说明文字与尾部截断）
+
+    Returns:
+        (结果对象, 状态 ok/repaired/failed)
+    """
+    parser = IncrementalJSONParser(item_depth=0)
+    parser.feed(content or "")
+    return parser.close()
@@ -0,0 +1,197 @@
+"""
+LLM 响应缓存
+按 (任务, 提示词模板版本, 规范化输入, 模型, 温度) 的哈希缓存解析结果，
+使用本地 SQLite 持久化，支持按任务 TTL、容量上限 LRU 淘汰与命中统计。
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+# 各任务的缓存有效期（秒），未列出的任务不缓存
+TASK_TTLS = {
+    "resume_parse": 30 * 24 * 3600,
+    "jd_parse": 30 * 24 * 3600,
+    "match_analysis": 7 * 24 * 3600,
+}
+
+
+def normalize_text(text: str) -> str:
+    """规范化输入：统一换行、去除首尾空白并压缩连续空白"""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class LLMCache:
+    """基于 SQLite 的 LLM 响应缓存"""
+
+    def __init__(self, path: str, max_entries: int, max_bytes: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._counter_lock = threading.Lock()
+        self._hits: Dict[str, int] = defaultdict(int)
+        self._misses: Dict[str, int] = defaultdict(int)
+
+    def enabled_for(self, task: str) -> bool:
+        """该任务是否启用缓存"""
+        return settings.LLM_CACHE_ENABLED and TASK_TTLS.get(task, 0) > 0
+
+    @staticmethod
+    def make_key(task: str, template_version: str, prompt: str, model: str, temperature: float) -> str:
+        """生成内容寻址的缓存键"""
+        raw = json.dumps(
+            [task, template_version, normalize_text(prompt), model, round(float(temperature), 3)],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程持有独立连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS llm_cache (
+                            key TEXT PRIMARY KEY,
+                            task TEXT NOT NULL,
+                            value TEXT NOT NULL,
+                            size INTEGER NOT NULL,
+                            created_at REAL NOT NULL,
+                            expires_at REAL NOT NULL,
+                            last_access REAL NOT NULL
+                        )
+                        """
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+                    conn.commit()
+                    self._initialized = True
+        return conn
+
+    def _get_sync(self, key: str) -> Optional[dict]:
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        if row[1] < now:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            conn.commit()
+            return None
+        conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        conn.commit()
+        return json.loads(row[0])
+
+    def _set_sync(self, key: str, task: str, value: dict, ttl: int):
+        conn = self._conn()
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, task, value, size, created_at, expires_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, task, payload, len(payload.encode("utf-8")), now, now + ttl, now)
+        )
+        self._evict_sync(conn, now)
+        conn.commit()
+
+    def _evict_sync(self, conn: sqlite3.Connection, now: float):
+        """清理过期项，并按最近访问时间淘汰超出容量的条目"""
+        conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access ASC").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            evicted += 1
+        logging.info(f"LLM 缓存淘汰 {evicted} 条记录")
+
+    async def get(self, key: str, task: str) -> Optional[dict]:
+        """读取缓存，记录命中/未命中"""
+        try:
+            value = await asyncio.to_thread(self._get_sync, key)
+        except Exception as e:
+            logging.error(f"读取 LLM 缓存失败: {e}")
+            value = None
+        with self._counter_lock:
+            if value is None:
+                self._misses[task] += 1
+            else:
+                self._hits[task] += 1
+        return value
+
+    async def set(self, key: str, task: str, value: dict):
+        """写入缓存（失败不影响主流程）"""
+        try:
+            await asyncio.to_thread(self._set_sync, key, task, value, TASK_TTLS.get(task, 0))
+        except Exception as e:
+            logging.error(f"写入 LLM 缓存失败: {e}")
+
+    def _clear_sync(self) -> int:
+        conn = self._conn()
+        deleted = conn.execute("DELETE FROM llm_cache").rowcount
+        conn.commit()
+        return deleted
+
+    async def clear(self) -> int:
+        """清空缓存，返回删除条数"""
+        return await asyncio.to_thread(self._clear_sync)
+
+    def _storage_stats_sync(self) -> Dict:
+        conn = self._conn()
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        return {"entries": count, "bytes": total}
+
+    async def stats(self) -> Dict:
+        """命中统计与存储占用"""
+        with self._counter_lock:
+            hits, misses = dict(self._hits), dict(self._misses)
+        total_hits, total_misses = sum(hits.values()), sum(misses.values())
+        try:
+            storage = await asyncio.to_thread(self._storage_stats_sync)
+        except Exception as e:
+            logging.error(f"读取 LLM 缓存统计失败: {e}")
+            storage = {"entries": None, "bytes": None}
+        return {
+            "enabled": settings.LLM_CACHE_ENABLED,
+            "hits": total_hits,
+            "misses": total_misses,
+            "hit_rate": round(total_hits / (total_hits + total_misses), 4) if total_hits + total_misses else 0.0,
+            "by_task": {
+                task: {"hits": hits.get(task, 0), "misses": misses.get(task, 0)}
+                for task in sorted(set(hits) | set(misses))
+            },
+            **storage,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes
+        }
+
+
+# 创建全局实例
+llm_cache = LLMCache(
+    path=settings.LLM_CACHE_PATH,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    max_bytes=settings.LLM_CACHE_MAX_BYTES
+)
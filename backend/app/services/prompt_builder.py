@@ -0,0 +1,229 @@
+"""
+提示词构建
+- 结构化数据紧凑序列化（无缩进、无多余空白），去除空值与无关字段
+- 按任务限定输入数据的 token 预算，超出时按分段优先级确定性地裁剪
+- 统计相对旧写法（indent=2 全量嵌入）节省的 token 数
+"""
+import copy
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from app.services.ai_scheduler import estimate_tokens
+from app.services.telemetry import ai_telemetry
+
+# 各任务输入数据（不含固定指令模板）的 token 预算
+TASK_INPUT_BUDGETS = {
+    "match_analysis": 6000,
+    "resume_generation": 9000,
+}
+
+# 对模型没有信息量的字段
+IRRELEVANT_KEYS = {"avatar_url", "raw_text", "file_path", "filename"}
+
+TRUNCATED_MARK = "…（已截断）"
+
+_INLINE_SPACE = re.compile(r"[ \t　]+")
+_MULTI_NEWLINE = re.compile(r"\s*\n\s*")
+# 裁剪纯文本时优先停在这些边界上
+_TEXT_BOUNDARIES = ("\n", "。", "；", ". ", "; ")
+
+
+def compact_text(text: str) -> str:
+    """压缩连续空白，保留单个换行"""
+    text = _INLINE_SPACE.sub(" ", text.replace("\r\n", "\n").replace("\r", "\n"))
+    return _MULTI_NEWLINE.sub("\n", text).strip()
+
+
+def prune(value: Any, drop_keys=IRRELEVANT_KEYS) -> Any:
+    """递归去除空值、空容器与无关字段，并压缩字符串空白；整体为空时返回 None"""
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            if key in drop_keys:
+                continue
+            item = prune(item, drop_keys)
+            if item is not None:
+                result[key] = item
+        return result or None
+    if isinstance(value, list):
+        result = [item for item in (prune(v, drop_keys) for v in value) if item is not None]
+        return result or None
+    if isinstance(value, str):
+        return compact_text(value) or None
+    return value
+
+
+def to_compact_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """按 token 上限裁剪纯文本，尽量停在段落或句子边界"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    cut = text[:low]
+    # 只在最后 20% 范围内寻找边界，避免丢掉过多内容
+    floor = int(len(cut) * 0.8)
+    best = max(cut.rfind(b, floor) for b in _TEXT_BOUNDARIES)
+    if best > 0:
+        cut = cut[:best + 1]
+    return cut.rstrip() + TRUNCATED_MARK
+
+
+def _largest_list(value: Any) -> Optional[list]:
+    """找出序列化后体积最大、且至少有两个元素的列表"""
+    best, best_size = None, 0
+    stack = [value]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            if len(node) > 1:
+                size = len(to_compact_json(node))
+                if size > best_size:
+                    best, best_size = node, size
+            stack.extend(node)
+    return best
+
+
+def _shorten_longest_string(value: Any) -> bool:
+    """把最长的字符串截去一半，没有可截的字符串时返回 False"""
+    best_parent, best_key, best_len = None, None, 80
+    stack = [value]
+    while stack:
+        node = stack.pop()
+        items = node.items() if isinstance(node, dict) else enumerate(node) if isinstance(node, list) else ()
+        for key, item in items:
+            if isinstance(item, str) and len(item) > best_len:
+                best_parent, best_key, best_len = node, key, len(item)
+            elif isinstance(item, (dict, list)):
+                stack.append(item)
+    if best_parent is None:
+        return False
+    text = best_parent[best_key]
+    best_parent[best_key] = text[:len(text) // 2].rstrip() + TRUNCATED_MARK
+    return True
+
+
+def shrink_structured(value: Any, max_tokens: int) -> Any:
+    """
+    按 token 上限裁剪结构化数据，保持 JSON 合法
+
+    依次丢弃最大列表的末尾元素（较早的经历、次要条目），
+    没有可丢的列表元素后再截短最长的字符串。
+    """
+    value = copy.deepcopy(value)
+    while estimate_tokens(to_compact_json(value)) > max_tokens:
+        target = _largest_list(value)
+        if target is not None:
+            target.pop()
+        elif not _shorten_longest_string(value):
+            break
+    return value
+
+
+class PromptSection:
+    """提示词中的一个数据分段"""
+
+    def __init__(self, name: str, value: Any, priority: int, min_tokens: int = 0,
+                 max_tokens: Optional[int] = None, baseline: Optional[str] = None):
+        """
+        Args:
+            name: 分段名
+            value: 结构化数据（dict/list）或纯文本
+            priority: 优先级，数值越小越先被裁剪
+            min_tokens: 裁剪时至少保留的 token 数
+            max_tokens: 该分段自身的上限（不论总预算是否超出）
+            baseline: 旧写法实际嵌入的文本，默认按 indent=2 全量序列化估算
+        """
+        self.name = name
+        self.priority = priority
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.structured = isinstance(value, (dict, list))
+        # 旧写法的体积，用于统计节省量
+        if baseline is not None:
+            self.baseline_tokens = estimate_tokens(baseline)
+        elif value is None:
+            self.baseline_tokens = 0
+        elif self.structured:
+            self.baseline_tokens = estimate_tokens(json.dumps(value, ensure_ascii=False, indent=2))
+        else:
+            self.baseline_tokens = estimate_tokens(str(value))
+        self.value = prune(value) if self.structured else compact_text(str(value or ""))
+        self.truncated = False
+
+    def render(self) -> str:
+        if self.value is None:
+            return ""
+        return to_compact_json(self.value) if self.structured else self.value
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.render())
+
+    def shrink_to(self, max_tokens: int):
+        if self.value is None or self.tokens() <= max_tokens:
+            return
+        self.truncated = True
+        if self.structured:
+            self.value = shrink_structured(self.value, max_tokens)
+        else:
+            self.value = truncate_text(self.value, max_tokens)
+
+
+class PromptBuilder:
+    """按任务预算组装提示词中的数据分段"""
+
+    def __init__(self, task: str, budget: Optional[int] = None):
+        self.task = task
+        self.budget = budget if budget is not None else TASK_INPUT_BUDGETS.get(task)
+        self.sections: List[PromptSection] = []
+        self.stats: Dict[str, Any] = {}
+
+    def add(self, name: str, value: Any, priority: int, min_tokens: int = 0,
+            max_tokens: Optional[int] = None, baseline: Optional[str] = None) -> "PromptBuilder":
+        self.sections.append(PromptSection(name, value, priority, min_tokens, max_tokens, baseline))
+        return self
+
+    def build(self) -> Dict[str, str]:
+        """
+        执行裁剪并渲染各分段
+
+        Returns:
+            分段名 -> 渲染后的文本
+        """
+        for section in self.sections:
+            if section.max_tokens is not None:
+                section.shrink_to(section.max_tokens)
+
+        if self.budget is not None:
+            over = sum(s.tokens() for s in self.sections) - self.budget
+            # 同优先级按加入顺序裁剪，保证结果确定
+            for section in sorted(self.sections, key=lambda s: s.priority):
+                if over <= 0:
+                    break
+                before = section.tokens()
+                section.shrink_to(max(section.min_tokens, before - over))
+                over -= before - section.tokens()
+
+        rendered = {s.name: s.render() for s in self.sections}
+        tokens = sum(estimate_tokens(text) for text in rendered.values())
+        baseline = sum(s.baseline_tokens for s in self.sections)
+        truncated = [s.name for s in self.sections if s.truncated]
+        self.stats = {"tokens": tokens, "baseline_tokens": baseline, "saved_tokens": max(0, baseline - tokens), "truncated": truncated}
+        ai_telemetry.record_prompt(self.task, tokens, self.stats["saved_tokens"])
+        logging.info(
+            f"提示词数据分段 [{self.task}]: {tokens} tokens，节省 {self.stats['saved_tokens']} tokens"
+            + (f"，已裁剪: {', '.join(truncated)}" if truncated else "")
+        )
+        return rendered
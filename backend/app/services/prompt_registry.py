@@ -0,0 +1,547 @@
+"""
+提示词注册表
+每个模板由固定前缀（系统提示 + 任务指令 + 输出格式）与动态后缀（本次请求的数据）组成：
+- 固定前缀逐字节稳定且总在最前，命中 OpenAI / DeepSeek 的自动前缀缓存
+- Anthropic 在固定前缀末尾加 cache_control 标记，重复调用时直接读取缓存
+- 模板版本号参与响应缓存的键，修改模板时必须递增版本
+"""
+from typing import Dict, List, Optional, Tuple
+
+# JSON 输出任务的系统提示词
+JSON_SYSTEM_PROMPT_ANTHROPIC = "你是一个专业的 HR 和职业规划专家。请严格按照要求的 JSON 格式输出。确保输出的是合法的 JSON 字符串，不要包含任何额外的解释文字。"
+JSON_SYSTEM_PROMPT_OPENAI = "你是一个专业的 HR 和职业规划专家。请严格按照要求的 JSON 格式输出。不要在 JSON 之外包含任何解释性文字。"
+
+# 未注册任务（临时拼接的提示词）的模板版本
+DEFAULT_VERSION = "v1"
+
+# 单次请求默认的输出 token 上限
+DEFAULT_MAX_TOKENS = 8192
+
+
+class PromptTemplate:
+    """一个任务的提示词模板"""
+
+    def __init__(self, name: str, version: str, instructions: str, schema: str = "",
+                 inputs: Tuple[Tuple[str, str], ...] = (), task: Optional[str] = None,
+                 max_tokens: int = DEFAULT_MAX_TOKENS):
+        """
+        Args:
+            name: 模板名
+            version: 模板版本
+            instructions: 固定的任务指令
+            schema: 输出要求的 JSON 格式
+            inputs: 动态数据分段 (参数名, 分段标题)，按顺序拼接为后缀
+            task: 所属任务（决定缓存 TTL、调度优先级与遥测分组），默认与模板名相同
+            max_tokens: 输出 token 上限，输出结构较小的模板应相应调低
+        """
+        self.name = name
+        self.version = version
+        self.task = task or name
+        self.inputs = inputs
+        self.max_tokens = max_tokens
+        prefix = f"【任务指令】\n{instructions.strip()}"
+        if schema:
+            prefix += f"\n\n【输出要求的 JSON 格式】\n{schema.strip()}"
+        self.prefix = prefix
+
+    def render(self, **values) -> "Prompt":
+        parts = []
+        for key, title in self.inputs:
+            value = values.get(key)
+            if value:
+                parts.append(f"【{title}】\n{value}")
+        return Prompt(self.task, self.version, self.prefix, "\n\n".join(parts), self.max_tokens)
+
+
+class Prompt:
+    """渲染后的提示词：固定前缀 + 动态后缀"""
+
+    __slots__ = ("task", "version", "prefix", "body", "max_tokens")
+
+    def __init__(self, task: str, version: str, prefix: str, body: str, max_tokens: int = DEFAULT_MAX_TOKENS):
+        self.task = task
+        self.version = version
+        self.prefix = prefix
+        self.body = body
+        self.max_tokens = max_tokens
+
+    @property
+    def text(self) -> str:
+        """完整提示词（用于缓存键与 token 预估）"""
+        return f"{self.prefix}\n\n{self.body}" if self.prefix else self.body
+
+    def __len__(self) -> int:
+        return len(self.prefix) + len(self.body)
+
+    def openai_messages(self) -> List[Dict]:
+        """OpenAI 兼容接口的消息：固定前缀并入系统消息，保证请求开头逐字节一致"""
+        system = f"{JSON_SYSTEM_PROMPT_OPENAI}\n\n{self.prefix}" if self.prefix else JSON_SYSTEM_PROMPT_OPENAI
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": self.body}
+        ]
+
+    def anthropic_request(self) -> Dict:
+        """Anthropic 接口的 system 与 messages 参数：固定前缀末尾打 cache_control 断点"""
+        system: List[Dict] = [{"type": "text", "text": JSON_SYSTEM_PROMPT_ANTHROPIC}]
+        if self.prefix:
+            system.append({"type": "text", "text": self.prefix, "cache_control": {"type": "ephemeral"}})
+        return {"system": system, "messages": [{"role": "user", "content": self.body}]}
+
+
+class PromptRegistry:
+    """按名称登记提示词模板"""
+
+    def __init__(self):
+        self._templates: Dict[str, PromptTemplate] = {}
+
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        self._templates[template.name] = template
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        return self._templates[name]
+
+    def render(self, name: str, **values) -> Prompt:
+        return self._templates[name].render(**values)
+
+    def raw(self, task: str, text: str) -> Prompt:
+        """把临时拼接的整段提示词包装为没有固定前缀的 Prompt"""
+        template = self._templates.get(task)
+        return Prompt(task, template.version if template else DEFAULT_VERSION, "", text)
+
+    def versions(self) -> Dict[str, str]:
+        return {name: t.version for name, t in self._templates.items()}
+
+
+# 创建全局实例
+prompt_registry = PromptRegistry()
+
+
+# ---------------------------------------------------------------- 简历解析
+
+# 本地预提取字段的说明（见 resume_extractor）
+_RESUME_HINTS_NOTE = "若提供了【本地已提取字段】，其中的字段已由本地规则从原文中精确提取，直接采用，无需再查找；已提取的电话和邮箱在输出中留空即可，系统会自动回填。"
+
+RESUME_PARSE_VERSION = "v3"
+
+_RESUME_FIELD_SCHEMAS = {
+    "personal_info": """
+"personal_info": {
+    "name": "",
+    "phone": "",
+    "email": "",
+    "location": "",
+    "summary": "个人总结/评价"
+}""",
+    "education": """
+"education": [
+    {"school": "", "major": "", "degree": "", "start_date": "", "end_date": ""}
+]""",
+    "work_experience": """
+"work_experience": [
+    {
+        "company": "",
+        "position": "",
+        "duration": "起止时间",
+        "description": "职责概况（一段话）",
+        "achievements": ["关键成就点1", "关键成就点2", "必须完整保留原简历中的所有细节工作内容"]
+    }
+]""",
+    "project_experience": """
+"project_experience": [
+    {
+        "name": "项目名称",
+        "role": "项目岗位",
+        "duration": "起止时间",
+        "description": "项目面临的挑战与技术难度（背景）",
+        "actions": ["我采取的关键技术方案/行动1", "行动2", "必须全量提取，不能丢失任何技术动作"],
+        "results": "最终实现的业务价值 or 技术指标（必须包含原有的所有成果描述）"
+    }
+]""",
+    "skills_sections": """
+"skills_sections": [
+    {"category": "技术领域", "skills": ["实打实的技能1", "技能2"]}
+]""",
+    "others": """
+"others": {
+    "certifications": ["证书1", "证书2", "如：PMP、CISSP、英语等级等"],
+    "awards": ["奖项1", "奖项2"],
+    "publications": ["论文/出版物1"]
+}""",
+}
+
+prompt_registry.register(PromptTemplate(
+    "resume_parse", RESUME_PARSE_VERSION,
+    instructions=f"请将简历中的信息严格按照以下 JSON 格式输出，找不到的字段留空。\n{_RESUME_HINTS_NOTE}",
+    schema="{" + ",".join(_RESUME_FIELD_SCHEMAS.values()) + "\n}",
+    inputs=(("hints", "本地已提取字段"), ("text", "简历文本内容")),
+))
+
+# 分段解析：每个输出字段一个模板，名为 resume_parse.<字段>
+for _field, _schema in _RESUME_FIELD_SCHEMAS.items():
+    prompt_registry.register(PromptTemplate(
+        f"resume_parse.{_field}", RESUME_PARSE_VERSION,
+        instructions="以下是一份简历中的一个段落，请只提取其中的信息，严格按照给定 JSON 格式输出。\n"
+                     f"必须完整保留原文中的所有细节，不得概括或遗漏；找不到的字段留空。\n{_RESUME_HINTS_NOTE}",
+        schema="{" + _schema + "\n}",
+        inputs=(("hints", "本地已提取字段"), ("body", "简历段落")),
+        task="resume_parse",
+    ))
+
+
+# ---------------------------------------------------------------- JD 解析
+
+JD_SCHEMA = """{
+    "job_title": "",
+    "company": "",
+    "location": "",
+    "salary_range": "",
+    "requirements": {
+        "education": "",
+        "experience_years": "",
+        "skills": [],
+        "certifications": [],
+        "other": []
+    },
+    "responsibilities": [],
+    "benefits": [],
+    "keywords": []
+}"""
+
+prompt_registry.register(PromptTemplate(
+    "jd_parse", "v2",
+    instructions="请从以下职位描述中提取关键信息，并按 JSON 格式输出。",
+    schema=JD_SCHEMA,
+    inputs=(("text", "职位描述"),),
+))
+
+prompt_registry.register(PromptTemplate(
+    "jd_parse_batch", "v2",
+    instructions="以下是若干个职位描述（JSON 数组，每项含 id 与 text）。\n"
+                 "请逐个提取关键信息，每个职位输出一项，id 与输入保持一致，不得遗漏或合并。",
+    schema='{\n    "results": [\n        {\n            "id": "输入中的 id",\n            "data": '
+           + JD_SCHEMA.replace("\n", "\n            ") + "\n        }\n    ]\n}",
+    inputs=(("items", "职位描述列表"),),
+))
+
+
+# ---------------------------------------------------------------- 匹配分析
+
+# 匹配分析输出中各部分的 JSON 结构，单次生成与分解模式的子任务共用
+_MATCH_SCHEMA_SCORE = """    "match_score": 85,
+    "analysis": {
+        "strengths": ["优势1", "优势2"],
+        "weaknesses": ["不足1", "不足2"],
+        "skill_match": {
+            "matched": ["技能1", "技能2"],
+            "missing": ["缺失技能1"]
+        },
+        "experience_match": "针对职位的经验契合度深度点评",
+        "education_match": "学历与背景匹配分析"
+    }"""
+_MATCH_SCHEMA_BLUEPRINTS = """    "skill_mastery_blueprints": [
+        {
+            "skill": "核心缺失技能名称",
+            "priority": "优先级(高/中/低)",
+            "gap_description": "明确指出 JD 中的具体要求 vs 你当前的差距",
+            "learning_path": {
+                "stage1_theory": {
+                    "title": "原理研习：攻克知识盲区",
+                    "points": ["核心考点1", "核心考点2"],
+                    "resources": ["具体书名/文档章节/高质量课程名"]
+                },
+                "stage2_practice": {
+                    "title": "实战动手：构建 Demo 验证",
+                    "task": "描述一个具有技术含量的实验任务",
+                    "tech_stack": ["推荐使用的技术栈"]
+                },
+                "stage3_project": {
+                    "title": "项目升华：打造简历亮点",
+                    "project_name": "建议的项目名称",
+                    "implementation": "详细的项目实现思路，如何解决 JD 中的痛点",
+                    "resume_bullet": "直接可用的简历描述话术（含量化指标）"
+                }
+            },
+            "interview_prep": {
+                "critical_question": "针对该技能，面试官最可能问的深度问题",
+                "answer_strategy": "针对性回答思路和重点"
+            }
+        }
+    ]"""
+_MATCH_SCHEMA_SUGGESTIONS = """    "suggestions": [
+        {
+            "category": "分类（如：项目润色、技能补全）",
+            "content": "具体改进建议",
+            "template": "推荐使用的专业话术描述"
+        }
+    ]"""
+_MATCH_SCHEMA_OPTIMIZED = '    "optimized_resume": "包含 [[ADD]] 和 [[MOD]] 标记的完整/核心段落优化版简历文本"'
+_MATCH_SCHEMA_SUMMARY = '    "optimized_summary": "针对该职位优化后的个人简介（含标记）"'
+
+# 优化版简历的批注与完整性要求
+_MATCH_OPTIMIZE_RULES = """
+【批注式优化要求】
+- 你必须**完整复制**原简历中的每一段工作经历（包括所有 achievements）和项目描述（包括所有 actions 和 results）。
+- 你的优化必须是“增量式”或“抛光式”的：在保留原句的基础上，直接在合适的位置插入关键词、扩充量化成果、或润色表达。
+- 严禁对原始简历中的技术细节进行任何模糊化处理。
+- 必须使用 [[ADD]]新内容[[/ADD]] 标识**新增**的内容。
+- 必须使用 [[MOD]]优化后内容[[/MOD]] 标识对**原句**的润色（必须保留原意，严禁改变事实）。
+- 如果某段内容原本就很好，请原封不动地保留。
+- 最终输出的预览内容量级应与原简历对齐，且带有优化增量。
+
+【输出要求 - 非常重要】
+- 预览内容必须按照以下顺序逐一呈现，不得跳过其中任何一项：
+  1. 【个人简介】
+  2. 【工作经历】：请逐个列出原简历中的每一家公司及职位。如果在某一段经历中没有建议，请原样完整保留所有描述。
+  3. 【项目经验】：请逐个列出原简历中的每一个项目，禁止合并！
+  4. 【技能清单】：保留原有的所有技能点，并加入 [[ADD]] 补充项。
+  5. 【教育背景】：确保学校、专业、学位信息完整，并根据职位需求 [[ADD]] 相关主修课程或奖学金。
+  6. 【荣誉认证】：列出所有资质证书与奖项，针对职位需求 [[ADD]] 缺失但建议考取的证书。
+- 严禁使用诸如“...（其余内容同原简历）...”之类的缩略语。
+"""
+
+_MATCH_INPUTS = (("resume", "简历信息"), ("job", "职位要求"), ("job_description", "原始职位描述"))
+
+
+def _match_schema(*parts: str) -> str:
+    return "{\n" + ",\n".join(parts) + "\n}"
+
+
+# 补丁式输出（见 resume_patch）：模型只输出对原简历 JSON 的编辑操作
+_PATCH_RULES = """
+【补丁输出要求】
+- 不要重写整份简历，只输出对【{source}】JSON 的编辑操作，未涉及的内容系统会原样保留。
+- path 为 JSON Pointer，下标从 0 开始，均指向【{source}】中的原始位置；"-" 表示追加到数组末尾。
+- replace：用 value 替换 path 处的原值，用于润色原句（必须保留原意，严禁改变事实）；对象中不存在的字段视为新增。
+- insert：在 path 指向的数组位置之前插入 value，用于新增内容，可以是字符串或完整的对象。
+- value 中不要带 [[ADD]]、[[MOD]] 等标记，系统会自动标注新增与润色。
+- 严禁删除任何原有内容；没有需要修改的地方时输出空数组。
+"""
+
+_PATCH_SCHEMA = """{
+    "ops": [
+        {"op": "replace", "path": "/work_experience/0/achievements/1", "value": "润色后的完整句子"},
+        {"op": "insert", "path": "/project_experience/0/actions/-", "value": "新增的技术动作或量化成果"},
+        {"op": "insert", "path": "/skills_sections/0/skills/-", "value": "补充技能"}
+    ]
+}"""
+
+# 单次生成全部字段的任务指令
+_MATCH_INSTRUCTIONS = """
+请作为一名资深 HR 和简历优化专家，深度分析下方简历与职位的匹配程度。
+
+你的目标是：
+1. 给出精准的匹配评分和多维度分析。
+2. 提供**具体、可落地、带有专业话术**的改进建议。
+3. 输出一份“优化版简历预览内容”。**核心禁令：禁止概括！禁止浓缩！禁止删除！**
+""" + _MATCH_OPTIMIZE_RULES
+
+prompt_registry.register(PromptTemplate(
+    "match_analysis", "v3",
+    instructions=_MATCH_INSTRUCTIONS,
+    schema=_match_schema(
+        _MATCH_SCHEMA_SCORE, _MATCH_SCHEMA_BLUEPRINTS, _MATCH_SCHEMA_SUGGESTIONS,
+        _MATCH_SCHEMA_OPTIMIZED, _MATCH_SCHEMA_SUMMARY,
+    ),
+    inputs=_MATCH_INPUTS,
+))
+
+# 不含技能学习蓝图的单次生成（蓝图延迟生成时使用）
+prompt_registry.register(PromptTemplate(
+    "match_analysis.core", "v1",
+    instructions=_MATCH_INSTRUCTIONS,
+    schema=_match_schema(
+        _MATCH_SCHEMA_SCORE, _MATCH_SCHEMA_SUGGESTIONS, _MATCH_SCHEMA_OPTIMIZED, _MATCH_SCHEMA_SUMMARY,
+    ),
+    inputs=_MATCH_INPUTS,
+    task="match_analysis",
+))
+
+# 补丁模式下的单次生成：优化版简历改由 match_analysis.optimized_patch 输出编辑操作，这里不再生成整篇简历
+_MATCH_ANALYSIS_INSTRUCTIONS = """
+请作为一名资深 HR 和简历优化专家，深度分析下方简历与职位的匹配程度。
+
+你的目标是：
+1. 给出精准的匹配评分和多维度分析。
+2. 提供**具体、可落地、带有专业话术**的改进建议。
+3. 撰写针对该职位优化后的个人简介，使用 [[ADD]]新内容[[/ADD]] 标识新增内容，使用 [[MOD]]优化后内容[[/MOD]] 标识对原句的润色。
+"""
+
+prompt_registry.register(PromptTemplate(
+    "match_analysis.analysis", "v1",
+    instructions=_MATCH_ANALYSIS_INSTRUCTIONS,
+    schema=_match_schema(
+        _MATCH_SCHEMA_SCORE, _MATCH_SCHEMA_BLUEPRINTS, _MATCH_SCHEMA_SUGGESTIONS, _MATCH_SCHEMA_SUMMARY,
+    ),
+    inputs=_MATCH_INPUTS,
+    task="match_analysis",
+))
+
+prompt_registry.register(PromptTemplate(
+    "match_analysis.analysis_core", "v1",
+    instructions=_MATCH_ANALYSIS_INSTRUCTIONS,
+    schema=_match_schema(_MATCH_SCHEMA_SCORE, _MATCH_SCHEMA_SUGGESTIONS, _MATCH_SCHEMA_SUMMARY),
+    inputs=_MATCH_INPUTS,
+    task="match_analysis",
+))
+
+# 分解模式：匹配分析拆成互不依赖的子任务并发生成，各自使用更小的输出结构与 max_tokens
+prompt_registry.register(PromptTemplate(
+    "match_analysis.score", "v1",
+    instructions="""
+请作为一名资深 HR，分析下方简历与职位的匹配程度，给出精准的匹配评分和多维度分析。
+""",
+    schema=_match_schema(_MATCH_SCHEMA_SCORE),
+    inputs=_MATCH_INPUTS,
+    task="match_analysis",
+    max_tokens=1024,
+))
+
+prompt_registry.register(PromptTemplate(
+    "match_analysis.blueprints", "v1",
+    instructions="""
+请作为一名资深技术面试官与职业规划专家，找出下方简历相对职位要求缺失的核心技能，
+为每项技能给出分阶段的学习路线与面试准备建议。
+""",
+    schema=_match_schema(_MATCH_SCHEMA_BLUEPRINTS),
+    inputs=_MATCH_INPUTS,
+    task="match_analysis",
+    max_tokens=4096,
+))
+
+prompt_registry.register(PromptTemplate(
+    "match_analysis.suggestions", "v1",
+    instructions="""
+请作为一名资深 HR 和简历优化专家，针对下方职位：
+1. 为简历提供**具体、可落地、带有专业话术**的改进建议。
+2. 撰写针对该职位优化后的个人简介，使用 [[ADD]]新内容[[/ADD]] 标识新增内容，使用 [[MOD]]优化后内容[[/MOD]] 标识对原句的润色。
+""",
+    schema=_match_schema(_MATCH_SCHEMA_SUGGESTIONS, _MATCH_SCHEMA_SUMMARY),
+    inputs=_MATCH_INPUTS,
+    task="match_analysis",
+    max_tokens=2048,
+))
+
+prompt_registry.register(PromptTemplate(
+    "match_analysis.optimized", "v1",
+    instructions="""
+请作为一名资深简历优化专家，针对下方职位输出一份“优化版简历预览内容”。**核心禁令：禁止概括！禁止浓缩！禁止删除！**
+""" + _MATCH_OPTIMIZE_RULES,
+    schema=_match_schema(_MATCH_SCHEMA_OPTIMIZED),
+    inputs=_MATCH_INPUTS,
+    task="match_analysis",
+    max_tokens=8192,
+))
+
+
+# 补丁模式下的优化版简历：只输出编辑操作，服务端应用后渲染带批注的预览
+prompt_registry.register(PromptTemplate(
+    "match_analysis.optimized_patch", "v1",
+    instructions="""
+请作为一名资深简历优化专家，针对下方职位对【简历信息】进行“增量式”或“抛光式”优化：
+- 在保留原句的基础上，在合适的位置插入关键词、扩充量化成果、或润色表达。
+- 严禁对原始简历中的技术细节进行任何模糊化处理。
+- 可针对职位需求在 skills_sections 中补充技能，在 education 中补充相关主修课程或奖学金，在 others.certifications 中补充建议考取的证书。
+""" + _PATCH_RULES.format(source="简历信息"),
+    schema=_PATCH_SCHEMA,
+    inputs=_MATCH_INPUTS,
+    task="match_analysis",
+    max_tokens=4096,
+))
+
+
+# ---------------------------------------------------------------- 简历生成
+
+_GENERATION_RULES = """
+你是一位拥有15年经验的顶级职业顾问和 UI 视觉专家。请基于下方的原始数据，为用户生成一份【极具视觉吸引力】且【内容深度优化】的简历。
+
+【⚠️ 简历生成黄金铁律 (STEEL RULES)】:
+1. **内容继承承诺 (CONTENT INHERITANCE)**：原简历中的“项目名称”、“项目描述”和“职责细节”是受保护的资产，**绝对禁止删除、绝对禁止合并、绝对禁止用概括性的套话替换具体的事实信息。**
+2. **润色而非改写 (POLISH, NOT REWRITE)**：你的角色是“抛光师”。如果原本的项目介绍写得已经很清楚，请原封不动地保留。你的优化仅限于：在保留原句的基础上，修正病句、提升话术专业度、或将口语化的描述改写为书面形式。
+3. **新增成就点 (ADDITIONAL VALUE)**：你可以基于 JD 需求，为每个项目“额外增加” 1-2 条量化成果或技术动作点，但原有的点必须作为基石存在。
+4. **格式对齐**：输出的 description 必须包含用户原有的项目背景介绍，actions 必须包含用户原有的全部技术动作，results 必须包含用户原有的全部成果。
+5. 请务必检查 project_experience 是否全量继承了原简历，严禁丢弃任何技术细节！
+
+请返回以下结构的 JSON 对象，确保 project_experience 数组内容充实。
+"""
+
+_GENERATION_SCHEMA = """{
+    "personal_info": {
+        "name": "姓名",
+        "title": "符合目标的专业职能头衔",
+        "summary": "深度的职业画像（2-3句核心竞争力总结）",
+        "labels": ["关键词1", "关键词2"],
+        "contact": { "email": "...", "phone": "...", "location": "..." }
+    },
+    "work_experience": [
+        {
+            "company": "...",
+            "position": "...",
+            "duration": "...",
+            "description": "职责概况",
+            "achievements": ["高价值成就1", "高价值成就2"]
+        }
+    ],
+    "project_experience": [
+        {
+            "name": "项目名称",
+            "role": "我的角色",
+            "duration": "起止时间",
+            "description": "项目面临的挑战与技术难度",
+            "actions": ["我采取的关键技术方案1", "关键方案2"],
+            "results": "最终实现的量化业务价值/技术指标"
+        }
+    ],
+    "skills_sections": [
+        { "category": "技术领域", "skills": ["实打实的技能"] }
+    ],
+    "education": [],
+    "others": {
+        "certifications": ["证书1", "证书2"],
+        "awards": ["奖项1", "奖项2"]
+    }
+}"""
+
+prompt_registry.register(PromptTemplate(
+    "resume_generation", "v2",
+    instructions="""
+【核心指令：深度改写建议应用】
+重点应用下方【改写建议】中的全部建议，
+执行全方位的深度内容增强，保持简历的真实性与专业度的平衡。
+""" + _GENERATION_RULES,
+    schema=_GENERATION_SCHEMA,
+    inputs=(("original", "原始简历数据"), ("context", "优化上下文"), ("suggestions", "改写建议")),
+))
+
+prompt_registry.register(PromptTemplate(
+    "resume_generation.refined", "v2",
+    instructions="""
+【核心指令：结构化用户修订稿】
+用户已经对简历内容进行了手动修订，见下方【修订版文本】。你的任务是将其解析并填入简历的 JSON 结构中。
+**绝对要求**：
+1. 必须完全忠实于用户在【修订版文本】中提供的描述。
+2. 将其拆解为 personal_info, work_experience, project_experience 等模块。
+3. 确保 project_experience 中的每一个项目描述、行动和成果都源自用户的修订稿。
+4. 仅在原稿中完全缺失的关键字段（如联系方式、教育背景）时，才从【原始简历数据】中补全。
+""" + _GENERATION_RULES,
+    schema=_GENERATION_SCHEMA,
+    inputs=(("refined", "修订版文本"), ("original", "原始简历数据"), ("context", "优化上下文"), ("suggestions", "改写建议")),
+    task="resume_generation",
+))
+
+# 补丁模式：在原始简历上应用建议，只输出编辑操作（不适用于用户修订稿）
+prompt_registry.register(PromptTemplate(
+    "resume_generation.patch", "v1",
+    instructions="""
+【核心指令：深度改写建议应用】
+重点应用下方【改写建议】中的全部建议，对【原始简历数据】执行深度内容增强，保持简历的真实性与专业度的平衡。
+1. **润色而非改写**：原本写得清楚的内容原封不动地保留，仅修正病句、提升话术专业度、或将口语化的描述改写为书面形式。
+2. **新增成就点**：可以基于目标职位，为每个项目额外增加 1-2 条量化成果或技术动作。
+3. 用 replace 设置 /personal_info/title（符合目标的专业职能头衔）与 /personal_info/labels（关键词数组），必要时改写 /personal_info/summary（2-3 句核心竞争力总结）。
+""" + _PATCH_RULES.format(source="原始简历数据"),
+    schema=_PATCH_SCHEMA,
+    inputs=(("original", "原始简历数据"), ("context", "优化上下文"), ("suggestions", "改写建议")),
+    task="resume_generation",
+    max_tokens=4096,
+))
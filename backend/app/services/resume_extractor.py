@@ -0,0 +1,183 @@
+"""
+简历字段本地预提取
+用正则从提取出的简历文本中确定性地识别手机号、邮箱、姓名、居住地以及学校/学历/起止时间，
+结果直接写入解析结果，同时作为提示传给模型，减少模型查找与输出的工作量。
+学校只在教育背景段落中查找，避免把工作经历里提到的合作院校当成学历。
+"""
+import re
+from typing import Dict, List, Optional
+
+from app.services.resume_sections import split_resume_sections, SECTION_EDUCATION
+
+# 中国大陆手机号（可带 +86 前缀与空格/短横线分隔）
+_PHONE = re.compile(r"(?<!\d)(?:\+?86[-\s]?)?(1[3-9]\d)[-\s]?(\d{4})[-\s]?(\d{4})(?!\d)")
+_EMAIL = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+_NAME_LABEL = re.compile(r"姓\s*名\s*[:：]\s*([一-龥·]{2,6}|[A-Za-z][A-Za-z .]{1,30})")
+_BARE_NAME = re.compile(r"^[一-龥]{2,4}(?:·[一-龥]{1,6})?$")
+_LOCATION_LABEL = re.compile(r"(?:现居住地|现居地|居住地|所在地|所在城市|现居|城市|地址)\s*[:：]\s*([^\s|，,;；/]{2,30})")
+
+# 年月：2019.03 / 2019-3 / 2019/03 / 2019年3月 / 2019
+_YEAR_MONTH = r"((?:19|20)\d{2})(?:\s*[./\-年]\s*(\d{1,2})\s*月?)?"
+_DATE_RANGE = re.compile(
+    _YEAR_MONTH + r"\s*(?:-|–|—|~|～|至|到)+\s*(?:" + _YEAR_MONTH + r"|(至今|现在|目前|今|present|now|Present|Now))"
+)
+
+# 英文校名中的单词（排除紧挨着校名的学历词）
+_EN_WORD = r"(?!(?:Master|Bachelor|PhD|Ph\.D|MBA|Doctor)\b)[A-Z][A-Za-z&.'\-]*"
+# 校名须从行首或词首开始（前面不能紧挨汉字或字母），且不以介词、动词开头，
+# 不匹配"负责与清华大学合作"这类句子中间提到的校名
+_SCHOOL_LEADING_WORDS = r"(?![与和及在于曾从向赴年月]|毕业|就读|负责|参与|合作|交换|访问)"
+_SCHOOL = re.compile(
+    r"(?<![一-龥A-Za-z])"
+    r"(?:(" + _SCHOOL_LEADING_WORDS + r"[一-龥]{2,20}(?:大学|学院|学校))"
+    r"|((?:" + _EN_WORD + r" )*(?:University|College|Institute)(?: of(?: " + _EN_WORD + r")+)?))"
+)
+# 学历关键词 -> 规范写法（较长的关键词在前）
+_DEGREES = [
+    ("博士研究生", "博士"), ("硕士研究生", "硕士"), ("博士", "博士"), ("硕士", "硕士"), ("研究生", "硕士"),
+    ("本科", "本科"), ("学士", "本科"), ("大专", "大专"), ("专科", "大专"), ("MBA", "硕士"),
+    ("PhD", "博士"), ("Ph.D", "博士"), ("Master", "硕士"), ("Bachelor", "本科"),
+]
+
+# 只在简历开头查找姓名
+_NAME_SCAN_LINES = 5
+
+
+def _format_month(year: str, month: Optional[str]) -> str:
+    return f"{year}.{int(month):02d}" if month else year
+
+
+def extract_phone(text: str) -> str:
+    m = _PHONE.search(text)
+    return "".join(m.groups()) if m else ""
+
+
+def extract_email(text: str) -> str:
+    m = _EMAIL.search(text)
+    return m.group(0) if m else ""
+
+
+def extract_name(text: str) -> str:
+    m = _NAME_LABEL.search(text)
+    if m:
+        return m.group(1).strip()
+    # 开头几行中单独成行的 2~4 个汉字通常是姓名
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    for line in lines[:_NAME_SCAN_LINES]:
+        if _BARE_NAME.match(line):
+            return line
+    return ""
+
+
+def extract_location(text: str) -> str:
+    m = _LOCATION_LABEL.search(text)
+    return m.group(1).strip() if m else ""
+
+
+def extract_date_ranges(text: str) -> List[Dict[str, str]]:
+    """按出现顺序提取所有时间段"""
+    ranges = []
+    for m in _DATE_RANGE.finditer(text):
+        start = _format_month(m.group(1), m.group(2))
+        end = "至今" if m.group(5) else _format_month(m.group(3), m.group(4))
+        ranges.append({"start_date": start, "end_date": end})
+    return ranges
+
+
+def _degree_in(line: str) -> str:
+    for keyword, degree in _DEGREES:
+        if keyword in line:
+            return degree
+    return ""
+
+
+def extract_education(text: str) -> List[Dict[str, str]]:
+    """
+    提取学校及同一行（或下一行）上的学历与时间段
+
+    text 应为教育背景段落；只输出能确定的字段，专业等需要理解上下文的内容留给模型。
+    """
+    lines = text.splitlines()
+    entries: List[Dict[str, str]] = []
+    seen = set()
+    for i, line in enumerate(lines):
+        m = _SCHOOL.search(line)
+        if not m:
+            continue
+        school = (m.group(1) or m.group(2)).strip()
+        if school in seen:
+            continue
+        seen.add(school)
+        context = line + " " + (lines[i + 1] if i + 1 < len(lines) else "")
+        entry = {"school": school}
+        degree = _degree_in(context)
+        if degree:
+            entry["degree"] = degree
+        dates = extract_date_ranges(context)
+        if dates:
+            entry["start_date"] = dates[0]["start_date"]
+            entry["end_date"] = dates[0]["end_date"]
+        entries.append(entry)
+    return entries
+
+
+def extract_resume_hints(text: str) -> Dict:
+    """
+    从简历文本中本地提取确定性字段
+
+    Returns:
+        {"personal_info": {...}, "education": [...]}，只包含找到的字段；
+        没有识别出教育背景小标题时不提取教育经历
+    """
+    personal_info = {
+        "name": extract_name(text),
+        "phone": extract_phone(text),
+        "email": extract_email(text),
+        "location": extract_location(text),
+    }
+    return {
+        "personal_info": {k: v for k, v in personal_info.items() if v},
+        "education": extract_education(split_resume_sections(text).get(SECTION_EDUCATION, "")),
+    }
+
+
+def apply_resume_hints(parsed: Dict, hints: Dict) -> Dict:
+    """
+    用本地提取结果修正模型输出
+
+    手机号与邮箱以本地结果为准；姓名与居住地仅在模型留空时补全；
+    教育经历按学校名匹配，补全模型留空的学历与起止时间。
+    """
+    if not isinstance(parsed, dict):
+        return parsed
+    local_info = hints.get("personal_info") or {}
+    personal_info = parsed.get("personal_info")
+    if not isinstance(personal_info, dict):
+        personal_info = {}
+        parsed["personal_info"] = personal_info
+    for key in ("phone", "email"):
+        if local_info.get(key):
+            personal_info[key] = local_info[key]
+    for key in ("name", "location"):
+        if local_info.get(key) and not personal_info.get(key):
+            personal_info[key] = local_info[key]
+
+    local_education = hints.get("education") or []
+    education = parsed.get("education")
+    if isinstance(education, list) and local_education:
+        for item in education:
+            if not isinstance(item, dict):
+                continue
+            school = item.get("school") or ""
+            match = next(
+                (e for e in local_education if school and (e["school"] in school or school in e["school"])),
+                None
+            )
+            if not match:
+                continue
+            for key in ("degree", "start_date", "end_date"):
+                if match.get(key) and not item.get(key):
+                    item[key] = match[key]
+    elif not education and local_education:
+        parsed["education"] = [dict(e) for e in local_education]
+    return parsed
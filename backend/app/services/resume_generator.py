@@ -10,7 +10,11 @@ import asyncio
 from pathlib import Path
 from playwright.async_api import async_playwright
 
+from app.core.config import settings
 from app.services.ai_service import ai_service
+from app.services.prompt_builder import PromptBuilder
+from app.services.prompt_registry import prompt_registry
+from app.services.resume_patch import apply_resume_patch
 from app.db.session import SessionLocal
 from app.models.resume import Resume
 
@@ -118,93 +122,67 @@ class ResumeGenerator:
         """
         高级 AI 简历内容生成引擎
         """
-        target_context = f"目标职位：{json.dumps(job_data, ensure_ascii=False)}" if job_data else "通用职业发展优化"
-        
-        # 如果提供了用户修订版内容，则强制 AI 基于该内容进行结构化封装
+        # 数据分段紧凑序列化，超出预算时先裁剪目标职位，再裁剪建议，原始简历与用户修订稿最后裁剪
+        builder = PromptBuilder("resume_generation")
+        builder.add("original", original_data, priority=3, min_tokens=2000)
+        builder.add(
+            "suggestions", suggestions, priority=2, min_tokens=500,
+            baseline=(json.dumps(suggestions, ensure_ascii=False) + json.dumps(suggestions, ensure_ascii=False, indent=2)) if suggestions else None
+        )
+        builder.add("job", job_data, priority=1, min_tokens=300, baseline=json.dumps(job_data, ensure_ascii=False) if job_data else None)
         if refined_content:
-            refinement_instruction = f"""
-【核心指令：结构化用户修订稿】
-用户已经对简历内容进行了手动修订，如下所示。你的任务是将其解析并填入简历的 JSON 结构中。
-**绝对要求**：
-1. 必须完全忠实于用户在【修订版文本】中提供的描述。
-2. 将其拆解为 personal_info, work_experience, project_experience 等模块。
-3. 确保 project_experience 中的每一个项目描述、行动和成果都源自用户的修订稿。
-4. 仅在原稿中完全缺失的关键字段（如联系方式、教育背景）时，才从【原始数据】中补全。
-
-【修订版文本】:
-{refined_content}
-"""
-        else:
-            refinement_instruction = f"""
-【核心指令：深度改写建议应用】
-重点应用以下改写建议：{json.dumps(suggestions, ensure_ascii=False)} 
-执行全方位的深度内容增强，保持简历的真实性与专业度的平衡。
-"""
-
-        prompt = f"""
-{refinement_instruction}
-你是一位拥有15年经验的顶级职业顾问和 UI 视觉专家。请基于以下原始数据，为用户生成一份【极具视觉吸引力】且【内容深度优化】的简历。
-
-【原始简历数据】:
-{json.dumps(original_data, ensure_ascii=False, indent=2)}
-
-【优化上下文】:
-{target_context}
-
-【改写建议】:
-{json.dumps(suggestions, ensure_ascii=False, indent=2) if suggestions else "无特定建议"}
-
-【⚠️ 简历生成黄金铁律 (STEEL RULES)】:
-1. **内容继承承诺 (CONTENT INHERITANCE)**：原简历中的“项目名称”、“项目描述”和“职责细节”是受保护的资产，**绝对禁止删除、绝对禁止合并、绝对禁止用概括性的套话替换具体的事实信息。**
-2. **润色而非改写 (POLISH, NOT REWRITE)**：你的角色是“抛光师”。如果原本的项目介绍写得已经很清楚，请原封不动地保留。你的优化仅限于：在保留原句的基础上，修正病句、提升话术专业度、或将口语化的描述改写为书面形式。
-3. **新增成就点 (ADDITIONAL VALUE)**：你可以基于 JD 需求，为每个项目“额外增加” 1-2 条量化成果或技术动作点，但原有的点必须作为基石存在。
-4. **格式对齐**：输出的 description 必须包含用户原有的项目背景介绍，actions 必须包含用户原有的全部技术动作，results 必须包含用户原有的全部成果。
-
-请返回以下结构的 JSON 对象，确保 project_experience 数组内容充实：
-{{
-    "personal_info": {{
-        "name": "姓名",
-        "avatar_url": "{original_data.get('personal_info', {}).get('avatar_url', '')}",
-        "title": "符合目标的专业职能头衔",
-        "summary": "深度的职业画像（2-3句核心竞争力总结）",
-        "labels": ["关键词1", "关键词2"],
-        "contact": {{ "email": "...", "phone": "...", "location": "..." }}
-    }},
-    "work_experience": [
-        {{
-            "company": "...",
-            "position": "...",
-            "duration": "...",
-            "description": "职责概况",
-            "achievements": ["高价值成就1", "高价值成就2"]
-        }}
-    ],
-    "project_experience": [
-        {{
-            "name": "项目名称",
-            "role": "我的角色",
-            "duration": "起止时间",
-            "description": "项目面临的挑战与技术难度",
-            "actions": ["我采取的关键技术方案1", "关键方案2"],
-            "results": "最终实现的量化业务价值/技术指标"
-        }}
-    ],
-    "skills_sections": [
-        {{ "category": "技术领域", "skills": ["实打实的技能"] }}
-    ],
-    "education": [],
-    "others": {{
-        "certifications": ["证书1", "证书2"],
-        "awards": ["奖项1", "奖项2"]
-    }}
-}}
-{{
-    "MATCH_WARNING": "请务必检查 project_experience 是否全量继承了原简历，严禁丢弃任何技术细节！"
-}}
-"""
-        # 使用更大的 AI 限制或更专业的模型
-        result = await ai_service._call_ai(prompt)
-        return result or original_data
+            builder.add("refined", refined_content, priority=4)
+        sections = builder.build()
+
+        target_context = f"目标职位：{sections['job']}" if job_data else "通用职业发展优化"
+
+        result = None
+        if not refined_content and settings.RESUME_OUTPUT_MODE == "patch":
+            # 补丁模式：模型只输出对原简历的编辑操作，本地应用后得到完整简历
+            patch = await ai_service._call_ai(prompt_registry.render(
+                "resume_generation.patch",
+                original=sections["original"],
+                context=target_context,
+                suggestions=sections["suggestions"] or "无特定建议"
+            ))
+            if isinstance(patch, dict) and isinstance(patch.get("ops"), list):
+                result = self._to_generation_schema(apply_resume_patch(original_data, patch["ops"]).document)
+            else:
+                logging.warning("简历生成补丁输出无效，退回整篇生成")
+
+        if result is None:
+            # 如果提供了用户修订版内容，则强制 AI 基于该内容进行结构化封装
+            prompt = prompt_registry.render(
+                "resume_generation.refined" if refined_content else "resume_generation",
+                refined=sections.get("refined"),
+                original=sections["original"],
+                context=target_context,
+                suggestions=sections["suggestions"] or "无特定建议"
+            )
+            # 使用更大的 AI 限制或更专业的模型
+            result = await ai_service._call_ai(prompt)
+        if not result:
+            return original_data
+        # 头像不经过模型，保证提示词固定前缀不随用户变化
+        avatar_url = (original_data.get("personal_info") or {}).get("avatar_url")
+        if avatar_url and isinstance(result.get("personal_info"), dict):
+            result["personal_info"]["avatar_url"] = avatar_url
+        return result
+
+    @staticmethod
+    def _to_generation_schema(content: Dict) -> Dict:
+        """把解析结构（补丁应用后的简历）补齐为生成结构：联系方式归入 contact，教育经历补 duration"""
+        personal = content.setdefault("personal_info", {})
+        contact = personal.setdefault("contact", {})
+        for key in ("email", "phone", "location"):
+            if personal.get(key) and not contact.get(key):
+                contact[key] = personal[key]
+        for edu in content.get("education") or []:
+            if isinstance(edu, dict) and not edu.get("duration"):
+                period = " - ".join(d for d in (edu.get("start_date"), edu.get("end_date")) if d)
+                if period:
+                    edu["duration"] = period
+        return content
 
     def _generate_html_content(self, content: Dict, template_info: Dict) -> str:
         """
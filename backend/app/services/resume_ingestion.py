@@ -0,0 +1,435 @@
+"""
+简历解析任务队列
+上传接口只写入简历记录与一条排队任务，由常驻 worker 从数据库领取并解析：
+- 任务持久化在 resume_ingestion_jobs 表中，服务重启后未完成的任务继续处理
+- worker 数量固定（RESUME_QUEUE_CONCURRENCY），大量简历同时上传时排队而不是并发打满模型与进程池
+- 领取任务时以乐观锁（attempts 版本号）抢占，并写入租约；处理期间定期续约，
+  worker 失联后租约过期（可见性超时），任务重新可见并被其他 worker 领取，多进程部署同样安全
+- 可重试的失败按指数退避重新排队，超过最大次数后简历标记为 failed
+"""
+import asyncio
+import copy
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.ingestion import ResumeIngestionJob
+from app.models.resume import Resume
+from app.services.ai_service import ai_service
+from app.services.text_extraction import text_extractor, ExtractionTimeoutError
+from app.services.upload_store import upload_store, PURPOSE_RESUME
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# 已结束任务的清理间隔（秒）
+_PURGE_INTERVAL = 3600
+
+
+class PermanentIngestionError(Exception):
+    """重试也无法成功的失败（如文件中提取不到文本），任务直接结束"""
+
+
+async def process_resume_parsing(resume_id: str, db: Session):
+    """
+    提取简历文本并调用模型解析，成功后写回 parsed_data
+
+    提取的文本与解析结果同时记入文件对应的 upload_blobs 记录，重复上传同一文件时直接复用。
+
+    Raises:
+        PermanentIngestionError: 简历不存在或提取不到文本
+        RuntimeError: 模型解析失败（可重试）
+    """
+    resume = db.query(Resume).filter(Resume.id == resume_id).first()
+    if not resume:
+        raise PermanentIngestionError("简历不存在或已删除")
+
+    resume.status = "parsing"
+    db.commit()
+
+    blob = upload_store.find_by_path(db, PURPOSE_RESUME, resume.file_path)
+    if blob is not None and blob.parsed_data:
+        # 排队期间同一文件已被其他任务解析完成
+        resume.parsed_data = copy.deepcopy(blob.parsed_data)
+        resume.status = "parsed"
+        db.commit()
+        return
+
+    if blob is not None and blob.extracted_text:
+        content = blob.extracted_text
+    else:
+        # 文本提取在进程池中执行，不阻塞事件循环
+        try:
+            content = await text_extractor.extract_file(resume.file_path)
+        except ExtractionTimeoutError as e:
+            logger.error(f"简历文本提取超时: {resume.filename}: {e}")
+            content = ""
+
+    if not content.strip():
+        logger.warning(f"文件内容提取为空: {resume.filename}")
+        raise PermanentIngestionError("文件内容提取为空")
+    if blob is not None and not blob.extracted_text:
+        # 先保存提取结果，模型解析失败重试时不必再次提取
+        upload_store.update(blob, extracted_text=content)
+        db.commit()
+
+    parsed_result = await ai_service.parse_resume_text(content)
+    if not parsed_result:
+        raise RuntimeError("AI 解析简历失败")
+
+    resume.parsed_data = parsed_result
+    resume.status = "parsed"
+    if blob is not None:
+        upload_store.update(blob, parsed_data=copy.deepcopy(parsed_result))
+    db.commit()
+
+
+class ResumeIngestionQueue:
+    """基于数据库的简历解析队列与 worker 池"""
+
+    def __init__(self):
+        self._worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        # 本进程正在处理的任务：job_id -> lease_token
+        self._active: Dict[str, str] = {}
+        self._last_purge = 0.0
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+        self.reclaimed = 0
+
+    # ------------------------------------------------------------ 生产者
+
+    def submit(self, db: Session, resume_id: str) -> ResumeIngestionJob:
+        """在调用方的事务中加入一条排队任务（调用方提交后应调用 notify）"""
+        job = ResumeIngestionJob(
+            resume_id=resume_id,
+            status=JOB_QUEUED,
+            attempts=0,
+            max_attempts=settings.RESUME_QUEUE_MAX_ATTEMPTS,
+            available_at=datetime.utcnow(),
+        )
+        db.add(job)
+        return job
+
+    def notify(self):
+        """唤醒空闲的 worker，不必等到下一次轮询"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # ------------------------------------------------------------ 生命周期
+
+    def start(self):
+        """启动 worker（应用启动时调用）"""
+        if self._tasks:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._recover_orphans()
+        for index in range(max(1, settings.RESUME_QUEUE_CONCURRENCY)):
+            self._tasks.append(asyncio.create_task(self._worker(f"{self._worker_prefix}:{index}")))
+        logger.info(f"简历解析队列已启动，worker 数: {len(self._tasks)}")
+
+    async def stop(self):
+        """停止 worker，并归还本进程持有的租约，重启后立即可被重新领取"""
+        self._stopping = True
+        self.notify()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if not self._active:
+            return
+        db = SessionLocal()
+        try:
+            for job_id, token in list(self._active.items()):
+                db.query(ResumeIngestionJob).filter(
+                    ResumeIngestionJob.id == job_id,
+                    ResumeIngestionJob.lease_token == token,
+                ).update({
+                    "status": JOB_QUEUED,
+                    # 被中断的这次不计入重试次数
+                    "attempts": ResumeIngestionJob.attempts - 1,
+                    "available_at": datetime.utcnow(),
+                    "locked_until": None,
+                    "lease_token": None,
+                    "worker_id": None,
+                }, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.error(f"归还简历解析任务租约失败: {e}")
+        finally:
+            db.close()
+            self._active.clear()
+
+    def _recover_orphans(self):
+        """为旧版本遗留的、仍处于 parsing 但没有队列任务的简历补建任务"""
+        db = SessionLocal()
+        try:
+            queued = db.query(ResumeIngestionJob.resume_id)
+            orphans = db.query(Resume.id).filter(
+                Resume.status == "parsing",
+                Resume.file_path.isnot(None),
+                Resume.id.notin_(queued),
+            ).all()
+            for (resume_id,) in orphans:
+                self.submit(db, resume_id)
+            db.commit()
+            if orphans:
+                logger.info(f"为 {len(orphans)} 份未完成解析的简历补建了队列任务")
+        except Exception as e:
+            logger.error(f"检查遗留的解析中简历失败: {e}")
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------ 消费者
+
+    async def _worker(self, worker_id: str):
+        while not self._stopping:
+            try:
+                job = self._claim(worker_id)
+            except Exception as e:
+                logger.error(f"领取简历解析任务失败: {e}")
+                job = None
+            if job is None:
+                self._purge_finished()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.RESUME_QUEUE_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            await self._run(job)
+
+    def _claim(self, worker_id: str) -> Optional[Dict]:
+        """领取一条可执行的任务：到期的排队任务，或租约已过期的运行中任务"""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            candidates = db.query(
+                ResumeIngestionJob.id,
+                ResumeIngestionJob.resume_id,
+                ResumeIngestionJob.status,
+                ResumeIngestionJob.attempts,
+                ResumeIngestionJob.max_attempts,
+            ).filter(or_(
+                and_(ResumeIngestionJob.status == JOB_QUEUED, ResumeIngestionJob.available_at <= now),
+                and_(ResumeIngestionJob.status == JOB_RUNNING, ResumeIngestionJob.locked_until < now),
+            )).order_by(ResumeIngestionJob.available_at).limit(settings.RESUME_QUEUE_CONCURRENCY + 1).all()
+
+            for job_id, resume_id, status, attempts, max_attempts in candidates:
+                guard = (
+                    ResumeIngestionJob.id == job_id,
+                    ResumeIngestionJob.status == status,
+                    ResumeIngestionJob.attempts == attempts,
+                )
+                if status == JOB_RUNNING:
+                    logger.warning(f"简历解析任务 {job_id} 租约已过期，处理它的 worker 可能已失联")
+                    if attempts >= (max_attempts or 1):
+                        # 反复卡死或拖垮 worker 的文件不再重试
+                        if db.query(ResumeIngestionJob).filter(*guard).update(
+                                self._finished_values(JOB_FAILED, "处理超时次数过多"), synchronize_session=False):
+                            self._mark_resume_failed(db, resume_id)
+                            self.failed += 1
+                        db.commit()
+                        continue
+
+                token = uuid.uuid4().hex
+                claimed = db.query(ResumeIngestionJob).filter(*guard).update({
+                    "status": JOB_RUNNING,
+                    "attempts": attempts + 1,
+                    "locked_until": now + timedelta(seconds=settings.RESUME_QUEUE_VISIBILITY_TIMEOUT),
+                    "lease_token": token,
+                    "worker_id": worker_id,
+                }, synchronize_session=False)
+                db.commit()
+                if claimed:
+                    if status == JOB_RUNNING:
+                        self.reclaimed += 1
+                    self._active[job_id] = token
+                    return {
+                        "id": job_id,
+                        "resume_id": resume_id,
+                        "attempt": attempts + 1,
+                        "max_attempts": max_attempts or 1,
+                        "token": token,
+                    }
+                # 已被其他 worker 抢先领取，尝试下一条
+            return None
+        finally:
+            db.close()
+
+    async def _run(self, job: Dict):
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"], job["token"]))
+        db = SessionLocal()
+        try:
+            await process_resume_parsing(job["resume_id"], db)
+            self._finish(db, job, JOB_DONE)
+            self.processed += 1
+        except asyncio.CancelledError:
+            # 应用退出：租约由 stop() 统一归还
+            raise
+        except PermanentIngestionError as e:
+            db.rollback()
+            self._finish(db, job, JOB_FAILED, str(e))
+            self.failed += 1
+        except Exception as e:
+            db.rollback()
+            logger.error(f"简历解析失败（第 {job['attempt']}/{job['max_attempts']} 次）: {e}")
+            if job["attempt"] >= job["max_attempts"]:
+                self._finish(db, job, JOB_FAILED, str(e))
+                self.failed += 1
+            else:
+                self._retry(db, job, str(e))
+                self.retried += 1
+        finally:
+            heartbeat.cancel()
+            db.close()
+            if not self._stopping:
+                self._active.pop(job["id"], None)
+
+    async def _heartbeat(self, job_id: str, token: str):
+        """处理期间定期延长租约，避免耗时较长的解析被误判为失联"""
+        interval = max(1.0, settings.RESUME_QUEUE_VISIBILITY_TIMEOUT / 3)
+        while True:
+            await asyncio.sleep(interval)
+            db = SessionLocal()
+            try:
+                db.query(ResumeIngestionJob).filter(
+                    ResumeIngestionJob.id == job_id,
+                    ResumeIngestionJob.lease_token == token,
+                ).update({
+                    "locked_until": datetime.utcnow() + timedelta(seconds=settings.RESUME_QUEUE_VISIBILITY_TIMEOUT),
+                }, synchronize_session=False)
+                db.commit()
+            except Exception as e:
+                logger.warning(f"简历解析任务续约失败: {e}")
+            finally:
+                db.close()
+
+    @staticmethod
+    def _finished_values(status: str, error: Optional[str] = None) -> Dict:
+        return {
+            "status": status,
+            "last_error": error[:1000] if error else None,
+            "finished_at": datetime.utcnow(),
+            "locked_until": None,
+            "lease_token": None,
+        }
+
+    def _finish(self, db: Session, job: Dict, status: str, error: Optional[str] = None):
+        # 只有仍持有租约时才写入结果；租约已被其他 worker 接管则以对方为准
+        owned = db.query(ResumeIngestionJob).filter(
+            ResumeIngestionJob.id == job["id"],
+            ResumeIngestionJob.lease_token == job["token"],
+        ).update(self._finished_values(status, error), synchronize_session=False)
+        if owned and status == JOB_FAILED:
+            self._mark_resume_failed(db, job["resume_id"])
+        db.commit()
+
+    def _retry(self, db: Session, job: Dict, error: str):
+        base = settings.RESUME_QUEUE_RETRY_BASE_DELAY
+        delay = min(base * 2 ** (job["attempt"] - 1), settings.RESUME_QUEUE_RETRY_MAX_DELAY)
+        # 加入随机抖动，避免同一批失败的任务同时重试
+        delay += random.uniform(0, base)
+        db.query(ResumeIngestionJob).filter(
+            ResumeIngestionJob.id == job["id"],
+            ResumeIngestionJob.lease_token == job["token"],
+        ).update({
+            "status": JOB_QUEUED,
+            "available_at": datetime.utcnow() + timedelta(seconds=delay),
+            "last_error": error[:1000],
+            "locked_until": None,
+            "lease_token": None,
+        }, synchronize_session=False)
+        db.commit()
+        logger.info(f"简历解析任务 {job['id']} 将在 {delay:.1f}s 后重试")
+
+    @staticmethod
+    def _mark_resume_failed(db: Session, resume_id: str):
+        db.query(Resume).filter(Resume.id == resume_id).update({"status": "failed"}, synchronize_session=False)
+
+    def _purge_finished(self):
+        """定期删除超过保留期的已结束任务"""
+        now = asyncio.get_running_loop().time()
+        if now - self._last_purge < _PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        cutoff = datetime.utcnow() - timedelta(days=settings.RESUME_QUEUE_RETENTION_DAYS)
+        db = SessionLocal()
+        try:
+            db.query(ResumeIngestionJob).filter(
+                ResumeIngestionJob.status.in_((JOB_DONE, JOB_FAILED)),
+                ResumeIngestionJob.finished_at < cutoff,
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.warning(f"清理已结束的简历解析任务失败: {e}")
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------ 状态
+
+    def status(self, db: Session, limit: int = 20) -> Dict:
+        """队列状态：各状态任务数、最早排队任务的等待时长、未完成任务列表与本进程 worker 统计"""
+        now = datetime.utcnow()
+        counts = {s: 0 for s in (JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED)}
+        for status, count in db.query(ResumeIngestionJob.status, func.count(ResumeIngestionJob.id)).group_by(ResumeIngestionJob.status):
+            counts[status] = count
+        oldest = db.query(func.min(ResumeIngestionJob.created_at)).filter(ResumeIngestionJob.status == JOB_QUEUED).scalar()
+
+        pending = db.query(ResumeIngestionJob).filter(
+            ResumeIngestionJob.status.in_((JOB_QUEUED, JOB_RUNNING))
+        ).order_by(ResumeIngestionJob.created_at).limit(limit).all()
+        recent_failures = db.query(ResumeIngestionJob).filter(
+            ResumeIngestionJob.status == JOB_FAILED
+        ).order_by(ResumeIngestionJob.finished_at.desc()).limit(limit).all()
+
+        def view(job: ResumeIngestionJob) -> Dict:
+            return {
+                "id": job.id,
+                "resume_id": job.resume_id,
+                "status": job.status,
+                "attempts": job.attempts,
+                "max_attempts": job.max_attempts,
+                "available_at": job.available_at.isoformat() if job.available_at else None,
+                "locked_until": job.locked_until.isoformat() if job.locked_until else None,
+                "worker_id": job.worker_id,
+                "last_error": job.last_error,
+                "created_at": job.created_at.isoformat() if job.created_at else None,
+            }
+
+        return {
+            "counts": counts,
+            "oldest_queued_seconds": round((now - oldest).total_seconds(), 1) if oldest else 0.0,
+            "workers": {
+                "concurrency": settings.RESUME_QUEUE_CONCURRENCY,
+                "alive": sum(1 for task in self._tasks if not task.done()),
+                "busy": len(self._active),
+                "processed": self.processed,
+                "retried": self.retried,
+                "failed": self.failed,
+                "reclaimed": self.reclaimed,
+            },
+            "pending": [view(job) for job in pending],
+            "recent_failures": [view(job) for job in recent_failures],
+        }
+
+
+# 创建全局实例
+resume_ingestion_queue = ResumeIngestionQueue()
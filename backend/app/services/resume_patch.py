@@ -0,0 +1,308 @@
+"""
+简历补丁式输出
+模型不再逐字重写整份简历，只输出针对原始简历数据的编辑操作，由服务端应用后重建完整文档与批注预览：
+- replace：用 value 替换 path 处的值（对象中不存在的字段视为新增）
+- insert：在 path 指向的数组位置之前插入 value，"-" 表示追加到末尾
+path 为 JSON Pointer（RFC 6901），下标均指向模型看到的原始文档（即 prune 之后的数据），
+应用前换算为原始数据中的下标，补丁应用在原始数据的深拷贝上，空字段与 raw_text 等不发给模型的字段原样保留。
+先应用全部 replace，再按下标从大到小执行 insert，插入不会影响其他操作的定位。
+"""
+import copy
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.prompt_builder import prune
+
+OP_REPLACE = "replace"
+OP_INSERT = "insert"
+
+# 预览文本中的批注标记（与前端 renderTaggedText 一致）
+ADD_OPEN, ADD_CLOSE = "[[ADD]]", "[[/ADD]]"
+MOD_OPEN, MOD_CLOSE = "[[MOD]]", "[[/MOD]]"
+
+APPEND = "-"
+
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+class PatchError(ValueError):
+    """编辑操作无法应用到文档"""
+
+
+class PatchResult:
+    """应用补丁的结果"""
+
+    __slots__ = ("document", "marked", "applied", "skipped")
+
+    def __init__(self, document: Any, marked: Any, applied: int, skipped: int):
+        # 应用补丁后的完整文档
+        self.document = document
+        # 同一文档，新增内容包裹 [[ADD]]，替换内容包裹 [[MOD]]
+        self.marked = marked
+        self.applied = applied
+        self.skipped = skipped
+
+
+def parse_pointer(path: str) -> List[str]:
+    """把 JSON Pointer 拆成路径片段（兼容省略开头的 /）"""
+    if not isinstance(path, str) or not path.strip("/"):
+        raise PatchError(f"无效的路径: {path!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in path.strip().lstrip("/").split("/")]
+
+
+def _list_index(container: list, token: str, allow_end: bool) -> int:
+    if token == APPEND and allow_end:
+        return len(container)
+    try:
+        index = int(token)
+    except ValueError:
+        raise PatchError(f"数组下标无效: {token!r}")
+    upper = len(container) if allow_end else len(container) - 1
+    if not 0 <= index <= upper:
+        raise PatchError(f"数组下标越界: {index}")
+    return index
+
+
+def _resolve_parent(document: Any, tokens: List[str]) -> Any:
+    """沿路径找到最后一段的父容器；对象中缺失的中间字段按下一段的类型补建"""
+    node = document
+    for i, token in enumerate(tokens[:-1]):
+        if isinstance(node, dict):
+            if node.get(token) in (None, ""):
+                following = tokens[i + 1]
+                node[token] = [] if following == APPEND or following.isdigit() else {}
+            node = node[token]
+        elif isinstance(node, list):
+            node = node[_list_index(node, token, allow_end=False)]
+        else:
+            raise PatchError(f"路径穿过了非容器值: {token!r}")
+    if not isinstance(node, (dict, list)):
+        raise PatchError("父节点不是容器")
+    return node
+
+
+def _wrap(value: Any, opening: str, closing: str) -> Any:
+    """给值中的每个字符串加上批注标记"""
+    if isinstance(value, str):
+        return f"{opening}{value}{closing}" if value else value
+    if isinstance(value, list):
+        return [_wrap(v, opening, closing) for v in value]
+    if isinstance(value, dict):
+        return {k: _wrap(v, opening, closing) for k, v in value.items()}
+    return value
+
+
+def _valid_ops(ops: Any) -> List[Dict]:
+    if not isinstance(ops, list):
+        return []
+    return [
+        op for op in ops
+        if isinstance(op, dict) and op.get("op") in (OP_REPLACE, OP_INSERT) and "value" in op and isinstance(op.get("path"), str)
+    ]
+
+
+def _apply(document: Any, ops: List[Dict], mark: bool) -> int:
+    """就地应用操作，返回成功应用的条数"""
+    applied = 0
+    # 第一轮：replace（此时数组长度与原文档一致，下标可直接定位）
+    for op in ops:
+        if op["op"] != OP_REPLACE:
+            continue
+        try:
+            tokens = parse_pointer(op["path"])
+            parent = _resolve_parent(document, tokens)
+            value = copy.deepcopy(op["value"])
+            if isinstance(parent, list):
+                index = _list_index(parent, tokens[-1], allow_end=False)
+                old = parent[index]
+            else:
+                index, old = tokens[-1], parent.get(tokens[-1])
+            if mark and prune(value) != prune(old):
+                value = _wrap(value, MOD_OPEN, MOD_CLOSE) if old not in (None, "", [], {}) else _wrap(value, ADD_OPEN, ADD_CLOSE)
+            parent[index] = value
+            applied += 1
+        except PatchError as e:
+            logging.debug(f"跳过无法应用的补丁操作 {op.get('path')}: {e}")
+
+    # 第二轮：先按原始下标定位全部 insert，再从后往前插入
+    inserts: List[Tuple[int, int, int, list, Any]] = []
+    for order, op in enumerate(ops):
+        if op["op"] != OP_INSERT:
+            continue
+        try:
+            tokens = parse_pointer(op["path"])
+            parent = _resolve_parent(document, tokens)
+            value = copy.deepcopy(op["value"])
+            if mark:
+                value = _wrap(value, ADD_OPEN, ADD_CLOSE)
+            if isinstance(parent, dict):
+                # 对象字段：不存在时新增，已存在的数组则追加
+                key = tokens[-1]
+                if isinstance(parent.get(key), list):
+                    parent[key].append(value)
+                elif parent.get(key) in (None, ""):
+                    parent[key] = value
+                else:
+                    raise PatchError(f"字段已存在: {key!r}")
+                applied += 1
+                continue
+            inserts.append((id(parent), _list_index(parent, tokens[-1], allow_end=True), order, parent, value))
+        except PatchError as e:
+            logging.debug(f"跳过无法应用的补丁操作 {op.get('path')}: {e}")
+
+    # 同一位置的多条插入保持模型给出的先后顺序
+    for _, index, _, parent, value in sorted(inserts, key=lambda item: (item[0], item[1], item[2]), reverse=True):
+        parent.insert(index, value)
+        applied += 1
+    return applied
+
+
+def _original_path(original: Any, path: str) -> str:
+    """
+    把指向 prune 后文档的路径换算为指向原始数据的路径
+
+    prune 只会删除数组中的空元素，对象字段名不变，因此只需换算数组下标；
+    路径进入原始数据中不存在的部分后，其余片段原样保留。
+    """
+    tokens = parse_pointer(path)
+    node = original
+    for i, token in enumerate(tokens):
+        if isinstance(node, dict):
+            node = node.get(token)
+            continue
+        if not isinstance(node, list) or token == APPEND:
+            break
+        kept = [index for index, item in enumerate(node) if prune(item) is not None]
+        try:
+            position = int(token)
+        except ValueError:
+            break
+        if 0 <= position < len(kept):
+            tokens[i] = str(kept[position])
+            node = node[kept[position]]
+        else:
+            # 等于长度（插入到末尾）对应原始数组的末尾，越界的下标换算后仍然越界
+            if position >= len(kept):
+                tokens[i] = str(len(node) + position - len(kept))
+            break
+    return "/" + "/".join(token.replace("~", "~0").replace("/", "~1") for token in tokens)
+
+
+def apply_resume_patch(original: Dict, ops: Any) -> PatchResult:
+    """
+    把编辑操作应用到原始简历数据
+
+    Args:
+        original: 原始 parsed_data（提示词中是 prune 之后的数据，操作的下标会先换算到原始数据上）
+        ops: 模型输出的操作列表，格式不合法或无法定位的操作会被跳过
+    """
+    valid = []
+    for op in _valid_ops(ops):
+        try:
+            valid.append({**op, "path": _original_path(original, op["path"])})
+        except PatchError as e:
+            logging.debug(f"跳过无法应用的补丁操作 {op.get('path')}: {e}")
+    base = original if isinstance(original, dict) else {}
+    document = copy.deepcopy(base)
+    marked = copy.deepcopy(base)
+    applied = _apply(document, valid, mark=False)
+    _apply(marked, valid, mark=True)
+    skipped = (len(ops) if isinstance(ops, list) else 0) - applied
+    if skipped:
+        logging.warning(f"简历补丁有 {skipped} 条操作未能应用")
+    return PatchResult(document, marked, applied, skipped)
+
+
+def _join(values: Any, sep: str = "、") -> str:
+    if isinstance(values, list):
+        return sep.join(str(v) for v in values if v)
+    return str(values or "")
+
+
+def _line(*parts: Any, sep: str = " | ") -> str:
+    return sep.join(str(p) for p in parts if p)
+
+
+def _period(item: Dict) -> str:
+    if item.get("duration"):
+        return item["duration"]
+    return _line(item.get("start_date"), item.get("end_date"), sep=" - ")
+
+
+def render_marked_resume(resume: Dict, summary: Optional[str] = None) -> str:
+    """
+    把（带批注的）结构化简历渲染为优化版简历预览文本
+
+    按【个人简介】【工作经历】【项目经验】【技能清单】【教育背景】【荣誉认证】的顺序输出，
+    与整篇生成时要求模型遵循的顺序一致。
+    """
+    resume = resume or {}
+    lines: List[str] = []
+    personal = resume.get("personal_info") or {}
+
+    lines.append("【个人简介】")
+    header = _line(personal.get("name"), personal.get("title"))
+    if header:
+        lines.append(header)
+    labels = _join(personal.get("labels"), " / ")
+    if labels:
+        lines.append(labels)
+    if summary or personal.get("summary"):
+        lines.append(summary or personal["summary"])
+    lines.append("")
+
+    lines.append("【工作经历】")
+    for exp in resume.get("work_experience") or []:
+        if not isinstance(exp, dict):
+            lines.append(f"- {exp}")
+            continue
+        lines.append(_line(exp.get("company"), exp.get("position"), _period(exp)))
+        if exp.get("description"):
+            lines.append(exp["description"])
+        for achievement in exp.get("achievements") or []:
+            lines.append(f"- {achievement}")
+        lines.append("")
+    lines.append("")
+
+    lines.append("【项目经验】")
+    for project in resume.get("project_experience") or []:
+        if not isinstance(project, dict):
+            lines.append(f"- {project}")
+            continue
+        lines.append(_line(project.get("name"), project.get("role"), _period(project)))
+        if project.get("description"):
+            lines.append(project["description"])
+        for action in project.get("actions") or []:
+            lines.append(f"- {action}")
+        if project.get("results"):
+            lines.append(f"成果：{_join(project['results'], '；')}")
+        lines.append("")
+    lines.append("")
+
+    lines.append("【技能清单】")
+    for section in resume.get("skills_sections") or []:
+        if isinstance(section, dict):
+            lines.append(_line(section.get("category"), _join(section.get("skills")), sep="："))
+        else:
+            lines.append(str(section))
+    lines.append("")
+
+    lines.append("【教育背景】")
+    for edu in resume.get("education") or []:
+        if not isinstance(edu, dict):
+            lines.append(str(edu))
+            continue
+        lines.append(_line(edu.get("school"), _line(edu.get("degree"), edu.get("major"), sep=" "), _period(edu)))
+        for key in ("courses", "honors", "description"):
+            if edu.get(key):
+                lines.append(_join(edu[key]))
+    lines.append("")
+
+    lines.append("【荣誉认证】")
+    others = resume.get("others") or {}
+    for key, title in (("certifications", "资质证书"), ("awards", "荣誉奖项"), ("publications", "论文/出版物")):
+        if others.get(key):
+            lines.append(f"{title}：{_join(others[key])}")
+
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
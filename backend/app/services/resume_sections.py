@@ -0,0 +1,96 @@
+"""
+简历文本分段
+按常见的中英文小标题把提取出的简历文本切分为 联系方式/简介/教育/工作/项目/技能/证书 等段落，
+供分段并行解析使用。识别不到的小标题不会切断内容，仍归入上一个段落。
+小标题须独占一行且与关键词完全一致，避免把 "技术栈：Java" 这类正文行当成新段落。
+"""
+import re
+from typing import Dict, List, Tuple
+
+SECTION_HEADER = "header"  # 第一个小标题之前的内容（姓名、联系方式等）
+SECTION_SUMMARY = "summary"
+SECTION_EDUCATION = "education"
+SECTION_WORK = "work"
+SECTION_PROJECTS = "projects"
+SECTION_SKILLS = "skills"
+SECTION_CERTIFICATES = "certificates"
+
+# 小标题关键词（去掉序号、括号、冒号等装饰后，整行须与某个关键词完全相同才视为小标题）
+SECTION_KEYWORDS = {
+    SECTION_SUMMARY: ["个人简介", "个人总结", "自我评价", "个人评价", "个人优势", "求职意向", "summary", "profile", "about me", "objective"],
+    SECTION_EDUCATION: ["教育背景", "教育经历", "学历背景", "学习经历", "education"],
+    SECTION_WORK: ["工作经历", "工作经验", "实习经历", "任职经历", "职业经历", "work experience", "professional experience", "employment", "experience"],
+    SECTION_PROJECTS: ["项目经历", "项目经验", "项目介绍", "主要项目", "projects", "project experience"],
+    SECTION_SKILLS: ["专业技能", "技能清单", "技术栈", "技能特长", "个人技能", "技能", "skills", "technical skills"],
+    SECTION_CERTIFICATES: ["资格证书", "证书", "荣誉奖项", "获奖经历", "获奖情况", "荣誉", "奖项", "论文", "发表论文", "certifications", "certificates", "awards", "publications"],
+}
+_KEYWORD_SECTIONS = {keyword: section for section, keywords in SECTION_KEYWORDS.items() for keyword in keywords}
+
+# 去掉小标题的装饰：序号、括号、冒号、井号、分隔线等
+_HEADING_DECOR = re.compile(r"^[\s#*\-=|【\[（(]*(?:[一二三四五六七八九十]+[、.．]|\d+[、.．])?\s*|[\s】\]）):：\-=|*]*$")
+_COLON = re.compile(r"[:：]")
+_SPACES = re.compile(r"\s+")
+
+
+def _heading_section(line: str) -> str:
+    """
+    若该行是小标题，返回段落类型，否则返回空串
+
+    只接受独占一行的小标题：冒号后还有内容的行（如 "技术栈：Java, Spring"、"证书编号:123"）
+    是正文，以关键词开头的句子（如 "发表论文3篇"、"技能提升明显"）也是正文。
+    """
+    colon = _COLON.search(line)
+    if colon and line[colon.end():].strip():
+        return ""
+    stripped = _HEADING_DECOR.sub("", line.strip())
+    return _KEYWORD_SECTIONS.get(_SPACES.sub(" ", stripped).lower(), "")
+
+
+def _blocks(text: str) -> List[Tuple[str, List[str]]]:
+    """逐行切分为 (段落类型, 行列表) 的块，每遇到一个小标题开始新块；第一块为开头部分"""
+    blocks: List[Tuple[str, List[str]]] = [(SECTION_HEADER, [])]
+    for line in text.splitlines():
+        section = _heading_section(line)
+        if section:
+            blocks.append((section, []))
+        else:
+            blocks[-1][1].append(line)
+    return blocks
+
+
+def split_resume_sections(text: str) -> Dict[str, str]:
+    """
+    把简历文本切分为段落
+
+    Returns:
+        段落类型 -> 文本；同类型的多个段落按出现顺序拼接
+    """
+    parts: Dict[str, List[str]] = {}
+    for section, lines in _blocks(text):
+        parts.setdefault(section, []).extend(lines)
+
+    result = {}
+    for section, lines in parts.items():
+        body = "\n".join(lines).strip()
+        if body:
+            result[section] = body
+    return result
+
+
+def recognized_sections(sections: Dict[str, str]) -> List[str]:
+    """识别出小标题的段落（不含开头的联系方式部分）"""
+    return [name for name in sections if name != SECTION_HEADER]
+
+
+def split_looks_valid(text: str) -> bool:
+    """
+    切分结果是否可信：同类小标题只出现一次，且每个小标题下都有正文
+
+    正文行被误判为小标题时，通常表现为同类小标题重复出现或两个小标题紧挨着，
+    此时应退回整篇解析，而不是把后面的内容归入错误的段落。
+    """
+    headed = _blocks(text)[1:]
+    sections = [section for section, _ in headed]
+    if len(sections) != len(set(sections)):
+        return False
+    return all(any(line.strip() for line in lines) for _, lines in headed)
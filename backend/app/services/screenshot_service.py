@@ -0,0 +1,164 @@
+"""
+职位截图预处理与解析结果缓存
+- 解码上传的图片，按最长边缩小到目标分辨率并重新编码为 JPEG，减少发给视觉模型的体积
+- 以解码后像素的 SHA-256 作为指纹，像素完全相同的截图（含重新压缩、改了元数据的同一张图）直接返回上次的解析结果
+- 同一网站的不同职位截图版式几乎一致，差别只在少量文字，感知哈希的近似匹配会把它们判为同一张，因此只做精确匹配
+- 未安装 Pillow 时原样透传图片，缓存按文件内容精确匹配
+"""
+import hashlib
+import io
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    logging.warning("未安装 Pillow，截图将不做缩放，缓存仅匹配完全相同的文件")
+
+# 常见图片格式的文件头
+_MAGIC_TYPES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+# RIFF 容器还用于 WAV、AVI 等格式，WebP 需在第 8~12 字节带有 WEBP 标识
+_RIFF = b"RIFF"
+_WEBP = b"WEBP"
+
+
+class InvalidImageError(ValueError):
+    """上传内容无法作为图片解码"""
+
+
+class PreparedImage:
+    """预处理后的截图"""
+
+    __slots__ = ("data", "media_type", "width", "height", "fingerprint", "original_bytes")
+
+    def __init__(self, data: bytes, media_type: str, width: int, height: int, fingerprint: str,
+                 original_bytes: int):
+        self.data = data
+        self.media_type = media_type
+        self.width = width
+        self.height = height
+        # 解码后像素的 SHA-256；没有 Pillow 时为文件内容的 SHA-256
+        self.fingerprint = fingerprint
+        self.original_bytes = original_bytes
+
+
+def sniff_media_type(data: bytes) -> Optional[str]:
+    for magic, media_type in _MAGIC_TYPES:
+        if data.startswith(magic):
+            return media_type
+    if data.startswith(_RIFF) and data[8:12] == _WEBP:
+        return "image/webp"
+    return None
+
+
+def pixel_digest(image: "Image.Image") -> str:
+    """解码后像素的 SHA-256（包含尺寸与色彩模式），与文件编码方式和元数据无关"""
+    digest = hashlib.sha256(f"{image.mode}:{image.width}x{image.height}:".encode("ascii"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def prepare_screenshot(data: bytes) -> PreparedImage:
+    """
+    解码、纠正方向、缩放并重新编码截图（CPU 密集，应在线程中调用）
+
+    Raises:
+        InvalidImageError: 内容不是可识别的图片
+    """
+    if not PIL_AVAILABLE:
+        media_type = sniff_media_type(data)
+        if media_type is None:
+            raise InvalidImageError("无法识别的图片格式")
+        return PreparedImage(data, media_type, 0, 0, hashlib.sha256(data).hexdigest(), len(data))
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception as e:
+        raise InvalidImageError(f"无法识别的图片格式: {e}")
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "L"):
+        # 透明背景按白色铺底，避免转 JPEG 后变黑
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        rgba = image.convert("RGBA")
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        image = background
+    fingerprint = pixel_digest(image)
+
+    max_side = settings.SCREENSHOT_MAX_SIDE
+    resized = max(image.size) > max_side
+    if resized:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=settings.SCREENSHOT_JPEG_QUALITY, optimize=True)
+    encoded = buffer.getvalue()
+    # 未缩放且重新编码后反而更大（如纯色块为主的 PNG）时保留原图
+    original_type = sniff_media_type(data)
+    if not resized and original_type and len(encoded) >= len(data):
+        return PreparedImage(data, original_type, image.width, image.height, fingerprint, len(data))
+    return PreparedImage(encoded, "image/jpeg", image.width, image.height, fingerprint, len(data))
+
+
+class ScreenshotCache:
+    """按像素指纹精确匹配的截图解析结果缓存（进程内 LRU）"""
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image: PreparedImage) -> Optional[Dict]:
+        """返回指纹相同且未过期的缓存结果"""
+        with self._lock:
+            entry = self._entries.get(image.fingerprint)
+            if entry is not None and time.time() - entry[1] > settings.SCREENSHOT_CACHE_TTL:
+                del self._entries[image.fingerprint]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(image.fingerprint)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, image: PreparedImage, result: Dict):
+        with self._lock:
+            self._entries[image.fingerprint] = (result, time.time())
+            self._entries.move_to_end(image.fingerprint)
+            while len(self._entries) > settings.SCREENSHOT_CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                # True 表示按解码后的像素匹配，False 表示按文件内容匹配
+                "pixel_match": PIL_AVAILABLE,
+            }
+
+
+# 创建全局实例
+screenshot_cache = ScreenshotCache()
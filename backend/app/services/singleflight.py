@@ -0,0 +1,49 @@
+"""
+单飞（single-flight）请求合并
+相同键的并发调用只触发一次上游请求，所有调用方共享同一结果。
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """进程内的并发请求合并器"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0  # 实际发起的上游调用数
+        self.followers = 0  # 被合并掉的重复调用数
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        执行 fn，若已有相同 key 的调用在进行中则等待其结果
+
+        上游调用运行在独立 Task 中，个别调用方取消不会影响其他等待者。
+        """
+        task = self._inflight.get(key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+            self.leaders += 1
+        else:
+            self.followers += 1
+            logging.info(f"合并重复的 AI 请求: {key[:12]}")
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 取出异常，避免所有调用方都已取消时出现 "exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict:
+        return {
+            "inflight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers
+        }
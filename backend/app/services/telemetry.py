@@ -0,0 +1,283 @@
+"""
+AI 调用遥测
+- 逐次调用记录（任务、模型、token、提示词缓存命中 token、耗时、重试、缓存命中、JSON 修复结果）以 JSON 行写入监控日志
+- 写文件由后台线程通过队列完成（QueueHandler + QueueListener + RotatingFileHandler），不阻塞事件循环
+- 进程内聚合为计数器与延迟直方图，供 /metrics 导出
+"""
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# 延迟直方图分桶上界（秒）
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+CALL_OK = "ok"
+CALL_ERROR = "error"
+CALL_CIRCUIT_OPEN = "circuit_open"
+
+_trace_ids = itertools.count(1)
+
+
+class _JSONLineFormatter(logging.Formatter):
+    """把日志记录中的结构化负载序列化为一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = getattr(record, "payload", None) or {"msg": record.getMessage()}
+        payload.setdefault("ts", time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created)))
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class CallTrace:
+    """单次逻辑调用的追踪上下文（可能包含多次上游尝试）"""
+
+    def __init__(self, telemetry: "AITelemetry", task: str, model: str, prompt_chars: int):
+        self._telemetry = telemetry
+        self.started = time.monotonic()
+        self.task_id = f"AI_{int(time.time())}_{next(_trace_ids)}"
+        self.task = task
+        self.model = model
+        self.prompt_chars = prompt_chars
+        self.attempts = 0
+        self.hedged = False
+        self.config_id: Optional[str] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.cached_tokens: Optional[int] = None
+
+    def log(self, msg: str):
+        """追加一条过程事件"""
+        self._telemetry.emit({"task_id": self.task_id, "task": self.task, "model": self.model, "event": msg})
+
+    def set_usage(self, config_id: str, model: str, usage: Dict):
+        self.config_id = config_id
+        self.model = model
+        self.prompt_tokens = usage.get("prompt_tokens")
+        self.completion_tokens = usage.get("completion_tokens")
+        self.cached_tokens = usage.get("cached_tokens")
+
+    @property
+    def cached_ratio(self) -> Optional[float]:
+        """输入 token 中命中服务商提示词缓存的比例"""
+        if not self.prompt_tokens or self.cached_tokens is None:
+            return None
+        return round(self.cached_tokens / self.prompt_tokens, 3)
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+
+class AITelemetry:
+    """AI 调用遥测汇总"""
+
+    def __init__(self):
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._listener: Optional[QueueListener] = None
+        self._start_lock = threading.Lock()
+        self._logger = logging.getLogger("app.ai_monitor")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.addHandler(QueueHandler(self._queue))
+
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self._tokens: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self._latency: Dict[str, _Histogram] = defaultdict(_Histogram)
+        self._cache_hits: Dict[str, int] = defaultdict(int)
+        self._parse: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._retries: Dict[str, int] = defaultdict(int)
+        self._hedges: Dict[str, int] = defaultdict(int)
+        self._prompt_tokens: Dict[str, int] = defaultdict(int)
+        self._prompt_saved: Dict[str, int] = defaultdict(int)
+
+    def start(self):
+        """启动后台写日志线程（首次写入时自动调用）"""
+        with self._start_lock:
+            if self._listener is not None:
+                return
+            handler = RotatingFileHandler(
+                settings.AI_MONITOR_LOG_PATH,
+                maxBytes=settings.AI_MONITOR_LOG_MAX_BYTES,
+                backupCount=settings.AI_MONITOR_LOG_BACKUP_COUNT,
+                encoding="utf-8"
+            )
+            handler.setFormatter(_JSONLineFormatter())
+            self._listener = QueueListener(self._queue, handler)
+            self._listener.start()
+
+    def stop(self):
+        """刷新队列并停止后台线程（应用退出时调用）"""
+        with self._start_lock:
+            if self._listener is None:
+                return
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+
+    def emit(self, payload: Dict):
+        """写入一条结构化日志（只入队，不做 IO）"""
+        if self._listener is None:
+            self.start()
+        self._logger.info("", extra={"payload": payload})
+
+    def trace(self, task: str, model: str, prompt_chars: int) -> CallTrace:
+        return CallTrace(self, task, model, prompt_chars)
+
+    def finish(self, trace: CallTrace, status: str, parse_status: Optional[str] = None, cache_hit: bool = False):
+        """结束一次逻辑调用：输出调用记录并更新聚合指标"""
+        latency = time.monotonic() - trace.started
+        record = {
+            "task_id": trace.task_id,
+            "type": "call",
+            "task": trace.task,
+            "model": trace.model,
+            "config_id": trace.config_id,
+            "status": status,
+            "latency": round(latency, 3),
+            "prompt_chars": trace.prompt_chars,
+            "prompt_tokens": trace.prompt_tokens,
+            "completion_tokens": trace.completion_tokens,
+            "cached_tokens": trace.cached_tokens,
+            "cached_ratio": trace.cached_ratio,
+            "attempts": trace.attempts,
+            "retries": max(0, trace.attempts - 1),
+            "hedged": trace.hedged,
+            "cache_hit": cache_hit,
+            "parse_status": parse_status
+        }
+        self.emit(record)
+        with self._lock:
+            self._calls[(trace.task, trace.model, status)] += 1
+            if cache_hit:
+                self._cache_hits[trace.task] += 1
+                return
+            self._latency[trace.task].observe(latency)
+            if trace.prompt_tokens:
+                self._tokens[(trace.task, trace.model, "prompt")] += trace.prompt_tokens
+            if trace.completion_tokens:
+                self._tokens[(trace.task, trace.model, "completion")] += trace.completion_tokens
+            if trace.cached_tokens:
+                self._tokens[(trace.task, trace.model, "cached")] += trace.cached_tokens
+            if parse_status:
+                self._parse[(trace.task, parse_status)] += 1
+            if trace.attempts > 1:
+                self._retries[trace.task] += trace.attempts - 1
+            if trace.hedged:
+                self._hedges[trace.task] += 1
+
+    def record_prompt(self, task: str, tokens: int, saved_tokens: int):
+        """记录提示词构建时的数据 token 数与相对旧写法节省的 token 数"""
+        with self._lock:
+            self._prompt_tokens[task] += tokens
+            self._prompt_saved[task] += saved_tokens
+
+    def snapshot(self) -> Dict:
+        """聚合指标的 JSON 视图"""
+        with self._lock:
+            latency = {}
+            for task, hist in self._latency.items():
+                latency[task] = {
+                    "count": hist.count,
+                    "avg": round(hist.total / hist.count, 3) if hist.count else 0.0,
+                    "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], hist.counts))
+                }
+            prompt_totals: Dict[str, int] = defaultdict(int)
+            cached_totals: Dict[str, int] = defaultdict(int)
+            for (task, _, kind), n in self._tokens.items():
+                if kind == "prompt":
+                    prompt_totals[task] += n
+                elif kind == "cached":
+                    cached_totals[task] += n
+            return {
+                "calls": [{"task": t, "model": m, "status": s, "count": n} for (t, m, s), n in self._calls.items()],
+                "tokens": [{"task": t, "model": m, "kind": k, "count": n} for (t, m, k), n in self._tokens.items()],
+                "latency_seconds": latency,
+                "cache_hits": dict(self._cache_hits),
+                "json_parse": [{"task": t, "outcome": o, "count": n} for (t, o), n in self._parse.items()],
+                "retries": dict(self._retries),
+                "hedges": dict(self._hedges),
+                "prompt_tokens": dict(self._prompt_tokens),
+                "prompt_tokens_saved": dict(self._prompt_saved),
+                "prompt_cache_ratio": {
+                    task: round(cached_totals[task] / total, 3) for task, total in prompt_totals.items() if total
+                }
+            }
+
+    def render_prometheus(self, gauges: Optional[List[Tuple[str, Dict[str, str], float]]] = None) -> str:
+        """
+        导出 Prometheus 文本格式
+
+        Args:
+            gauges: 额外的瞬时指标 (名称, 标签, 值)，如调度队列深度与熔断状态
+        """
+        def labels(**kv) -> str:
+            inner = ",".join(f'{k}="{str(v).replace(chr(34), "")}"' for k, v in kv.items())
+            return "{" + inner + "}" if inner else ""
+
+        lines: List[str] = []
+        with self._lock:
+            lines.append("# TYPE ai_calls_total counter")
+            for (task, model, status), n in self._calls.items():
+                lines.append(f"ai_calls_total{labels(task=task, model=model, status=status)} {n}")
+            lines.append("# TYPE ai_tokens_total counter")
+            for (task, model, kind), n in self._tokens.items():
+                lines.append(f"ai_tokens_total{labels(task=task, model=model, kind=kind)} {n}")
+            lines.append("# TYPE ai_cache_hits_total counter")
+            for task, n in self._cache_hits.items():
+                lines.append(f"ai_cache_hits_total{labels(task=task)} {n}")
+            lines.append("# TYPE ai_json_parse_total counter")
+            for (task, outcome), n in self._parse.items():
+                lines.append(f"ai_json_parse_total{labels(task=task, outcome=outcome)} {n}")
+            lines.append("# TYPE ai_retries_total counter")
+            for task, n in self._retries.items():
+                lines.append(f"ai_retries_total{labels(task=task)} {n}")
+            lines.append("# TYPE ai_hedges_total counter")
+            for task, n in self._hedges.items():
+                lines.append(f"ai_hedges_total{labels(task=task)} {n}")
+            lines.append("# TYPE ai_prompt_tokens_saved_total counter")
+            for task, n in self._prompt_saved.items():
+                lines.append(f"ai_prompt_tokens_saved_total{labels(task=task)} {n}")
+            lines.append("# TYPE ai_call_latency_seconds histogram")
+            for task, hist in self._latency.items():
+                cumulative = 0
+                for bound, count in zip(list(LATENCY_BUCKETS) + ["+Inf"], hist.counts):
+                    cumulative += count
+                    lines.append(f"ai_call_latency_seconds_bucket{labels(task=task, le=bound)} {cumulative}")
+                lines.append(f"ai_call_latency_seconds_sum{labels(task=task)} {round(hist.total, 6)}")
+                lines.append(f"ai_call_latency_seconds_count{labels(task=task)} {hist.count}")
+
+        emitted_types = set()
+        for name, gauge_labels, value in gauges or []:
+            if name not in emitted_types:
+                lines.append(f"# TYPE {name} gauge")
+                emitted_types.add(name)
+            lines.append(f"{name}{labels(**gauge_labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# 创建全局实例
+ai_telemetry = AITelemetry()
@@ -0,0 +1,489 @@
+"""
+文档文本提取进程池
+PDF / Word 文本提取是 CPU 密集的同步操作，直接在协程中调用会阻塞整个事件循环：
+- 在有界的 ProcessPoolExecutor 中执行，并限制同时排队的文件数
+- 单个文件超时后终止并重建进程池，卡死的 worker 不会拖住后续请求
+- PDF 只提取前 TEXT_EXTRACTION_MAX_PAGES 页；先用 pypdf 快速提取，按文本质量评分，
+  只有质量不达标的页面才回退到 pdfplumber（简历使用保留版面的 layout 模式）
+- Word 用 iterparse 流式解析（含表格、文本框、页眉页脚），简历与 JD 文档共用同一实现
+- 进程池累计处理若干个文件后整体替换（worker 随之重启），并限制单个 worker 的地址空间，防止内存持续膨胀
+- 进程池不可用时（如受限环境无法创建子进程）退回线程池执行
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple, Union
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+KIND_PDF = "pdf"
+KIND_DOCX = "docx"
+KIND_TEXT = "text"
+
+# 纯文本简历最多读取的字符数
+TEXT_MAX_CHARS = 15000
+
+
+class ExtractionTimeoutError(TimeoutError):
+    """单个文件的提取超过了 TEXT_EXTRACTION_TIMEOUT"""
+
+
+def kind_for(filename: str) -> Optional[str]:
+    """按扩展名判断提取方式，不支持的类型返回 None"""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == ".pdf":
+        return KIND_PDF
+    if ext in (".doc", ".docx"):
+        return KIND_DOCX
+    if ext == ".txt":
+        return KIND_TEXT
+    return None
+
+
+# ---------------------------------------------------------------- worker 内执行的函数（必须可被 pickle）
+
+def _init_worker(memory_limit_mb: int):
+    """限制 worker 的地址空间，超大文档在子进程内触发 MemoryError 而不是拖垮整机"""
+    if memory_limit_mb <= 0:
+        return
+    try:
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def _open_source(source: Union[str, bytes]):
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+
+_CJK = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]")
+# CJK 字符之间被插入空格（字距较大的 PDF 常见），语义没有损失但会浪费 token 并干扰模型
+_SPACED_CJK = re.compile(r"[\u3400-\u9fff] (?=[\u3400-\u9fff])")
+# 无法映射到 Unicode 的字形（缺少 ToUnicode 表）、替换符、私用区字符与控制字符
+_GARBAGE = re.compile(r"\(cid:\d+\)|[\ufffd\ue000-\uf8ff\x00-\x08\x0b\x0c\x0e-\x1f]")
+# 按错误编码解码出的乱码（如 UTF-8 被当作 Latin-1）
+_MOJIBAKE = re.compile(r"[\u0080-\u02ff]")
+
+# 正常页面至少应有的非空白字符数
+_MIN_PAGE_CHARS = 20
+
+
+def text_quality(text: Optional[str]) -> float:
+    """
+    对单页提取结果打分（0~1），用于判断快速提取的结果是否可用
+
+    依据：非空白字符数量、乱码与无法映射字形的比例、CJK 字符被空格拆散的比例、
+    行结构（整页只有一行长文本、或大量只有一两个字符的行说明阅读顺序已被打乱）。
+    """
+    if not text:
+        return 0.0
+    visible = len(text) - sum(text.count(c) for c in " \t\r\n\u3000")
+    if visible <= 0:
+        return 0.0
+    score = min(1.0, visible / _MIN_PAGE_CHARS)
+
+    garbage = sum(len(m) for m in _GARBAGE.findall(text))
+    score *= max(0.0, 1.0 - 4 * garbage / visible)
+    mojibake = len(_MOJIBAKE.findall(text)) / visible
+    if mojibake > 0.2:
+        score *= max(0.0, 1.0 - mojibake)
+
+    cjk = len(_CJK.findall(text))
+    if cjk >= 10 and cjk / visible > 0.2:
+        spaced = len(_SPACED_CJK.findall(text)) / cjk
+        if spaced > 0.3:
+            score *= 1.0 - spaced / 2
+
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if len(lines) == 1 and visible > 300:
+        score *= 0.6
+    elif len(lines) >= 10:
+        fragments = sum(1 for line in lines if len(line) <= 2) / len(lines)
+        if fragments > 0.5:
+            score *= 1.0 - fragments / 2
+    return round(score, 3)
+
+
+def _pdfplumber_pages(source: Union[str, bytes], layout: bool, max_pages: int, indexes: Optional[List[int]] = None) -> Dict[int, str]:
+    """用 pdfplumber 提取指定页（默认全部）的文本"""
+    import pdfplumber
+
+    texts = {}
+    with pdfplumber.open(_open_source(source)) as pdf:
+        total = min(len(pdf.pages), max_pages) if max_pages else len(pdf.pages)
+        for index in (range(total) if indexes is None else indexes):
+            page = pdf.pages[index]
+            texts[index] = page.extract_text(layout=layout) or ""
+            # 释放已处理页面的对象缓存，长文档内存占用不随页数累积
+            page.flush_cache()
+    return texts
+
+
+def _pypdf_pages(source: Union[str, bytes], max_pages: int) -> Dict[int, str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(_open_source(source))
+    pages = reader.pages
+    total = min(len(pages), max_pages) if max_pages else len(pages)
+    texts = {}
+    for index in range(total):
+        try:
+            texts[index] = pages[index].extract_text() or ""
+        except Exception as e:
+            # 单页失败交给回退逻辑处理
+            logger.debug(f"pypdf 提取第 {index + 1} 页失败: {e}")
+            texts[index] = ""
+    return texts
+
+
+def extract_pdf(source: Union[str, bytes], layout: bool = False, max_pages: int = 0,
+                engine: str = "auto", min_quality: float = 0.6) -> Tuple[str, Dict]:
+    """
+    提取 PDF 文本，max_pages > 0 时只处理前若干页
+
+    engine 为 auto 时先用 pypdf 提取全部页面，质量分低于 min_quality 的页面再用 pdfplumber 重新提取
+    （layout 为 True 时保留版面），两者取分数高的结果；pypdf 为仅用 pypdf，pdfplumber 为仅用 pdfplumber。
+
+    Returns:
+        (文本, 提取信息)，提取信息包含使用的引擎、页数、回退页数、平均质量分与耗时
+    """
+    started = time.perf_counter()
+    meta = {"engine": engine, "pages": 0, "fallback_pages": 0, "quality": 0.0}
+    texts: Dict[int, str] = {}
+    scores: Dict[int, float] = {}
+    try:
+        if engine != "pdfplumber":
+            try:
+                texts = _pypdf_pages(source, max_pages)
+                meta["engine"] = "pypdf"
+            except ImportError:
+                engine = "pdfplumber"
+            except Exception as e:
+                if engine == "pypdf":
+                    raise
+                logger.warning(f"pypdf 无法读取该 PDF，改用 pdfplumber: {e}")
+                engine = "pdfplumber"
+
+        if engine == "pdfplumber":
+            texts = _pdfplumber_pages(source, layout, max_pages)
+            meta["engine"] = "pdfplumber"
+        scores = {index: text_quality(text) for index, text in texts.items()}
+
+        if engine == "auto":
+            weak = [index for index, score in scores.items() if score < min_quality]
+            if weak:
+                for index, text in _pdfplumber_pages(source, layout, max_pages, weak).items():
+                    score = text_quality(text)
+                    if score > scores[index]:
+                        texts[index], scores[index] = text, score
+                        meta["fallback_pages"] += 1
+                if meta["fallback_pages"]:
+                    meta["engine"] = "pypdf+pdfplumber"
+    except Exception as e:
+        logger.error(f"PDF 提取失败: {e}")
+
+    meta["pages"] = len(texts)
+    meta["quality"] = round(sum(scores.values()) / len(scores), 3) if scores else 0.0
+    meta["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return "\n".join(texts[index] for index in sorted(texts) if texts[index]), meta
+
+
+# WordprocessingML 命名空间（过渡版与严格版）与标记兼容命名空间
+_W_NAMESPACES = (
+    "http://schemas.openxmlformats.org/wordprocessingml/2006/main",
+    "http://purl.oclc.org/ooxml/wordprocessingml/main",
+)
+_MC_NAMESPACE = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+
+_TEXT, _TAB, _BREAK, _PARAGRAPH, _CELL, _ROW, _FALLBACK = range(7)
+
+
+def _w_tags(*names: str) -> Dict[str, str]:
+    return {f"{{{ns}}}{name}": name for ns in _W_NAMESPACES for name in names}
+
+
+# 元素结束时的处理方式（按完整标签查表，避免逐个元素拆分命名空间）
+_END_ACTIONS = {
+    **{tag: _TEXT for tag in _w_tags("t")},
+    **{tag: _TAB for tag in _w_tags("tab")},
+    **{tag: _BREAK for tag in _w_tags("br", "cr")},
+    **{tag: _PARAGRAPH for tag in _w_tags("p")},
+    **{tag: _CELL for tag in _w_tags("tc")},
+    **{tag: _ROW for tag in _w_tags("tr")},
+    # 文本框在 mc:Choice（DrawingML）与 mc:Fallback（VML）中各存一份，只取前者
+    f"{{{_MC_NAMESPACE}}}Fallback": _FALLBACK,
+}
+_CELL_TAGS = frozenset(_w_tags("tc"))
+_BODY_TAGS = frozenset(_w_tags("body"))
+_FALLBACK_TAG = f"{{{_MC_NAMESPACE}}}Fallback"
+
+_DOCX_MAIN = "word/document.xml"
+_DOCX_PARTS = re.compile(r"^word/(header|footer)\d*\.xml$")
+# 行尾多余的空格与制表符（单元格分隔符），以及三个以上的连续换行
+_DOCX_CLEANUP = re.compile(r"[ \t]+(?=\n)|\n(?:[ \t]*\n){2,}")
+
+
+def _iter_docx_part(stream, out: List[str]):
+    """
+    流式解析一个 XML 部件并把文本追加到 out
+
+    正文（或页眉页脚根节点）下的每个顶层块（段落、表格）处理完后立即从树中清除，
+    解析大文档时内存占用只取决于最大的单个块，与文档长度无关。
+    表格按行输出，单元格之间用制表符分隔，单元格内的多个段落合并为一行。
+    被修订删除的文本（w:delText）与域代码（w:instrText）不属于正文，不会被提取。
+    """
+    depth = 0
+    container = None
+    container_depth = 0
+    fallback = 0
+    cells = 0
+    block_start = len(out)
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            depth += 1
+            if tag in _CELL_TAGS:
+                cells += 1
+            elif tag == _FALLBACK_TAG:
+                fallback += 1
+            elif container is None or tag in _BODY_TAGS:
+                # 根节点（页眉页脚）或 w:body（正文）的直接子元素即顶层块
+                container, container_depth = elem, depth
+            continue
+
+        depth -= 1
+        action = _END_ACTIONS.get(tag)
+        if action is None:
+            pass
+        elif action == _FALLBACK:
+            fallback -= 1
+        elif action == _CELL:
+            cells -= 1
+            if fallback:
+                pass
+            elif out and out[-1] == " ":
+                # 单元格最后一个段落结束处的空格换成单元格分隔符
+                out[-1] = "\t"
+            else:
+                out.append("\t")
+        elif fallback:
+            pass
+        elif action == _TEXT:
+            if elem.text:
+                out.append(elem.text)
+        elif action == _PARAGRAPH:
+            out.append(" " if cells else "\n")
+        elif action == _TAB:
+            out.append("\t")
+        else:
+            out.append("\n")
+
+        if depth == container_depth:
+            container.clear()
+            # 同一块的文本片段合并为一个字符串，减少大量小字符串对象的开销
+            if len(out) - block_start > 1:
+                out[block_start:] = ["".join(out[block_start:])]
+            block_start = len(out)
+
+
+def extract_docx(source: Union[str, bytes]) -> str:
+    """
+    提取 Word（.docx）全部文本：正文段落、表格、文本框、页眉与页脚
+
+    使用 iterparse 逐个元素流式解析，不构建完整的 DOM 树，简历与 JD 文档共用。
+    """
+    parts: List[str] = []
+    try:
+        with zipfile.ZipFile(_open_source(source)) as zf:
+            names = zf.namelist()
+            # 正文之后依次是页眉、页脚
+            extra = sorted((name for name in names if _DOCX_PARTS.match(name)), key=lambda name: (name.startswith("word/footer"), name))
+            for name in ([_DOCX_MAIN] if _DOCX_MAIN in names else []) + extra:
+                with zf.open(name) as f:
+                    _iter_docx_part(f, parts)
+                parts.append("\n")
+    except Exception as e:
+        logger.error(f"Word 文档提取失败: {e}")
+
+    # 去掉行尾多余的分隔符，合并连续空行
+    result = _DOCX_CLEANUP.sub(lambda m: "" if m.group(0)[0] != "\n" else "\n\n", "".join(parts)).strip()
+    logger.debug(f"提取文本预览(前800字):\n{result[:800]}")
+    return result
+
+
+def extract_plain_text(source: Union[str, bytes]) -> str:
+    if isinstance(source, bytes):
+        return source[:TEXT_MAX_CHARS * 4].decode("utf-8", errors="ignore")[:TEXT_MAX_CHARS]
+    with open(source, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read(TEXT_MAX_CHARS)
+
+
+def _extract(kind: str, source: Union[str, bytes], layout: bool, max_pages: int,
+             pdf_engine: str = "auto", min_quality: float = 0.6) -> Tuple[str, Dict]:
+    """worker 入口：返回 (文本, 提取信息)"""
+    if kind == KIND_PDF:
+        return extract_pdf(source, layout=layout, max_pages=max_pages, engine=pdf_engine, min_quality=min_quality)
+    started = time.perf_counter()
+    if kind == KIND_DOCX:
+        engine, text = "docx-iterparse", extract_docx(source)
+    else:
+        engine, text = "text", extract_plain_text(source)
+    return text, {"engine": engine, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+# ---------------------------------------------------------------- 事件循环侧
+
+class TextExtractor:
+    """在进程池中提取文档文本"""
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._pool_tasks = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        # 进程池创建失败后改用线程池
+        self._use_threads = False
+        self.completed = 0
+        self.timeouts = 0
+        self.recycles = 0
+        self.resets = 0
+        # 各提取引擎处理的文件数与 PDF 回退页数
+        self.engines: Dict[str, int] = defaultdict(int)
+        self.fallback_pages = 0
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        """返回当前进程池（累计任务数达到 TEXT_EXTRACTION_RECYCLE_TASKS 时先替换为新进程池）"""
+        with self._pool_lock:
+            recycle_tasks = settings.TEXT_EXTRACTION_RECYCLE_TASKS
+            if self._pool is not None and recycle_tasks and self._pool_tasks >= recycle_tasks:
+                # 已提交的任务照常完成，之后旧 worker 退出并释放内存
+                self._pool.shutdown(wait=False)
+                self._pool = None
+                self.recycles += 1
+            if self._pool is None and not self._use_threads:
+                try:
+                    # 服务进程中有后台线程与数据库连接，不使用 fork
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=settings.TEXT_EXTRACTION_WORKERS,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(settings.TEXT_EXTRACTION_WORKER_MEMORY_MB,),
+                    )
+                    self._pool_tasks = 0
+                except (OSError, NotImplementedError, ValueError) as e:
+                    logger.warning(f"无法创建文本提取进程池，改用线程池: {e}")
+                    self._use_threads = True
+            if self._pool is not None:
+                self._pool_tasks += 1
+            return self._pool
+
+    def _discard_pool(self, pool: ProcessPoolExecutor):
+        """
+        终止进程池中的全部 worker（包括卡死的那个），下次提交时重建；
+        同一进程池中其他未完成的任务会收到 BrokenProcessPool 并在新进程池中重试
+        """
+        with self._pool_lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        self.resets += 1
+        # ProcessPoolExecutor 没有公开的强制终止接口，只能直接结束其子进程
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            if process.is_alive():
+                process.terminate()
+        pool.shutdown(wait=False)
+
+    async def extract(self, source: Union[str, bytes], kind: str, layout: bool = False) -> str:
+        """
+        提取文本
+
+        Args:
+            source: 文件路径或文件内容
+            kind: KIND_PDF / KIND_DOCX / KIND_TEXT
+            layout: PDF 是否保留版面布局（简历需要，JD 文档不需要）
+
+        Raises:
+            ExtractionTimeoutError: 超过 TEXT_EXTRACTION_TIMEOUT 仍未完成
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(settings.TEXT_EXTRACTION_WORKERS * 2)
+        args = (kind, source, layout, settings.TEXT_EXTRACTION_MAX_PAGES, settings.PDF_EXTRACTION_ENGINE,
+                settings.PDF_MIN_TEXT_QUALITY)
+        async with self._slots:
+            for attempt in range(2):
+                pool = self._get_pool()
+                if pool is None:
+                    text, meta = await asyncio.wait_for(asyncio.to_thread(_extract, *args), settings.TEXT_EXTRACTION_TIMEOUT)
+                    return self._record(source, text, meta)
+                future = asyncio.get_running_loop().run_in_executor(pool, _extract, *args)
+                try:
+                    # shield：超时后不取消 worker 中的任务，由终止进程池统一结束，避免与进程池的善后逻辑冲突
+                    text, meta = await asyncio.wait_for(asyncio.shield(future), settings.TEXT_EXTRACTION_TIMEOUT)
+                    return self._record(source, text, meta)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    logger.error(f"文本提取超时（{settings.TEXT_EXTRACTION_TIMEOUT:g}s），重建进程池")
+                    # 被终止的任务随后会以 BrokenProcessPool 结束，取走结果以免告警
+                    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                    self._discard_pool(pool)
+                    raise ExtractionTimeoutError(f"文档解析超时（{settings.TEXT_EXTRACTION_TIMEOUT:g}s）")
+                except BrokenProcessPool as e:
+                    # worker 被系统杀死（如超出内存限制）或进程池因其他文件超时被重建，换新进程池重试一次
+                    logger.warning(f"文本提取进程池已损坏，重建后重试: {e}")
+                    self._discard_pool(pool)
+            return ""
+
+    def _record(self, source: Union[str, bytes], text: str, meta: Dict) -> str:
+        """记录并输出每个文件的提取引擎与耗时"""
+        self.completed += 1
+        self.engines[meta["engine"]] += 1
+        self.fallback_pages += meta.get("fallback_pages", 0)
+        name = os.path.basename(source) if isinstance(source, str) else f"<{len(source)} bytes>"
+        if "pages" in meta:
+            logger.info(
+                f"文本提取 {name}: 引擎 {meta['engine']}，{meta['pages']} 页（回退 {meta['fallback_pages']} 页），"
+                f"平均质量 {meta['quality']}，耗时 {meta['elapsed_ms']}ms，{len(text)} 字符"
+            )
+        else:
+            logger.info(f"文本提取 {name}: 引擎 {meta['engine']}，耗时 {meta['elapsed_ms']}ms，{len(text)} 字符")
+        return text
+
+    async def extract_file(self, file_path: str, layout: bool = True) -> str:
+        """按扩展名提取已保存文件的文本"""
+        return await self.extract(file_path, kind_for(file_path) or KIND_TEXT, layout=layout)
+
+    def shutdown(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        return {
+            "mode": "thread" if self._use_threads else "process",
+            "workers": settings.TEXT_EXTRACTION_WORKERS,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "recycles": self.recycles,
+            "resets": self.resets,
+            "engines": dict(self.engines),
+            "fallback_pages": self.fallback_pages,
+        }
+
+
+# 创建全局实例
+text_extractor = TextExtractor()
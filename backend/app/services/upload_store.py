@@ -0,0 +1,183 @@
+"""
+上传文件的流式接收与按内容去重
+- 分块读取上传内容，边读边计算 SHA-256，超过 MAX_UPLOAD_SIZE 立即中止，不会把超大文件整块读进内存或写满磁盘
+- 文件按哈希命名保存，相同内容只保留一份
+- 打开、写入、重命名等磁盘操作在线程中执行，大文件上传不会阻塞事件循环
+- upload_blobs 表按（用途, 哈希）缓存提取出的文本与模型解析结果，重复上传同一文件时跳过文本提取与模型解析
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+from fastapi import UploadFile
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.upload import UploadBlob
+
+logger = logging.getLogger(__name__)
+
+PURPOSE_RESUME = "resume"
+PURPOSE_JOB_DOCUMENT = "job_document"
+
+# 读取上传文件的分块大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """上传内容超过大小限制"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        super().__init__(f"文件大小超过限制（最大 {limit // (1024 * 1024)}MB）")
+
+
+class ReceivedUpload:
+    """已接收的上传内容：落盘时 path 为临时文件路径，否则 data 为内容"""
+
+    __slots__ = ("sha256", "size", "path", "data")
+
+    def __init__(self, sha256: str, size: int, path: Optional[str] = None, data: Optional[bytes] = None):
+        self.sha256 = sha256
+        self.size = size
+        self.path = path
+        self.data = data
+
+
+async def _chunks(file: UploadFile, max_size: int):
+    # 框架已知大小时直接拒绝，不再逐块读取
+    if getattr(file, "size", None) is not None and file.size > max_size:
+        raise UploadTooLargeError(max_size)
+    size = 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_size:
+            raise UploadTooLargeError(max_size)
+        yield chunk
+
+
+async def read_upload(file: UploadFile, max_size: Optional[int] = None) -> ReceivedUpload:
+    """把上传内容读入内存（用于不需要落盘的小文件），同时计算哈希"""
+    max_size = max_size or settings.MAX_UPLOAD_SIZE
+    digest = hashlib.sha256()
+    parts = []
+    async for chunk in _chunks(file, max_size):
+        digest.update(chunk)
+        parts.append(chunk)
+    data = b"".join(parts)
+    return ReceivedUpload(digest.hexdigest(), len(data), data=data)
+
+
+async def receive_to_disk(file: UploadFile, directory: str, max_size: Optional[int] = None) -> ReceivedUpload:
+    """把上传内容分块写入 directory 下的临时文件，同时计算哈希；超过大小限制时删除临时文件"""
+    max_size = max_size or settings.MAX_UPLOAD_SIZE
+    await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+    temp_path = os.path.join(directory, f".{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        out = await asyncio.to_thread(open, temp_path, "wb")
+        try:
+            async for chunk in _chunks(file, max_size):
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+                size += len(chunk)
+        finally:
+            await asyncio.to_thread(out.close)
+    except BaseException:
+        await asyncio.to_thread(discard, temp_path)
+        raise
+    return ReceivedUpload(digest.hexdigest(), size, path=temp_path)
+
+
+def discard(path: Optional[str]):
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"删除临时上传文件失败: {e}")
+
+
+def content_path(directory: str, sha256: str, ext: str) -> str:
+    return os.path.join(directory, f"{sha256}{ext}")
+
+
+class UploadStore:
+    """upload_blobs 表的读写"""
+
+    def lookup(self, db: Session, purpose: str, sha256: str) -> Optional[UploadBlob]:
+        return db.query(UploadBlob).filter(UploadBlob.purpose == purpose, UploadBlob.sha256 == sha256).first()
+
+    def find_by_path(self, db: Session, purpose: str, file_path: Optional[str]) -> Optional[UploadBlob]:
+        if not file_path:
+            return None
+        return db.query(UploadBlob).filter(UploadBlob.purpose == purpose, UploadBlob.file_path == file_path).first()
+
+    async def store_file(self, db: Session, purpose: str, received: ReceivedUpload, directory: str, ext: str) -> UploadBlob:
+        """
+        把已接收的临时文件归档到按哈希命名的路径，并返回对应的 blob 记录（已提交）
+
+        相同内容已存在时删除临时文件、复用原文件；原文件已被删除时用本次上传补回。
+        数据库读写仍在当前线程，只有文件操作放到线程中执行。
+        """
+        blob = self.lookup(db, purpose, received.sha256)
+        if blob is not None:
+            blob.hits = (blob.hits or 0) + 1
+            blob.last_used_at = datetime.utcnow()
+            if blob.file_path and await asyncio.to_thread(os.path.exists, blob.file_path):
+                await asyncio.to_thread(discard, received.path)
+            else:
+                blob.file_path = blob.file_path or content_path(directory, received.sha256, ext)
+                await asyncio.to_thread(os.replace, received.path, blob.file_path)
+            db.commit()
+            return blob
+
+        file_path = content_path(directory, received.sha256, ext)
+        await asyncio.to_thread(os.replace, received.path, file_path)
+        blob = UploadBlob(purpose=purpose, sha256=received.sha256, size=received.size, file_path=file_path)
+        db.add(blob)
+        try:
+            db.commit()
+        except IntegrityError:
+            # 同一文件被并发上传，另一个请求已写入记录（文件内容相同，无需处理）
+            db.rollback()
+            blob = self.lookup(db, purpose, received.sha256)
+        return blob
+
+    def remember(self, db: Session, purpose: str, sha256: str, size: int,
+                 extracted_text: Optional[str] = None, parsed_data: Optional[Dict] = None):
+        """记录不落盘文件（职位文档）的提取文本与解析结果"""
+        blob = self.lookup(db, purpose, sha256)
+        if blob is None:
+            blob = UploadBlob(purpose=purpose, sha256=sha256, size=size)
+            db.add(blob)
+        self.update(blob, extracted_text, parsed_data)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+
+    @staticmethod
+    def update(blob: UploadBlob, extracted_text: Optional[str] = None, parsed_data: Optional[Dict] = None):
+        if extracted_text:
+            blob.extracted_text = extracted_text
+        if parsed_data:
+            blob.parsed_data = parsed_data
+
+    @staticmethod
+    def touch(db: Session, blob: UploadBlob):
+        blob.hits = (blob.hits or 0) + 1
+        blob.last_used_at = datetime.utcnow()
+        db.commit()
+
+
+# 创建全局实例
+upload_store = UploadStore()
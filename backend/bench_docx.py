@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Word 文本提取基准测试（完全离线）
+生成包含大量段落、表格、文本框、页眉与页脚的 .docx，对比：
+    iterparse   app.services.text_extraction.extract_docx（当前实现，流式解析）
+    dom-xml     原简历上传使用的整树 ElementTree 解析
+    python-docx 原 JD 文档解析使用的 python-docx
+
+输出每种实现的耗时中位数、内存峰值增量（Linux 下在独立子进程中测量 RSS，包含 lxml 等 C 层分配）、
+输出字符数，以及是否提取到了表格、文本框、页眉、页脚中的标记文本。
+
+用法:
+    python bench_docx.py
+    python bench_docx.py --paragraphs 50000 --tables 50 --rows 40 --repeat 5
+    python bench_docx.py --file 某份简历.docx --json result.json
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+import zipfile
+from typing import Callable, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.text_extraction import extract_docx  # noqa: E402
+
+# 各部位的标记文本，用于检查提取覆盖面
+MARKERS = {
+    "table": "TABLE-CELL-MARKER",
+    "textbox": "TEXTBOX-MARKER",
+    "header": "HEADER-MARKER",
+    "footer": "FOOTER-MARKER",
+}
+
+TEXTBOX_XML = (
+    '<w:p xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    ' xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+    ' xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape"'
+    ' xmlns:v="urn:schemas-microsoft-com:vml"><w:r><mc:AlternateContent>'
+    '<mc:Choice Requires="wps"><wps:txbx><w:txbxContent><w:p><w:r><w:t>{text}</w:t></w:r></w:p>'
+    '</w:txbxContent></wps:txbx></mc:Choice>'
+    '<mc:Fallback><v:textbox><w:txbxContent><w:p><w:r><w:t>{text}</w:t></w:r></w:p>'
+    '</w:txbxContent></v:textbox></mc:Fallback>'
+    '</mc:AlternateContent></w:r></w:p>'
+)
+
+
+# ---------------------------------------------------------------- 旧实现（对照组）
+
+def legacy_dom_xml(data: bytes) -> str:
+    """原 resume.py 中的 extract_text_from_docx_xml：整树解析 document.xml 与每个页眉页脚"""
+    text_parts = []
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        names = zf.namelist()
+        if 'word/document.xml' in names:
+            with zf.open('word/document.xml') as f:
+                for elem in ET.parse(f).getroot().iter():
+                    if elem.tag.endswith('}t') and elem.text:
+                        text_parts.append(elem.text)
+                    if elem.tag.endswith('}p'):
+                        text_parts.append('\n')
+        for prefix in ('word/header', 'word/footer'):
+            for name in names:
+                if name.startswith(prefix) and name.endswith('.xml'):
+                    with zf.open(name) as f:
+                        for elem in ET.parse(f).getroot().iter():
+                            if elem.tag.endswith('}t') and elem.text:
+                                text_parts.append(elem.text)
+                    text_parts.append('\n')
+    return ''.join(text_parts)
+
+
+def legacy_python_docx(data: bytes) -> str:
+    """原 DocumentParserService.parse_word：python-docx 读取段落与表格"""
+    from docx import Document
+
+    doc = Document(io.BytesIO(data))
+    text_content = []
+    for paragraph in doc.paragraphs:
+        if paragraph.text.strip():
+            text_content.append(paragraph.text.strip())
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                if cell.text.strip():
+                    text_content.append(cell.text.strip())
+    return "\n".join(text_content)
+
+
+IMPLEMENTATIONS: Dict[str, Callable[[bytes], str]] = {
+    "iterparse": extract_docx,
+    "dom-xml": legacy_dom_xml,
+    "python-docx": legacy_python_docx,
+}
+
+
+# ---------------------------------------------------------------- 测试文档
+
+def build_document(paragraphs: int, tables: int, rows: int) -> bytes:
+    """用 python-docx 生成测试文档，再向正文注入一个文本框"""
+    from docx import Document
+    from docx.shared import Pt, RGBColor
+
+    doc = Document()
+    section = doc.sections[0]
+    section.header.paragraphs[0].text = f"张三 | 高级后端工程师 {MARKERS['header']}"
+    section.footer.paragraphs[0].text = f"电话 13800138000 {MARKERS['footer']}"
+    per_table = max(1, paragraphs // (tables + 1))
+    for i in range(paragraphs):
+        # 与真实简历一样每段由若干带格式的文字块组成，XML 体积远大于文本本身
+        paragraph = doc.add_paragraph()
+        paragraph.add_run(f"{i}. 负责订单系统的设计与开发，").bold = True
+        paragraph.add_run("主导服务拆分与缓存治理，QPS 提升 3 倍。").font.size = Pt(10.5)
+        paragraph.add_run("Python / Go / Kubernetes").font.color.rgb = RGBColor(0x33, 0x66, 0x99)
+        if tables and (i + 1) % per_table == 0 and len(doc.tables) < tables:
+            table = doc.add_table(rows=rows, cols=4)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"{MARKERS['table']} {r}-{c}" if r == c == 0 else f"单元格 {r}-{c}"
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return inject_textbox(buffer.getvalue(), MARKERS["textbox"])
+
+
+def inject_textbox(data: bytes, text: str) -> bytes:
+    source = zipfile.ZipFile(io.BytesIO(data))
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            content = source.read(item.filename)
+            if item.filename == "word/document.xml":
+                xml = content.decode("utf-8")
+                anchor = xml.index(">", xml.index("<w:body")) + 1
+                xml = xml[:anchor] + TEXTBOX_XML.format(text=text) + xml[anchor:]
+                content = xml.encode("utf-8")
+            target.writestr(item, content)
+    return output.getvalue()
+
+
+# ---------------------------------------------------------------- 测量
+
+PROC_STATUS = "/proc/self/status"
+
+
+def _rss_peak_kb() -> int:
+    """进程的常驻内存峰值（VmHWM，按地址空间统计，exec 后重新计数；ru_maxrss 会继承父进程的值）"""
+    with open(PROC_STATUS) as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _peak_in_child(name: str, data: bytes) -> float:
+    """子进程内执行一次提取，返回常驻内存峰值的增量（MB）"""
+    before = _rss_peak_kb()
+    IMPLEMENTATIONS[name](data)
+    return round((_rss_peak_kb() - before) / 1024, 2)
+
+
+def measure_peak_memory(name: str, data: bytes) -> float:
+    """
+    峰值内存单独在新进程中测一次：RSS 能统计到 tracemalloc 看不到的 lxml（python-docx）分配，
+    且各实现互不影响；没有 /proc 的系统退回在当前进程中用 tracemalloc 测量
+    """
+    if not os.path.exists(PROC_STATUS):
+        tracemalloc.start()
+        IMPLEMENTATIONS[name](data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return round(peak / (1024 * 1024), 2)
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(_peak_in_child, (name, data))
+
+
+def measure(name: str, data: bytes, repeat: int) -> Dict:
+    func = IMPLEMENTATIONS[name]
+    timings: List[float] = []
+    text = ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = func(data)
+        timings.append(time.perf_counter() - started)
+
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 1),
+        "min_ms": round(min(timings) * 1000, 1),
+        "peak_mb": measure_peak_memory(name, data),
+        "chars": len(text),
+        "coverage": {part: marker in text for part, marker in MARKERS.items()},
+        # 文本框在文档中只有一个，出现多次说明重复提取了兼容副本
+        "textbox_copies": text.count(MARKERS["textbox"]),
+    }
+
+
+def print_report(report: Dict):
+    doc = report["document"]
+    print(f"文档: {doc['source']}，{doc['bytes'] / (1024 * 1024):.2f}MB（document.xml 解压后 {doc['xml_bytes'] / (1024 * 1024):.2f}MB）")
+    print(f"\n{'实现':<14}{'中位数(ms)':>12}{'最快(ms)':>12}{'峰值增量(MB)':>12}{'字符数':>10}  覆盖（表格/文本框/页眉/页脚）")
+    for name, r in report["results"].items():
+        coverage = "/".join("✓" if r["coverage"][part] else "✗" for part in MARKERS)
+        copies = f"  文本框 x{r['textbox_copies']}" if r["textbox_copies"] > 1 else ""
+        print(f"{name:<14}{r['median_ms']:>12}{r['min_ms']:>12}{r['peak_mb']:>12}{r['chars']:>10}  {coverage}{copies}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Word 文本提取基准测试（iterparse / 整树 XML / python-docx）")
+    parser.add_argument("--paragraphs", type=int, default=10000, help="生成文档的段落数")
+    parser.add_argument("--tables", type=int, default=20, help="生成文档的表格数")
+    parser.add_argument("--rows", type=int, default=30, help="每个表格的行数（4 列）")
+    parser.add_argument("--repeat", type=int, default=3, help="每种实现的计时次数")
+    parser.add_argument("--file", default=None, help="使用已有的 .docx 文件代替生成的文档")
+    parser.add_argument("--only", nargs="+", choices=list(IMPLEMENTATIONS), default=list(IMPLEMENTATIONS))
+    parser.add_argument("--json", dest="json_path", default=None, help="把结果另存为 JSON")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if args.file:
+        with open(args.file, "rb") as f:
+            data = f.read()
+        source = args.file
+    else:
+        data = build_document(args.paragraphs, args.tables, args.rows)
+        source = f"生成（{args.paragraphs} 段，{args.tables} 个 {args.rows}x4 表格）"
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        xml_bytes = zf.getinfo("word/document.xml").file_size
+
+    report = {
+        "document": {"source": source, "bytes": len(data), "xml_bytes": xml_bytes},
+        "results": {name: measure(name, data, args.repeat) for name in args.only},
+    }
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+端到端流水线压测（完全离线）
+在进程内驱动 FastAPI 应用（httpx ASGITransport，不经过网络），AI 请求发往本地 LLM 替身服务：
+    上传简历 -> 等待解析 -> 创建职位 -> 等待解析 -> 匹配分析 -> 生成简历 -> 导出
+
+输出整体吞吐（请求/秒、流水线/秒）、各接口 p50/p95/p99 延迟与错误数，以及事件循环延迟。
+数据库、上传目录、导出目录与 LLM 缓存均放在临时工作目录，不影响本地数据。
+
+用法:
+    python bench_pipeline.py --concurrency 8 --iterations 40
+    python bench_pipeline.py --stub-url http://127.0.0.1:18100/v1 --stream --json result.json
+    python bench_pipeline.py --latency lognormal --latency-mean 1.5 --tokens-per-sec 80 --failure-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_RESUME = os.path.join(os.path.dirname(BACKEND_DIR), "example_resume.txt")
+
+FALLBACK_RESUME = """张三
+电话：13800138000 | 邮箱：zhangsan@example.com | 现居：上海
+个人简介
+五年后端开发经验，熟悉高并发服务设计。
+教育背景
+2014.09 - 2018.06 复旦大学 计算机科学与技术 本科
+工作经历
+2018.07 - 至今 某某科技有限公司 高级后端工程师
+负责订单系统重构，QPS 提升 3 倍；主导服务拆分与缓存治理。
+项目经历
+实时推荐平台：基于 Kafka 与 Flink 构建实时特征管道，推荐点击率提升 12%。
+专业技能
+Python、Go、MySQL、Redis、Kafka、Kubernetes
+"""
+
+SAMPLE_JD = """高级后端工程师（上海）
+岗位职责：负责核心交易系统的设计与开发；参与高并发架构优化。
+任职要求：本科及以上学历，5 年以上后端开发经验；精通 Python 或 Go；熟悉 MySQL、Redis、消息队列；有 Kubernetes 经验优先。
+薪资：30-50K"""
+
+# 轮询解析状态的间隔（秒）
+POLL_INTERVAL = 0.05
+# 事件循环延迟的采样间隔（秒）
+LAG_INTERVAL = 0.01
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近秩法百分位"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    """按接口汇总延迟与错误"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.requests = 0
+
+    async def call(self, name: str, coro):
+        started = time.perf_counter()
+        try:
+            response = await coro
+        except Exception:
+            self.errors[name] += 1
+            raise
+        finally:
+            self.requests += 1
+            self.latencies[name].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+            raise RuntimeError(f"{name} -> HTTP {response.status_code}: {response.text[:200]}")
+        return response
+
+    def summary(self) -> Dict[str, Dict]:
+        result = {}
+        for name, values in self.latencies.items():
+            result[name] = {
+                "count": len(values),
+                "errors": self.errors.get(name, 0),
+                "p50": round(percentile(values, 50), 4),
+                "p95": round(percentile(values, 95), 4),
+                "p99": round(percentile(values, 99), 4),
+                "max": round(max(values), 4),
+            }
+        return result
+
+
+class LoopLagMonitor:
+    """周期性 sleep 并测量实际唤醒的滞后，反映事件循环被阻塞的程度"""
+
+    def __init__(self, interval: float = LAG_INTERVAL):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "samples": len(self.samples),
+            "p50_ms": round(percentile(self.samples, 50) * 1000, 2),
+            "p99_ms": round(percentile(self.samples, 99) * 1000, 2),
+            "max_ms": round(max(self.samples, default=0.0) * 1000, 2),
+        }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(args) -> Tuple[subprocess.Popen, str]:
+    """以子进程启动 llm_stub_server.py，返回 (进程, base_url)"""
+    port = free_port()
+    cmd = [
+        sys.executable, os.path.join(BACKEND_DIR, "llm_stub_server.py"),
+        "--port", str(port),
+        "--latency", args.latency,
+        "--latency-mean", str(args.latency_mean),
+        "--latency-stddev", str(args.latency_stddev),
+        "--tokens-per-sec", str(args.tokens_per_sec),
+        "--failure-rate", str(args.failure_rate),
+    ]
+    if args.seed is not None:
+        cmd += ["--seed", str(args.seed)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc, f"http://127.0.0.1:{port}/v1"
+        except OSError:
+            if proc.poll() is not None:
+                break
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("LLM 替身服务启动失败")
+
+
+def prepare_environment(args, workdir: str, stub_url: str):
+    """在导入应用之前设置环境变量：所有状态落在临时目录，AI 指向替身服务"""
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "OPENAI_API_BASE": stub_url,
+        "OPENAI_API_KEY": "stub-key",
+        "OPENAI_MODEL": "stub-model",
+        "LLM_CACHE_ENABLED": "true" if args.llm_cache else "false",
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.db"),
+        "AI_MONITOR_LOG_PATH": os.path.join(workdir, "ai_monitor.log"),
+        "AI_RPM_LIMIT": str(args.rpm),
+        "AI_TPM_LIMIT": str(args.tpm),
+        "AI_MAX_CONCURRENCY": str(args.ai_concurrency),
+    })
+    # 应用按相对路径创建 exports 目录，并读取当前目录的 .env，切到临时目录避免污染与误用真实密钥
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+
+
+async def wait_parsed(client, recorder: Recorder, path: str, name: str, timeout: float) -> Dict:
+    """轮询直到解析完成，等待总时长计入 name"""
+    started = time.perf_counter()
+    while True:
+        response = await client.get(path)
+        data = response.json()
+        if data.get("status") != "parsing":
+            recorder.latencies[name].append(time.perf_counter() - started)
+            if data.get("status") == "failed":
+                recorder.errors[name] += 1
+                raise RuntimeError(f"{path} 解析失败")
+            return data
+        if time.perf_counter() - started > timeout:
+            recorder.errors[name] += 1
+            raise RuntimeError(f"{path} 解析超时")
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def run_pipeline(client, recorder: Recorder, args, index: int, resume_text: str):
+    """执行一次完整流水线"""
+    api = "/api/v1"
+    # 每次流水线的输入略有不同，避免被并发合并或响应缓存吸收
+    text = f"{resume_text}\n编号：{index}"
+    files = {"file": (f"bench_{index}.txt", text.encode("utf-8"), "text/plain")}
+    # 简历解析由解析队列的 worker 异步完成，上传后轮询等待；
+    # 职位解析仍是后台任务，ASGITransport 会等后台任务结束才返回响应，因此创建职位的耗时包含解析
+    upload = await recorder.call("POST /resumes/upload", client.post(f"{api}/resumes/upload", files=files))
+    resume_id = upload.json()["id"]
+    await wait_parsed(client, recorder, f"{api}/resumes/{resume_id}", "resume parse (wait)", args.parse_timeout)
+
+    job = await recorder.call("POST /jobs/", client.post(f"{api}/jobs/", json={
+        "title": "高级后端工程师", "company": f"基准测试公司 {index}", "description": f"{SAMPLE_JD}\n编号：{index}"
+    }))
+    job_id = job.json()["id"]
+    await wait_parsed(client, recorder, f"{api}/jobs/{job_id}", "job parse (wait)", args.parse_timeout)
+
+    if args.stream:
+        await recorder.call("GET /match/analyze/stream", client.get(
+            f"{api}/match/analyze/stream", params={"resume_id": resume_id, "job_id": job_id}
+        ))
+        match_result = None
+    else:
+        match = await recorder.call("POST /match/analyze", client.post(
+            f"{api}/match/analyze", json={"resume_id": resume_id, "job_id": job_id}
+        ))
+        match_result = match.json()
+
+    suggestions = (match_result or {}).get("suggestions") or []
+    generated = await recorder.call("POST /resume-generator/generate", client.post(
+        f"{api}/resume-generator/generate",
+        json={
+            "resume_id": resume_id,
+            "job_id": job_id,
+            "suggestions": [
+                {"category": s.get("category", ""), "content": s.get("content", ""), "template": s.get("template")}
+                for s in suggestions if isinstance(s, dict)
+            ] or None,
+            "save_to_library": False,
+        }
+    ))
+    content = generated.json()["data"]["content"]
+
+    await recorder.call("POST /resume-generator/export", client.post(
+        f"{api}/resume-generator/export",
+        json={"resume_data": {"content": content, "template": "modern"}, "format": args.export_format,
+              "filename": f"bench_{index}.{'md' if args.export_format == 'markdown' else args.export_format}"}
+    ))
+
+
+async def run_benchmark(args) -> Dict:
+    import httpx
+    from app.main import app
+    from app.services.ai_service import ai_service
+    from app.services.resume_ingestion import resume_ingestion_queue
+    from app.services.telemetry import ai_telemetry
+
+    resume_text = FALLBACK_RESUME
+    if args.resume_file or os.path.exists(SAMPLE_RESUME):
+        with open(args.resume_file or SAMPLE_RESUME, "r", encoding="utf-8", errors="ignore") as f:
+            resume_text = f.read()
+
+    recorder = Recorder()
+    monitor = LoopLagMonitor()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    pipeline_latencies: List[float] = []
+    failures: List[str] = []
+
+    # ASGITransport 不触发 startup/shutdown 事件，解析队列的 worker 需要在这里手动启停
+    resume_ingestion_queue.start()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def one(index: int):
+                async with semaphore:
+                    started = time.perf_counter()
+                    try:
+                        await run_pipeline(client, recorder, args, index, resume_text)
+                        pipeline_latencies.append(time.perf_counter() - started)
+                    except Exception as e:
+                        failures.append(str(e))
+
+            # 预热：建表、初始化连接池与缓存，不计入结果
+            if args.warmup:
+                await one(-1)
+                recorder.__init__()
+                pipeline_latencies.clear()
+                failures.clear()
+
+            monitor.start()
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(args.iterations)))
+            elapsed = time.perf_counter() - started
+            await monitor.stop()
+    finally:
+        await resume_ingestion_queue.stop()
+
+    await ai_service.aclose()
+    telemetry = ai_telemetry.snapshot()
+    ai_telemetry.stop()
+
+    return {
+        "config": {
+            "concurrency": args.concurrency,
+            "iterations": args.iterations,
+            "stream": args.stream,
+            "llm_cache": args.llm_cache,
+            "latency": f"{args.latency} mean={args.latency_mean}s stddev={args.latency_stddev}s",
+            "tokens_per_sec": args.tokens_per_sec,
+            "failure_rate": args.failure_rate,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "requests": recorder.requests,
+        "requests_per_second": round(recorder.requests / elapsed, 2) if elapsed else 0.0,
+        "pipelines_completed": len(pipeline_latencies),
+        "pipelines_failed": len(failures),
+        "pipelines_per_second": round(len(pipeline_latencies) / elapsed, 3) if elapsed else 0.0,
+        "pipeline_latency": {
+            "p50": round(percentile(pipeline_latencies, 50), 4),
+            "p95": round(percentile(pipeline_latencies, 95), 4),
+            "p99": round(percentile(pipeline_latencies, 99), 4),
+        },
+        "endpoints": recorder.summary(),
+        "event_loop_lag": monitor.summary(),
+        "ai": {
+            "calls": telemetry["calls"],
+            "retries": telemetry["retries"],
+            "prompt_cache_ratio": telemetry["prompt_cache_ratio"],
+        },
+        "sample_failures": failures[:5],
+    }
+
+
+def print_report(report: Dict):
+    print(f"\n耗时 {report['elapsed_seconds']}s，请求 {report['requests']} 次，{report['requests_per_second']} 请求/秒")
+    print(f"流水线完成 {report['pipelines_completed']}，失败 {report['pipelines_failed']}，{report['pipelines_per_second']} 条/秒")
+    p = report["pipeline_latency"]
+    print(f"单条流水线延迟 p50={p['p50']}s p95={p['p95']}s p99={p['p99']}s\n")
+    print(f"{'接口':<36}{'次数':>6}{'错误':>6}{'p50(s)':>10}{'p95(s)':>10}{'p99(s)':>10}{'max(s)':>10}")
+    for name, s in report["endpoints"].items():
+        print(f"{name:<36}{s['count']:>6}{s['errors']:>6}{s['p50']:>10}{s['p95']:>10}{s['p99']:>10}{s['max']:>10}")
+    lag = report["event_loop_lag"]
+    print(f"\n事件循环延迟 p50={lag['p50_ms']}ms p99={lag['p99_ms']}ms max={lag['max_ms']}ms（{lag['samples']} 次采样）")
+    if report["ai"]["prompt_cache_ratio"]:
+        print(f"提示词前缀缓存命中率: {report['ai']['prompt_cache_ratio']}")
+    for failure in report["sample_failures"]:
+        print(f"失败示例: {failure}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="端到端流水线压测（离线，使用本地 LLM 替身服务）")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时执行的流水线数")
+    parser.add_argument("--iterations", type=int, default=20, help="流水线总数")
+    parser.add_argument("--stub-url", default=None, help="已运行的替身服务地址（如 http://127.0.0.1:18100/v1），不指定则自动启动")
+    parser.add_argument("--latency", default="lognormal", choices=["fixed", "uniform", "normal", "lognormal", "exponential"])
+    parser.add_argument("--latency-mean", type=float, default=0.3)
+    parser.add_argument("--latency-stddev", type=float, default=0.15)
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stream", action="store_true", help="匹配分析走 SSE 流式接口")
+    parser.add_argument("--llm-cache", action="store_true", help="开启 LLM 响应缓存（默认关闭，测量真实请求路径）")
+    parser.add_argument("--export-format", default="markdown", choices=["json", "markdown", "html", "docx", "pdf", "png"])
+    parser.add_argument("--resume-file", default=None, help="简历文本文件，默认使用仓库中的 example_resume.txt")
+    parser.add_argument("--parse-timeout", type=float, default=120.0)
+    parser.add_argument("--rpm", type=int, default=100000, help="AI_RPM_LIMIT（默认放开，避免限流主导结果）")
+    parser.add_argument("--tpm", type=int, default=100000000, help="AI_TPM_LIMIT")
+    parser.add_argument("--ai-concurrency", type=int, default=32, help="AI_MAX_CONCURRENCY")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    parser.add_argument("--json", dest="json_path", default=None, help="把结果另存为 JSON")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    stub_proc = None
+    stub_url = args.stub_url
+    if not stub_url:
+        stub_proc, stub_url = start_stub(args)
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+    try:
+        prepare_environment(args, workdir, stub_url)
+        report = asyncio.run(run_benchmark(args))
+    finally:
+        if stub_proc is not None:
+            stub_proc.terminate()
+            stub_proc.wait(timeout=10)
+    print_report(report)
+    print(f"\n工作目录: {workdir}")
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
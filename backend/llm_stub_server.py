@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+本地 LLM 替身服务（OpenAI / Anthropic 兼容）
+用于离线压测与联调，不消耗真实额度：
+- POST /v1/chat/completions（OpenAI 格式，支持 stream 与 stream_options.include_usage）
+- POST /v1/messages（Anthropic 格式，支持 stream）
+- 延迟分布（fixed/uniform/normal/lognormal/exponential）、输出速率、失败注入均可配置
+- 按提示词中的【输出要求的 JSON 格式】回显合法 JSON，批量 JD 解析按输入 id 逐项输出
+- 模拟服务商前缀缓存：同一固定前缀第二次出现时在 usage 中报告缓存命中 token 数
+
+用法:
+    python llm_stub_server.py --port 18100 --latency lognormal --latency-mean 1.5 --tokens-per-sec 80 --failure-rate 0.05
+    然后设置 OPENAI_API_BASE=http://127.0.0.1:18100/v1
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SCHEMA_MARK = "【输出要求的 JSON 格式】"
+BATCH_MARK = "【职位描述列表】"
+# 粗略估算：每 token 约 2 个字符（中英文混排）
+CHARS_PER_TOKEN = 2
+# 流式输出时每个分片的 token 数
+STREAM_CHUNK_TOKENS = 4
+
+app = FastAPI(title="LLM Stub Server")
+
+
+class StubOptions:
+    """运行参数（由命令行填充）"""
+    latency = "fixed"
+    latency_mean = 0.5
+    latency_stddev = 0.2
+    latency_min = 0.0
+    latency_max = 60.0
+    tokens_per_sec = 0.0
+    failure_rate = 0.0
+    failure_statuses: List[int] = [500, 503, 429]
+    timeout_rate = 0.0
+    malformed_rate = 0.0
+
+
+opts = StubOptions()
+rng = random.Random()
+stats: Dict[str, int] = {"requests": 0, "streams": 0, "failures": 0, "timeouts": 0, "malformed": 0, "cached_prefix_hits": 0}
+_seen_prefixes: set = set()
+
+
+def sample_latency() -> float:
+    """按配置的分布抽取首 token 延迟（秒）"""
+    mean, stddev = opts.latency_mean, opts.latency_stddev
+    if opts.latency == "uniform":
+        value = rng.uniform(max(0.0, mean - stddev), mean + stddev)
+    elif opts.latency == "normal":
+        value = rng.gauss(mean, stddev)
+    elif opts.latency == "lognormal":
+        # 以 mean/stddev 为目标均值与标准差换算对数正态参数，长尾更接近真实服务商
+        variance = stddev ** 2
+        sigma2 = math.log(1 + variance / (mean ** 2)) if mean > 0 else 0.0
+        value = rng.lognormvariate(math.log(mean) - sigma2 / 2 if mean > 0 else 0.0, sigma2 ** 0.5)
+    elif opts.latency == "exponential":
+        value = rng.expovariate(1 / mean) if mean > 0 else 0.0
+    else:
+        value = mean
+    return min(opts.latency_max, max(opts.latency_min, value))
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _fill_schema(schema):
+    """把输出格式模板当作示例值原样返回（数组保留一项）"""
+    if isinstance(schema, dict):
+        return {k: _fill_schema(v) for k, v in schema.items()}
+    if isinstance(schema, list):
+        return [_fill_schema(schema[0])] if schema else []
+    return schema
+
+
+def _extract_schema(text: str):
+    index = text.find(SCHEMA_MARK)
+    if index < 0:
+        return None
+    body = text[index + len(SCHEMA_MARK):]
+    start = body.find("{")
+    if start < 0:
+        return None
+    try:
+        value, _ = json.JSONDecoder().raw_decode(body[start:])
+        return value
+    except ValueError:
+        return None
+
+
+def build_content(prefix: str, body: str) -> str:
+    """根据提示词生成回复文本"""
+    full = f"{prefix}\n{body}"
+    schema = _extract_schema(full)
+    if schema is None:
+        return json.dumps({"result": "ok"}, ensure_ascii=False)
+    result = _fill_schema(schema)
+    if BATCH_MARK in full and isinstance(result.get("results"), list) and result["results"]:
+        items_text = full[full.index(BATCH_MARK) + len(BATCH_MARK):].strip()
+        try:
+            items, _ = json.JSONDecoder().raw_decode(items_text)
+            template = result["results"][0]
+            result["results"] = [dict(template, id=item.get("id")) for item in items]
+        except (ValueError, AttributeError):
+            pass
+    return json.dumps(result, ensure_ascii=False)
+
+
+def prefix_usage(prefix: str, body: str) -> Tuple[int, int]:
+    """返回 (输入 token 数, 命中前缀缓存的 token 数)"""
+    prompt_tokens = estimate_tokens(prefix) + estimate_tokens(body)
+    cached = 0
+    if prefix:
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        if key in _seen_prefixes:
+            cached = estimate_tokens(prefix)
+            stats["cached_prefix_hits"] += 1
+        else:
+            _seen_prefixes.add(key)
+    return prompt_tokens, cached
+
+
+async def inject_faults(api: str) -> Optional[JSONResponse]:
+    """按概率注入失败：返回错误响应，或挂起直到客户端超时"""
+    if opts.timeout_rate and rng.random() < opts.timeout_rate:
+        stats["timeouts"] += 1
+        await asyncio.sleep(3600)
+    if opts.failure_rate and rng.random() < opts.failure_rate:
+        stats["failures"] += 1
+        status = rng.choice(opts.failure_statuses)
+        if api == "anthropic":
+            body = {"type": "error", "error": {"type": "api_error", "message": f"stub injected {status}"}}
+        else:
+            body = {"error": {"message": f"stub injected {status}", "type": "server_error", "code": status}}
+        return JSONResponse(status_code=status, content=body)
+    return None
+
+
+def maybe_malform(content: str) -> str:
+    """按概率截断输出，模拟 max_tokens 截断"""
+    if opts.malformed_rate and rng.random() < opts.malformed_rate:
+        stats["malformed"] += 1
+        return content[:max(1, len(content) * 2 // 3)]
+    return content
+
+
+def chunks(content: str) -> List[str]:
+    size = STREAM_CHUNK_TOKENS * CHARS_PER_TOKEN
+    return [content[i:i + size] for i in range(0, len(content), size)] or [""]
+
+
+async def pace(text: str):
+    """按输出速率等待生成这段文本所需的时间"""
+    if opts.tokens_per_sec > 0:
+        await asyncio.sleep(estimate_tokens(text) / opts.tokens_per_sec)
+
+
+def _text_of(content) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    payload = await request.json()
+    stats["requests"] += 1
+    messages = payload.get("messages") or []
+    prefix = "\n".join(_text_of(m.get("content")) for m in messages if m.get("role") == "system")
+    body = "\n".join(_text_of(m.get("content")) for m in messages if m.get("role") != "system")
+    model = payload.get("model", "stub")
+
+    failure = await inject_faults("openai")
+    if failure is not None:
+        return failure
+    await asyncio.sleep(sample_latency())
+
+    content = maybe_malform(build_content(prefix, body))
+    prompt_tokens, cached = prefix_usage(prefix, body)
+    completion_tokens = estimate_tokens(content)
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached},
+        "prompt_cache_hit_tokens": cached,
+        "prompt_cache_miss_tokens": prompt_tokens - cached,
+    }
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+
+    if not payload.get("stream"):
+        await pace(content)
+        return {
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    stats["streams"] += 1
+    include_usage = (payload.get("stream_options") or {}).get("include_usage")
+
+    async def events():
+        for piece in chunks(content):
+            await pace(piece)
+            chunk = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        final = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        yield f"data: {json.dumps(final)}\n\n"
+        if include_usage:
+            yield f"data: {json.dumps({'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model, 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/messages")
+async def messages(request: Request):
+    payload = await request.json()
+    stats["requests"] += 1
+    system = payload.get("system") or ""
+    prefix = _text_of(system)
+    body = "\n".join(_text_of(m.get("content")) for m in payload.get("messages") or [])
+    model = payload.get("model", "stub")
+
+    failure = await inject_faults("anthropic")
+    if failure is not None:
+        return failure
+    await asyncio.sleep(sample_latency())
+
+    content = maybe_malform(build_content(prefix, body))
+    prompt_tokens, cached = prefix_usage(prefix, body)
+    # Anthropic 的 input_tokens 不含缓存读取部分
+    usage = {
+        "input_tokens": prompt_tokens - cached,
+        "output_tokens": estimate_tokens(content),
+        "cache_read_input_tokens": cached,
+        "cache_creation_input_tokens": 0 if cached else estimate_tokens(prefix),
+    }
+    message_id = f"msg_{uuid.uuid4().hex[:12]}"
+    message = {
+        "id": message_id, "type": "message", "role": "assistant", "model": model,
+        "content": [{"type": "text", "text": content}],
+        "stop_reason": "end_turn", "stop_sequence": None, "usage": usage,
+    }
+
+    if not payload.get("stream"):
+        await pace(content)
+        return message
+
+    stats["streams"] += 1
+
+    def sse(event: str, data: Dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def events():
+        start = dict(message, content=[], stop_reason=None, usage=dict(usage, output_tokens=0))
+        yield sse("message_start", {"type": "message_start", "message": start})
+        yield sse("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+        for piece in chunks(content):
+            await pace(piece)
+            yield sse("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}})
+        yield sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+        yield sse("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": usage["output_tokens"]}})
+        yield sse("message_stop", {"type": "message_stop"})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "stub-model", "object": "model", "owned_by": "stub"}]}
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="本地 LLM 替身服务（OpenAI / Anthropic 兼容）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18100)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "normal", "lognormal", "exponential"], default="fixed",
+                        help="首 token 延迟分布")
+    parser.add_argument("--latency-mean", type=float, default=0.5, help="延迟均值（秒）")
+    parser.add_argument("--latency-stddev", type=float, default=0.2, help="延迟标准差（uniform 为半宽）")
+    parser.add_argument("--latency-max", type=float, default=60.0, help="延迟上限（秒）")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="输出速率，0 表示瞬时输出")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="返回错误状态码的概率")
+    parser.add_argument("--failure-statuses", default="500,503,429", help="注入的错误状态码，逗号分隔")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="挂起不响应的概率（触发客户端超时）")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="截断输出（非法 JSON）的概率")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，便于复现")
+    return parser.parse_args(argv)
+
+
+def configure(args):
+    opts.latency = args.latency
+    opts.latency_mean = args.latency_mean
+    opts.latency_stddev = args.latency_stddev
+    opts.latency_max = args.latency_max
+    opts.tokens_per_sec = args.tokens_per_sec
+    opts.failure_rate = args.failure_rate
+    opts.failure_statuses = [int(s) for s in args.failure_statuses.split(",") if s.strip()]
+    opts.timeout_rate = args.timeout_rate
+    opts.malformed_rate = args.malformed_rate
+    if args.seed is not None:
+        rng.seed(args.seed)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    configure(arguments)
+    print(f"LLM 替身服务: http://{arguments.host}:{arguments.port}/v1 （延迟 {arguments.latency} 均值 {arguments.latency_mean}s）")
+    uvicorn.run(app, host=arguments.host, port=arguments.port, log_level="warning")
@@ -0,0 +1,34 @@
+"""
+流式 JSON 解析测试：根节点必须是对象，顶层数组判定为解析失败而不是取出其中第一个对象
+
+用法:
+    python test_json_stream.py
+    python -m pytest test_json_stream.py
+"""
+from app.services.json_stream import IncrementalJSONParser, parse_json_output, PARSE_OK, PARSE_REPAIRED, PARSE_FAILED
+
+
+def test_top_level_array_fails():
+    assert parse_json_output('[{"a": 1}]') == (None, PARSE_FAILED)
+    assert parse_json_output('结果如下：\n[{"a": 1}, {"b": 2}]') == (None, PARSE_FAILED)
+    assert parse_json_output('```json\n[{"a": 1}]\n```') == (None, PARSE_FAILED)
+
+
+def test_top_level_array_fails_when_streamed():
+    parser = IncrementalJSONParser()
+    for delta in ("```json\n", "[", '{"a"', ": 1}", "]\n```"):
+        assert parser.feed(delta) == []
+    assert not parser.finished
+    assert parser.close() == (None, PARSE_FAILED)
+
+
+def test_object_root_still_parses():
+    assert parse_json_output('```json\n{"a": [1, 2], "b": "x"}\n```') == ({"a": [1, 2], "b": "x"}, PARSE_OK)
+    assert parse_json_output('{"a": 1, "items": ["x", "y') == ({"a": 1, "items": ["x", "y"]}, PARSE_REPAIRED)
+
+
+if __name__ == "__main__":
+    test_top_level_array_fails()
+    test_top_level_array_fails_when_streamed()
+    test_object_root_still_parses()
+    print("流式 JSON 解析测试通过")
@@ -0,0 +1,55 @@
+"""
+简历字段本地预提取测试：学校只从教育背景段落中、且从行首或词首开始识别
+
+用法:
+    python test_resume_extractor.py
+    python -m pytest test_resume_extractor.py
+"""
+from app.services.resume_extractor import extract_education, extract_resume_hints
+
+RESUME = """张三
+电话：13800138000 | 邮箱：zhangsan@example.com
+
+教育背景
+2015.09 - 2019.06 北京大学 计算机科学与技术 本科
+
+工作经历
+2019.07 - 至今 某科技有限公司 算法工程师
+负责与清华大学合作的推荐算法联合研究，发表论文两篇
+参与浙江大学联合实验室的数据平台建设
+"""
+
+
+def test_school_mentioned_in_work_experience_is_ignored():
+    education = extract_resume_hints(RESUME)["education"]
+
+    assert [e["school"] for e in education] == ["北京大学"]
+    assert education[0] == {"school": "北京大学", "degree": "本科", "start_date": "2015.09", "end_date": "2019.06"}
+
+
+def test_no_education_heading_extracts_nothing():
+    text = "张三\n13800138000\n负责与清华大学合作的推荐算法联合研究\n"
+
+    assert extract_resume_hints(text)["education"] == []
+
+
+def test_school_in_the_middle_of_a_sentence_is_ignored():
+    assert extract_education("负责与清华大学合作的推荐算法联合研究") == []
+    assert extract_education("主修课程：数据结构，曾在清华大学交换一学期") == []
+    assert extract_education("2016年毕业于清华大学") == []
+
+
+def test_school_at_line_or_token_start():
+    assert extract_education("2015-2019|浙江大学|硕士") == [
+        {"school": "浙江大学", "degree": "硕士", "start_date": "2015", "end_date": "2019"}
+    ]
+    assert extract_education("上海交通大学 软件工程 本科")[0]["school"] == "上海交通大学"
+    assert extract_education("2015-2019 Peking University Bachelor")[0]["school"] == "Peking University"
+
+
+if __name__ == "__main__":
+    test_school_mentioned_in_work_experience_is_ignored()
+    test_no_education_heading_extracts_nothing()
+    test_school_in_the_middle_of_a_sentence_is_ignored()
+    test_school_at_line_or_token_start()
+    print("简历预提取测试通过")
@@ -0,0 +1,52 @@
+"""
+简历补丁测试：下标按模型看到的 prune 后文档定位，补丁应用在原始数据上，不丢失空字段与未发给模型的字段
+
+用法:
+    python test_resume_patch.py
+    python -m pytest test_resume_patch.py
+"""
+from app.services.resume_patch import apply_resume_patch
+
+ORIGINAL = {
+    "raw_text": "简历全文",
+    "filename": "resume.pdf",
+    "personal_info": {"name": "张三", "summary": "", "phone": "13800138000"},
+    "work_experience": [
+        {"company": "", "achievements": []},
+        {"company": "某科技", "achievements": ["", "负责订单服务", "主导缓存治理"]},
+    ],
+    "skills_sections": [],
+}
+
+
+def test_patch_keeps_fields_not_sent_to_model():
+    result = apply_resume_patch(ORIGINAL, [{"op": "replace", "path": "/personal_info/summary", "value": "资深后端工程师"}])
+
+    assert result.document["raw_text"] == "简历全文"
+    assert result.document["filename"] == "resume.pdf"
+    assert result.document["work_experience"][0] == {"company": "", "achievements": []}
+    assert result.document["personal_info"]["summary"] == "资深后端工程师"
+    assert ORIGINAL["personal_info"]["summary"] == ""
+
+
+def test_indices_refer_to_pruned_document():
+    ops = [
+        {"op": "replace", "path": "/work_experience/0/achievements/1", "value": "主导缓存治理，命中率提升到 95%"},
+        {"op": "insert", "path": "/work_experience/0/achievements/-", "value": "搭建压测平台"},
+        {"op": "insert", "path": "/skills_sections/-", "value": {"category": "后端", "skills": ["Go"]}},
+        {"op": "replace", "path": "/work_experience/3/company", "value": "越界"},
+    ]
+    result = apply_resume_patch(ORIGINAL, ops)
+
+    assert result.document["work_experience"][1]["achievements"] == [
+        "", "负责订单服务", "主导缓存治理，命中率提升到 95%", "搭建压测平台"
+    ]
+    assert result.document["skills_sections"] == [{"category": "后端", "skills": ["Go"]}]
+    assert (result.applied, result.skipped) == (3, 1)
+    assert result.marked["work_experience"][1]["achievements"][3] == "[[ADD]]搭建压测平台[[/ADD]]"
+
+
+if __name__ == "__main__":
+    test_patch_keeps_fields_not_sent_to_model()
+    test_indices_refer_to_pruned_document()
+    print("简历补丁测试通过")
@@ -0,0 +1,81 @@
+"""
+简历分段测试：只有独占一行的小标题才切分段落，正文中以关键词开头的行不能切走后面的内容
+
+用法:
+    python test_resume_sections.py
+    python -m pytest test_resume_sections.py
+"""
+from app.services.resume_sections import (
+    split_resume_sections, split_looks_valid, _heading_section,
+    SECTION_EDUCATION, SECTION_WORK, SECTION_PROJECTS, SECTION_SKILLS, SECTION_CERTIFICATES,
+)
+
+RESUME = """张三
+电话：13800138000
+
+教育背景
+2015.09 - 2019.06 北京大学 计算机科学与技术 本科
+
+工作经历
+2019.07 - 至今 某科技有限公司 后端工程师
+
+三、项目经历
+订单中台重构
+技术栈：Java, Spring Boot, MySQL
+- 负责订单服务拆分，QPS 提升 3 倍
+- 发表论文3篇，整理为内部规范
+用户增长平台
+- 技能提升明显，带领 3 人小组
+- 证书编号:123 的安全审计通过
+
+【专业技能】
+Java、Go、Kubernetes
+
+资格证书：
+PMP
+"""
+
+
+def test_body_lines_starting_with_keywords_are_not_headings():
+    for line in ("技术栈：Java, Spring", "发表论文3篇", "技能提升明显", "证书编号:123",
+                 "Experience with distributed systems", "项目经历：订单中台"):
+        assert _heading_section(line) == "", line
+
+
+def test_standalone_headings_are_recognized():
+    assert _heading_section("项目经历") == SECTION_PROJECTS
+    assert _heading_section("三、项目经历") == SECTION_PROJECTS
+    assert _heading_section("【专业技能】") == SECTION_SKILLS
+    assert _heading_section("教育背景：") == SECTION_EDUCATION
+    assert _heading_section("## Work Experience") == SECTION_WORK
+    assert _heading_section("技能") == SECTION_SKILLS
+    assert _heading_section("资格证书：") == SECTION_CERTIFICATES
+
+
+def test_project_bullets_stay_in_projects():
+    sections = split_resume_sections(RESUME)
+
+    projects = sections[SECTION_PROJECTS]
+    assert "技术栈：Java, Spring Boot, MySQL" in projects
+    assert "负责订单服务拆分" in projects
+    assert "用户增长平台" in projects
+    assert "证书编号:123" in projects
+    assert sections[SECTION_SKILLS] == "Java、Go、Kubernetes"
+    assert sections[SECTION_CERTIFICATES] == "PMP"
+    assert split_looks_valid(RESUME)
+
+
+def test_suspicious_split_is_rejected():
+    repeated = "教育背景\n北京大学\n项目经历\n订单系统\n教育背景\n清华大学\n"
+    empty = "教育背景\n北京大学\n项目经历\n技能\nJava\n"
+
+    assert not split_looks_valid(repeated)
+    assert not split_looks_valid(empty)
+
+
+if __name__ == "__main__":
+    test_body_lines_starting_with_keywords_are_not_headings()
+    test_standalone_headings_are_recognized()
+    test_project_bullets_stay_in_projects()
+    test_suspicious_split_is_rejected()
+    print("简历分段测试通过")
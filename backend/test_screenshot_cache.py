@@ -0,0 +1,74 @@
+"""
+截图解析结果缓存测试：同一版式的不同职位截图不能互相命中，同一张图重新编码后仍能命中
+
+用法:
+    python test_screenshot_cache.py
+    python -m pytest test_screenshot_cache.py
+"""
+import io
+
+from PIL import Image, ImageDraw
+
+from app.services.screenshot_service import prepare_screenshot, sniff_media_type, ScreenshotCache
+
+
+def render_job_page(title: str, salary: str, requirements: str, fmt: str = "PNG", **save_options) -> bytes:
+    """模拟同一招聘网站的职位详情截图：版式固定，只有标题、薪资和一行要求不同"""
+    image = Image.new("RGB", (1280, 2000), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 1280, 120), fill=(0, 102, 204))
+    draw.text((40, 40), "JobSite  |  Home  Jobs  Companies", fill=(255, 255, 255))
+    draw.text((40, 180), title, fill=(20, 20, 20))
+    draw.text((40, 220), salary, fill=(230, 80, 30))
+    for i in range(40):
+        draw.text((40, 300 + i * 40), f"{i + 1}. Responsibilities and benefits boilerplate line {i + 1}", fill=(90, 90, 90))
+    draw.text((40, 1960), requirements, fill=(90, 90, 90))
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **save_options)
+    return buffer.getvalue()
+
+
+def test_different_jobs_with_same_layout_do_not_collide():
+    cache = ScreenshotCache()
+    backend = prepare_screenshot(render_job_page("Senior Backend Engineer", "30k-50k", "Python, Go, 5+ years"))
+    frontend = prepare_screenshot(render_job_page("Senior Frontend Engineer", "30k-50k", "React, TypeScript, 5+ years"))
+    cache.set(backend, {"title": "Senior Backend Engineer"})
+
+    assert backend.fingerprint != frontend.fingerprint
+    assert cache.get(frontend) is None
+
+
+def test_single_character_difference_does_not_collide():
+    cache = ScreenshotCache()
+    first = prepare_screenshot(render_job_page("Backend Engineer", "30k-50k", "Python"))
+    second = prepare_screenshot(render_job_page("Backend Engineer", "30k-60k", "Python"))
+    cache.set(first, {"salary": "30k-50k"})
+
+    assert cache.get(second) is None
+
+
+def test_same_pixels_reencoded_hit():
+    cache = ScreenshotCache()
+    original = prepare_screenshot(render_job_page("Backend Engineer", "30k-50k", "Python"))
+    recompressed = prepare_screenshot(render_job_page("Backend Engineer", "30k-50k", "Python", compress_level=1))
+    cache.set(original, {"title": "Backend Engineer"})
+
+    assert cache.get(recompressed) == {"title": "Backend Engineer"}
+    assert cache.stats()["hits"] == 1
+
+
+def test_riff_without_webp_marker_is_not_an_image():
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), (255, 255, 255)).save(buffer, format="WEBP")
+
+    assert sniff_media_type(buffer.getvalue()) == "image/webp"
+    assert sniff_media_type(b"RIFF\x24\x08\x00\x00WAVEfmt ") is None
+    assert sniff_media_type(b"RIFF\x24\x08\x00\x00AVI LIST") is None
+
+
+if __name__ == "__main__":
+    test_different_jobs_with_same_layout_do_not_collide()
+    test_single_character_difference_does_not_collide()
+    test_same_pixels_reencoded_hit()
+    test_riff_without_webp_marker_is_not_an_image()
+    print("截图缓存测试通过")
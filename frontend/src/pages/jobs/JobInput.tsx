@@ -87,27 +87,29 @@ const JobInput: React.FC = () => {
 
     // 处理图片分析核心逻辑
     const processImage = async (file: File) => {
-        const reader = new FileReader();
-        reader.readAsDataURL(file);
-        reader.onload = async () => {
-            const base64 = reader.result as string;
-            setAnalyzingImage(true);
-            try {
-                const response = await axios.post(`${API_ENDPOINTS.JOBS}/analyze-screenshot`, { image: base64 });
-                const { title, company, description } = response.data;
-                form.setFieldsValue({
-                    title,
-                    company,
-                    description
-                });
-                message.success('截图内容已提取，请检查并完善信息');
-                setActiveTab('manual'); // 分析完跳转到手动修改确认
-            } catch (error: any) {
-                message.error(error.response?.data?.detail || '图片解析失败，可能因为图片不够清晰');
-            } finally {
-                setAnalyzingImage(false);
-            }
-        };
+        setAnalyzingImage(true);
+        try {
+            // 以二进制 multipart 上传，服务端负责缩放与重新编码
+            const formData = new FormData();
+            formData.append('file', file);
+            const response = await axios.post(`${API_ENDPOINTS.JOBS}/analyze-screenshot/upload`, formData, {
+                headers: {
+                    'Content-Type': 'multipart/form-data',
+                },
+            });
+            const { title, company, description } = response.data;
+            form.setFieldsValue({
+                title,
+                company,
+                description
+            });
+            message.success('截图内容已提取，请检查并完善信息');
+            setActiveTab('manual'); // 分析完跳转到手动修改确认
+        } catch (error: any) {
+            message.error(error.response?.data?.detail || '图片解析失败，可能因为图片不够清晰');
+        } finally {
+            setAnalyzingImage(false);
+        }
     };
 
     // 处理上传
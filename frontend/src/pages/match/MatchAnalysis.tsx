@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react'
 import {
-    Card, Select, Button, Typography, message, Progress, Tag, Space, Alert, Row, Col, Steps, Empty, Divider, Tabs, Input, Checkbox
+    Card, Select, Button, Typography, message, Progress, Tag, Space, Alert, Row, Col, Steps, Empty, Divider, Tabs, Input, Checkbox, Spin
 } from 'antd'
 import {
     Radar, RadarChart, PolarGrid, PolarAngleAxis, PolarRadiusAxis, ResponsiveContainer
@@ -62,7 +62,10 @@ interface MatchResult {
             stage3_project: { title: string; project_name: string; implementation: string; resume_bullet: string }
         }
         interview_prep: { critical_question: string; answer_strategy: string }
-    }>
+    }> | null
+    // 学习蓝图延迟生成：pending 时需单独请求 /match/{id}/blueprints
+    blueprints_status?: 'pending' | 'ready'
+    id?: string
     learning_path?: Array<{
         skill: string
         level: string
@@ -96,6 +99,7 @@ const MatchAnalysis: React.FC = () => {
     const [selectedSuggestionIndices, setSelectedSuggestionIndices] = useState<number[]>([])
     const [editingSuggestionIndex, setEditingSuggestionIndex] = useState<number | null>(null)
     const [editingSuggestionContent, setEditingSuggestionContent] = useState('')
+    const [loadingBlueprints, setLoadingBlueprints] = useState(false)
 
     // 监听 result 变化，默认全选建议
     useEffect(() => {
@@ -227,6 +231,9 @@ const MatchAnalysis: React.FC = () => {
             setResult(response.data)
             setEditingResume(response.data.optimized_resume || '')
             setCurrentStep(2) // Move to result step
+            if (response.data.blueprints_status === 'pending') {
+                fetchBlueprints(response.data.id)
+            }
 
             // 显示成功信息，包含自动保存提示
             if (response.data.saved_resume_id) {
@@ -245,6 +252,23 @@ const MatchAnalysis: React.FC = () => {
         }
     }
 
+    // 学习蓝图在核心结果返回后按需生成，不阻塞匹配分析
+    const fetchBlueprints = async (matchId: string) => {
+        setLoadingBlueprints(true)
+        try {
+            const response = await axios.get(`${API_ENDPOINTS.MATCH}/${matchId}/blueprints`)
+            setResult(prev => prev && prev.id === matchId ? {
+                ...prev,
+                skill_mastery_blueprints: response.data.skill_mastery_blueprints,
+                blueprints_status: response.data.blueprints_status
+            } : prev)
+        } catch (error) {
+            console.error('学习蓝图生成失败', error)
+        } finally {
+            setLoadingBlueprints(false)
+        }
+    }
+
     // 渲染带有 AI 标记的文本
     const renderTaggedText = (text: string) => {
         if (!text) return null;
@@ -650,6 +674,11 @@ const MatchAnalysis: React.FC = () => {
                                         </div>
 
                                         {/* 深度技能通关图谱 */}
+                                        {loadingBlueprints && (
+                                            <div style={{ marginTop: 40, textAlign: 'center' }}>
+                                                <Spin tip="正在生成深度技能通关图谱..." />
+                                            </div>
+                                        )}
                                         {result.skill_mastery_blueprints && result.skill_mastery_blueprints.length > 0 && (
                                             <>
                                                 <Title level={4} className="module-title" style={{ marginTop: 40 }}>